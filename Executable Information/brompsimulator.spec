@@ -1,12 +1,14 @@
 # -*- mode: python ; coding: utf-8 -*-
+import os
 
 
+# The simulator modules live in the repository root, next to brompsimulator.py
 a = Analysis(
-    ['brompsimulator.py'],
-    pathex=[],
+    [os.path.join(SPECPATH, '..', 'brompsimulator.py')],
+    pathex=[os.path.join(SPECPATH, '..')],
     binaries=[],
     datas=[],
-    hiddenimports=[],
+    hiddenimports=['numpy'],
     hookspath=[],
     hooksconfig={},
     runtime_hooks=[],
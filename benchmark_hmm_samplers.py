@@ -0,0 +1,91 @@
+import argparse
+import time
+import numpy as np
+import simulation_engine
+
+# HMM transition sampler benchmark
+#
+# Compares the cost per transition of the three ways of drawing the next state of
+# a Markov chain as the number of states grows:
+#   choice     - one np.random.choice call per transition (the original sampler)
+#   cumulative - a binary search over the flattened cumulative transition table,
+#                all chains advanced together
+#   alias      - alias tables built once per row, O(1) per transition, all chains
+#                advanced together
+#
+# Example:
+#   python benchmark_hmm_samplers.py --states 4 16 64 256 1024 --chains 1000 --steps 200
+
+'''
+Summary: Return a random row-stochastic transition matrix with a few dominant transitions per row, like a coding scheme
+where most behaviours are followed by a handful of others
+Parameter: number_of_states - the number of states
+Parameter: generator - the numpy random generator
+'''
+def random_transition_matrix(number_of_states, generator):
+    return generator.dirichlet(np.full(number_of_states, 0.3), size=number_of_states)
+
+'''
+Summary: Return the seconds per transition of np.random.choice, measured on fewer transitions since it is slow
+Parameter: transition_matrix - the transition matrix
+Parameter: transitions - the number of transitions to draw
+Parameter: generator - the numpy random generator
+'''
+def time_choice_sampler(transition_matrix, transitions, generator):
+    number_of_states = transition_matrix.shape[0]
+    current_state = 0
+    start = time.perf_counter()
+    for _ in range(transitions):
+        current_state = generator.choice(number_of_states, p=transition_matrix[current_state])
+    return (time.perf_counter() - start) / transitions
+
+'''
+Summary: Return the seconds per transition of a vectorized sampler advancing every chain together
+Parameter: next_states - a function taking (current states, generator) and returning the next states
+Parameter: number_of_states - the number of states
+Parameter: chains - the number of chains advanced together
+Parameter: steps - the number of transitions of every chain
+Parameter: generator - the numpy random generator
+'''
+def time_vectorized_sampler(next_states, number_of_states, chains, steps, generator):
+    current_states = generator.integers(number_of_states, size=chains)
+    start = time.perf_counter()
+    for _ in range(steps):
+        current_states = next_states(current_states, generator)
+    return (time.perf_counter() - start) / (chains * steps)
+
+'''
+Summary: Run the benchmark and print one row per number of states
+Parameter: argv - the command line arguments, None to use sys.argv
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the HMM transition samplers as the number of states grows.")
+    parser.add_argument("--states", nargs="+", type=int, default=[4, 16, 64, 256, 1024], help="numbers of states to benchmark")
+    parser.add_argument("--chains", type=int, default=1000, help="number of chains advanced together")
+    parser.add_argument("--steps", type=int, default=200, help="number of transitions of every chain")
+    parser.add_argument("--choice-transitions", type=int, default=2000, help="number of transitions drawn with np.random.choice")
+    parser.add_argument("--seed", type=int, default=0, help="seed of the random transition matrices and draws")
+    args = parser.parse_args(argv)
+
+    generator = np.random.default_rng(args.seed)
+    print("states,choice ns/transition,cumulative ns/transition,alias ns/transition,cumulative build ms,alias build ms")
+    for number_of_states in args.states:
+        transition_matrix = random_transition_matrix(number_of_states, generator)
+
+        start = time.perf_counter()
+        transition_table = simulation_engine.cumulative_transition_table(transition_matrix)
+        cumulative_build = time.perf_counter() - start
+        start = time.perf_counter()
+        probabilities, aliases = simulation_engine.alias_transition_tables(transition_matrix)
+        alias_build = time.perf_counter() - start
+
+        choice = time_choice_sampler(transition_matrix, args.choice_transitions, generator)
+        cumulative = time_vectorized_sampler(lambda states, rng: simulation_engine.advance_markov_chains(transition_table, states, rng),
+            number_of_states, args.chains, args.steps, generator)
+        alias = time_vectorized_sampler(lambda states, rng: simulation_engine.advance_markov_chains_with_alias(probabilities, aliases, states, rng),
+            number_of_states, args.chains, args.steps, generator)
+        print(f"{number_of_states},{choice * 1e9:.1f},{cumulative * 1e9:.1f},{alias * 1e9:.1f},{cumulative_build * 1e3:.2f},{alias_build * 1e3:.2f}")
+    return 0
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,276 @@
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+import numpy as np
+import cumulative_statistics
+from simulation_core import Event, BROMPSimulator
+
+# Benchmark suite
+#
+# Times every stage of the simulation pipeline on a set of canonical scenarios,
+# without the GUI, and saves the results as JSON so that two commits can be
+# compared:
+#
+#   generation    - generate_students_states
+#   observation   - sampling the class under every time per observation
+#   class         - class level tallies and percentages of every interval
+#   cumulative    - adding the replicate to the running statistics
+#   csv           - writing the cumulative results
+#   writers       - writing the observations and timelines of a single simulation
+#
+# --compare refuses a baseline run with another engine or scale, whose speedups would be meaningless.
+#
+# Example:
+#   python benchmark_suite.py --output before.json
+#   (change the code)
+#   python benchmark_suite.py --output after.json --compare before.json
+#
+# New scenarios are added to SCENARIOS; a scenario with "hmm": True runs the
+# hidden Markov model simulator of updated_hmm_integration.py instead.
+
+STAGES = ["generation", "observation", "class", "cumulative", "csv", "writers"]
+
+SCENARIOS = {
+    "small_classroom": {"events": [("on-task", 20, 70), ("off-task", 10, 30)], "students": 10, "time": 1800, "intervals": [20], "replicates": 500},
+    "large_class": {"events": [("on-task", 20, 70), ("off-task", 10, 30)], "students": 300, "time": 3600, "intervals": [20, 40], "replicates": 50},
+    "long_session": {"events": [("on-task", 20, 70), ("off-task", 10, 30)], "students": 30, "time": 360000, "intervals": [20, 60], "replicates": 10},
+    "many_events": {"events": [("event" + str(i), 5 + i % 7, 2.5) for i in range(40)], "students": 30, "time": 7200, "intervals": [20, 40], "replicates": 100},
+    "hmm_mode": {"events": [("on-task", 20, 70), ("off-task", 10, 30), ("idle", 7, 10)], "students": 30, "time": 3600, "intervals": [20, 40], "replicates": 50, "hmm": True},
+    "many_intervals": {"events": [("on-task", 20, 70), ("off-task", 10, 30)], "students": 30, "time": 3600, "intervals": list(range(5, 205, 5)), "replicates": 100},
+    "many_replicates": {"events": [("on-task", 20, 70), ("off-task", 10, 30)], "students": 10, "time": 1800, "intervals": [20, 40], "replicates": 5000},
+}
+
+'''
+Summary: Build the simulator of a scenario
+Parameter: scenario - the scenario parameters
+Parameter: engine - the timeline engine of the simulator
+Parameter: seed - the seed of the simulator
+'''
+def build_simulator(scenario, engine, seed):
+    if scenario.get("hmm"):
+        # Imported only for HMM scenarios, since that module also defines its own GUI
+        import updated_hmm_integration
+        events = [updated_hmm_integration.Event(name, str(duration), str(proportion)) for name, duration, proportion in scenario["events"]]
+        simulator = updated_hmm_integration.BROMPSimulator(events, scenario["intervals"], scenario["students"], scenario["time"], engine=engine)
+        simulator.numpyGenerator = np.random.default_rng(seed)
+        return simulator
+    events = [Event(name, str(duration), str(proportion)) for name, duration, proportion in scenario["events"]]
+    return BROMPSimulator(events, scenario["intervals"], scenario["students"], scenario["time"], engine=engine, seed=seed)
+
+'''
+Summary: Compute the observation tallies of every interval as an (intervals x students x events) array, using the
+simulator's own observation methods
+Parameter: simulator - the simulator
+Parameter: student_states - the states of each student
+'''
+def observe(simulator, student_states):
+    if hasattr(simulator, "compute_all_observation_tallies"):
+        return simulator.compute_all_observation_tallies(student_states)
+    return [simulator.compute_observation_results(student_states, time_per_observation) for time_per_observation in simulator.timesPerObservation]
+
+'''
+Summary: Run a scenario replicate by replicate, timing every stage, and return the seconds spent in each stage
+Parameter: scenario - the scenario parameters
+Parameter: engine - the timeline engine of the simulator
+Parameter: seed - the seed of the simulator
+Parameter: replicates - the number of replicates to run
+'''
+def time_stages(scenario, engine, seed, replicates):
+    simulator = build_simulator(scenario, engine, seed)
+    stage_seconds = dict.fromkeys(STAGES, 0.0)
+    cumulative_results = cumulative_statistics.CumulativeResults(simulator.events, simulator.timesPerObservation)
+    clock = time.perf_counter
+    try:
+        for _ in range(replicates):
+            start = clock()
+            student_states = simulator.generate_students_states()
+            generated = clock()
+            all_observations = observe(simulator, student_states)
+            observed = clock()
+            all_observation_time_data = {}
+            for time_per_observation, observations in zip(simulator.timesPerObservation, all_observations):
+                all_observation_time_data[time_per_observation] = simulator.compute_class_level_results(observations)
+            aggregated = clock()
+            cumulative_results.add_run_data(all_observation_time_data)
+            accumulated = clock()
+            stage_seconds["generation"] += generated - start
+            stage_seconds["observation"] += observed - generated
+            stage_seconds["class"] += aggregated - observed
+            stage_seconds["cumulative"] += accumulated - aggregated
+        output_simulator = simulator if isinstance(simulator, BROMPSimulator) else build_simulator(dict(scenario, hmm=False), "matrix", seed)
+        with tempfile.TemporaryDirectory() as directory:
+            start = clock()
+            output_simulator.output_cumulative_results(cumulative_results, os.path.join(directory, "results.csv"))
+            stage_seconds["csv"] = clock() - start
+            stage_seconds["writers"] = time_single_simulation_writers(output_simulator, os.path.join(directory, "simulation.csv"))
+    finally:
+        cumulative_results.close()
+    return stage_seconds
+
+'''
+Summary: Return the seconds spent writing the output of a single simulation, the observation results of every interval
+and the timelines of every student. The simulation itself is not timed.
+Parameter: simulator - the simulator
+Parameter: output_file - the file to write the output to
+'''
+def time_single_simulation_writers(simulator, output_file):
+    student_states = simulator.generate_students_states()
+    real_event_counts = simulator.compute_real_event_counts(student_states)
+    all_observations = [simulator.compute_observation_results(student_states, time_per_observation) for time_per_observation in simulator.timesPerObservation]
+    with open(output_file, 'w') as file:
+        start = time.perf_counter()
+        for time_per_observation, student_observations in zip(simulator.timesPerObservation, all_observations):
+            simulator.write_observation_result(real_event_counts, student_observations, time_per_observation, file)
+        file.write("Randomized events:\r\n\r\n")
+        simulator.write_student_states(student_states, file)
+        return time.perf_counter() - start
+
+'''
+Summary: Return the peak memory traced while running a few replicates of a scenario. Statistics are streamed, so the
+peak does not grow with the number of replicates once the first ones have run.
+Parameter: scenario - the scenario parameters
+Parameter: engine - the timeline engine of the simulator
+Parameter: seed - the seed of the simulator
+Parameter: replicates - the number of replicates to run
+'''
+def measure_peak_memory(scenario, engine, seed, replicates):
+    tracemalloc.start()
+    try:
+        time_stages(scenario, engine, seed, replicates)
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+'''
+Summary: Run a scenario and return its timings, throughput and peak memory
+Parameter: scenario - the scenario parameters
+Parameter: engine - the timeline engine of the simulator
+Parameter: seed - the seed of the simulator
+Parameter: scale - the factor applied to the number of replicates of the scenario
+Parameter: measure_memory - whether to measure the peak memory in a separate traced run
+'''
+def run_scenario(scenario, engine, seed, scale=1.0, measure_memory=True):
+    replicates = max(2, int(round(scenario["replicates"] * scale)))
+    stage_seconds = time_stages(scenario, engine, seed, replicates)
+    total_seconds = sum(stage_seconds.values())
+    ticks = replicates * scenario["students"] * scenario["time"]
+    result = {
+        "parameters": {"events": len(scenario["events"]), "students": scenario["students"], "time": scenario["time"],
+            "intervals": len(scenario["intervals"]), "replicates": replicates, "engine": engine, "hmm": bool(scenario.get("hmm"))},
+        "stages": {stage: {"seconds": seconds, "per_replicate_ms": seconds * 1000 / replicates} for stage, seconds in stage_seconds.items()},
+        "total_seconds": total_seconds,
+        "replicates_per_second": replicates / total_seconds if total_seconds > 0 else None,
+        "ticks_per_second": ticks / total_seconds if total_seconds > 0 else None,
+        "peak_memory_bytes": None,
+    }
+    if measure_memory:
+        result["peak_memory_bytes"] = measure_peak_memory(scenario, engine, seed, min(replicates, 3))
+    return result
+
+'''
+Summary: Return the commit the benchmark ran on, or None outside of a git checkout
+'''
+def get_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=os.path.dirname(os.path.abspath(__file__)),
+            capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+'''
+Summary: Return how many times faster a scenario ran than in a previous run, over the stages timed by both runs, or
+None if it cannot be computed
+Parameter: result - the results of the scenario
+Parameter: previous - the results of the scenario in the previous run
+'''
+def get_speedup(result, previous):
+    stages = [stage for stage in STAGES if stage in result["stages"] and stage in previous["stages"]]
+    seconds = sum(result["stages"][stage]["per_replicate_ms"] for stage in stages)
+    previous_seconds = sum(previous["stages"][stage]["per_replicate_ms"] for stage in stages)
+    if seconds <= 0 or previous_seconds <= 0:
+        return None
+    return previous_seconds / seconds
+
+'''
+Summary: Return the settings of a previous run that differ from the settings of this run, as a list of messages
+Parameter: results - the benchmark results
+Parameter: baseline - previous benchmark results
+'''
+def get_baseline_mismatches(results, baseline):
+    metadata = baseline.get("metadata", {})
+    return [f"{key} is {metadata.get(key)!r} in the baseline but {results['metadata'][key]!r} here"
+        for key in ["engine", "scale"] if metadata.get(key) != results["metadata"][key]]
+
+'''
+Summary: Print the per-replicate time of every stage of every scenario, and its ratio to a previous run if given
+Parameter: results - the benchmark results
+Parameter: baseline - previous benchmark results to compare with, or None
+'''
+def print_report(results, baseline=None):
+    header = "scenario," + ",".join(stage + " ms" for stage in STAGES) + ",replicates/s,ticks/s,peak MiB"
+    if baseline is not None:
+        header += ",speedup"
+    print(header)
+    for name, result in results["scenarios"].items():
+        row = [name] + [f"{result['stages'][stage]['per_replicate_ms']:.3f}" for stage in STAGES]
+        row.append(f"{result['replicates_per_second']:.1f}" if result["replicates_per_second"] else "")
+        row.append(f"{result['ticks_per_second']:.3g}" if result["ticks_per_second"] else "")
+        row.append(f"{result['peak_memory_bytes'] / 2 ** 20:.1f}" if result["peak_memory_bytes"] is not None else "")
+        if baseline is not None:
+            previous = baseline["scenarios"].get(name)
+            speedup = get_speedup(result, previous) if previous else None
+            row.append(f"{speedup:.2f}x" if speedup is not None else "")
+        print(",".join(row))
+
+'''
+Summary: Run the benchmark suite
+Parameter: argv - the command line arguments, None to use sys.argv
+'''
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the stages of the POSSUMS simulation pipeline without the GUI.")
+    parser.add_argument("--scenario", nargs="+", choices=sorted(SCENARIOS), default=None, help="scenarios to run (default: all)")
+    parser.add_argument("--engine", choices=["list", "matrix", "runlength", "sampled"], default="matrix",
+        help="timeline engine of the simulator (default: matrix); HMM scenarios use matrix for sampled")
+    parser.add_argument("--scale", type=float, default=1.0, help="factor applied to the number of replicates of every scenario")
+    parser.add_argument("--seed", type=int, default=0, help="seed of every scenario")
+    parser.add_argument("--no-memory", action="store_true", help="skip the traced run measuring peak memory")
+    parser.add_argument("--output", default=None, help="JSON file to save the results to")
+    parser.add_argument("--compare", default=None, help="JSON file of a previous run to compare with")
+    args = parser.parse_args(argv)
+
+    baseline = None
+    if args.compare is not None:
+        try:
+            with open(args.compare) as file:
+                baseline = json.load(file)
+        except (OSError, ValueError) as error:
+            parser.error(f"--compare: {error}")
+
+    results = {
+        "metadata": {"commit": get_commit(), "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": sys.version.split()[0],
+            "numpy": np.__version__, "platform": platform.platform(), "engine": args.engine, "scale": args.scale, "seed": args.seed},
+        "scenarios": {},
+    }
+    for name in args.scenario or list(SCENARIOS):
+        scenario = SCENARIOS[name]
+        engine = "matrix" if scenario.get("hmm") and args.engine == "sampled" else args.engine
+        results["scenarios"][name] = run_scenario(scenario, engine, args.seed, args.scale, not args.no_memory)
+
+    if baseline is not None:
+        mismatches = get_baseline_mismatches(results, baseline)
+        if mismatches:
+            parser.error(f"--compare: {args.compare} is not comparable, " + "; ".join(mismatches))
+    print_report(results, baseline)
+    if args.output is not None:
+        with open(args.output, 'w') as file:
+            json.dump(results, file, indent=2)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,362 +1,10 @@
 import tkinter as tk
-from tkinter import messagebox, filedialog
-import random
-import math
-
-# Event Class
-class Event:
-    '''
-    Summary: Constructor to population an event object
-    '''
-    def __init__(self, name, duration, proportion):
-        self.name = name
-        self.duration = duration
-        self.proportion = proportion
-
-    '''
-    Summary: Return the name of the event
-    '''
-    def get_name(self):
-        return self.name
-
-    '''
-    Summary: Return the duration of the event
-    '''
-    def get_duration(self):
-        return self.duration
-
-    '''
-    Summary: Return the proportion of the event
-    '''
-    def get_proportion(self):
-        return self.proportion
-
-    '''
-    Summary: Return a formatted string representation of an event
-    '''
-    def __str__(self):
-        return f"{self.name} - {self.duration} - {self.proportion}"
-
-# Run Event Data Class
-class ClassRunEventData:
-    '''
-    Summary: Constructor to populate a run event data class object
-    '''
-    def __init__(self, total_tally, percentage):
-        self.total_tally = total_tally
-        self.percentage = percentage
-
-    '''
-    Summary: Return the total tally of the event's data
-    '''
-    def get_total_tally(self):
-        return self.total_tally
-
-    '''
-    Summary: Return the percentage
-    '''
-    def get_percentage(self):
-        return self.percentage
-
-# Simulator Class
-class BROMPSimulator:
-    '''
-    Summary: Constructor to populate a simulator object
-    '''
-    def __init__(self, events, timesPerObservation, numberOfStudents, totalObservationTime):
-        self.events = events
-        self.timesPerObservation = timesPerObservation
-        self.numberOfStudents = numberOfStudents
-        self.totalObservationTime = totalObservationTime
-        self.randomGenerator = random.Random()
-    
-    '''
-    Summary: Run the simulation
-    Parameter: output_file - the file to output the results to
-    '''
-    def run(self, output_file):
-        if app.repeated_simulation_check.get():
-            self.run_repeated_simulation(output_file)
-        else:
-            self.run_single_simulation(output_file)
-    
-    '''
-    Summary: Run the simulation multiple times as specified by user
-    Parameter: output_file - the file to output the results
-    '''
-    def run_repeated_simulation(self, output_file):
-        number_of_simulations = int(app.repeated_simulation_entry.get())
-        cumulative_run_data = []
-        for i in range(number_of_simulations):
-            student_states = self.generate_students_states()
-            all_observation_time_data = {}
-            for time_per_observation in self.timesPerObservation:
-                student_observations = self.compute_observation_results(student_states, time_per_observation)
-                all_observation_time_data[time_per_observation] = self.compute_class_level_results(student_observations)
-            cumulative_run_data.append(all_observation_time_data)
-        self.output_cumulative_results(cumulative_run_data, output_file)
-        
-    '''
-    Summary: Output the cumulative results to a file, using specific formatting and calculations
-    Parameter: cumulative_run_data - the cumulative data collected throughout the simulation
-    Parameter: output_file - the file to output the results
-    '''
-    def output_cumulative_results(self, cumulative_run_data, output_file):
-        with open(output_file, 'w') as file:
-            for time_per_observation in self.timesPerObservation:
-                file.write("Time per observation = " + str(time_per_observation))
-                file.write("\r\n\r\n")
-                file.write(",average tally,std tally,average percentage,std percentage,,target percentage\r\n")
-                for event in self.events:
-                    average_tallies = 0
-                    std_tallies = 0
-                    average_percentage = 0
-                    std_percentage = 0
-                    tallies = []
-                    percentages = []
-                    for run_level_data in cumulative_run_data:
-                        data = run_level_data[time_per_observation][event]
-                        average_tallies += data.get_total_tally()
-                        if data.get_percentage() == None:
-                            average_percentage += 0
-                        else:
-                            average_percentage += data.get_percentage()
-                        tallies.append(float(data.get_total_tally()))
-                        percentages.append(data.get_percentage())
-                    average_tallies = average_tallies / (float(len(cumulative_run_data)))
-                    average_percentage = average_percentage / (float(len(cumulative_run_data)))
-                    for i in range(len(tallies)):
-                        std_tallies += (tallies[i] - average_tallies) * (tallies[i] - average_tallies)
-                        std_percentage += (percentages[i] - average_percentage) * (percentages[i] - average_percentage)
-                    
-                    std_tallies = math.sqrt(std_tallies / (float(len(cumulative_run_data)-1)))
-                    std_percentage = math.sqrt(std_percentage / (float(len(cumulative_run_data)-1)))
-
-                    file.write(event.get_name() + "," + str(average_tallies) + "," + str(std_tallies) + "," + str(average_percentage) + "," + str(std_percentage) + ',,' + str((float(event.get_proportion()) / float(100))) + "\r\n")
-                file.write("\r\n\r\n")
-
-                file.write("Simulation#")
-                for event in self.events:
-                    file.write("," + event.get_name() + " tally," + event.get_name() + " percentage")
-                file.write("\r\n")
-                simulationIndex = 1
-                for run_level_data in cumulative_run_data:
-                    file.write(str(simulationIndex))
-                    for event in self.events:
-                        data = run_level_data[time_per_observation][event]
-                        file.write("," + str(data.get_total_tally()) + "," + str(data.get_percentage()))
-                    file.write("\r\n")
-                    simulationIndex += 1
-                file.write("\r\n")
-    
-    '''
-    Summary: Compute the results at the level of the class
-    Parameter: student_observations - the observations made by the students
-    '''
-    def compute_class_level_results(self, student_observations):
-        number_of_students = len(student_observations)
-        total_class_tallies = {}
-        for event in self.events:
-            total_class_tallies[event] = 0
-        total_tally_per_student = []
-        percentages_per_students = []
-        for student in student_observations:
-            total_student_tally = 0
-
-            for event in self.events:
-                current_tally = student[event]
-                #print(current_tally, total_class_tallies[event])
-                total_class_tallies[event] = total_class_tallies[event] + current_tally
-                total_student_tally += current_tally
-
-            percentages_for_current_student = {}
-            print(total_student_tally)
-            for event in self.events:
-                if total_student_tally == 0:
-                    percentages_for_current_student[event] = 0
-                    continue
-                percentages_for_current_student[event] = float(student[event]) / float(total_student_tally)
-            
-            total_tally_per_student.append(total_student_tally)
-            percentages_per_students.append(percentages_for_current_student)
-        average_class_percentages = {}
-        for event in self.events:
-            percentage_sum = 0
-            for i in range(number_of_students):
-                percentage_sum += percentages_per_students[i][event]
-            average_class_percentages[event] = percentage_sum / float(number_of_students)
-        
-        class_level_data = {}
-        for event in self.events:
-            class_level_data[event] = ClassRunEventData(total_class_tallies[event], average_class_percentages[event])
-        
-        return class_level_data
-    
-    '''
-    Summary: Run a single simulation
-    Parameter: output_file - the file to output the results
-    '''
-    def run_single_simulation(self, output_file):
-        with open(output_file, 'w') as file:
-            student_states = self.generate_student_states()
-            for time_per_observation in self.timesPerObservation:
-                self.compute_and_output_observation_results(student_states, time_per_observation, file)
-            file.write("Randomized events:\r\n\r\n")
-            self.write_student_states(student_states, file)
-
-    '''
-    Summary: Calls functions to compute and output the observation results obtained from the simulation
-    Parameter: student_states - the states of each student, based on the simulation
-    Parameter: time_per_observation - the time per observation
-    Parameter: file - the file to output the results
-    '''
-    def compute_and_output_observation_results(self, student_states, time_per_observation, file):
-        student_observations = self.compute_observation_results(student_states, time_per_observation)
-        real_event_counts = self.compute_real_event_counts(student_states)
-        self.write_observation_results(real_event_counts, student_observations, time_per_observation, file)
-
-    '''
-    Summary: Computes the observation results obtained from the simulation
-    Parameter: student_states - the states of each student, based on the simulation
-    Parameter: time_per_observation - the time per observation
-    '''
-    def compute_observation_results(self, student_states, time_per_observation):
-        assert len(student_states) == self.numberOfStudents
-        current_time_index = 0
-        current_student_index = 0
-
-        student_observations = []
-        for i in range(self.numberOfStudents):
-            observation_map = {}
-            for event in self.events:
-                observation_map[event] = 0
-            student_observations.append(observation_map)
-        while current_time_index < len(student_states[0]):
-            observed_event = student_states[current_student_index][current_time_index]
-            observation_map = student_observations[current_student_index]
-            observation_map[observed_event] = observation_map[observed_event] + 1
-            current_time_index += time_per_observation
-            current_student_index = (current_student_index + 1) % self.numberOfStudents
-        return student_observations
-    
-    '''
-    Summary: Compute the real event counts
-    Parameter: student_states - the states of each student, based on the simulation
-    '''
-    def compute_real_event_counts(self, student_states):
-        real_event_counts = {}
-        for event in self.events:
-            real_event_counts[event] = 0
-        for event in student_states[0]:
-            real_event_counts[event] = real_event_counts[event] + 1
-        return real_event_counts
-    
-    '''
-    Summary: Write the observation results to a file
-    Parameter: real_event_counts - the real event counts
-    Parameter: student_observations - the observations for each student
-    Parameter: time_per_observation - the time per observation
-    Parameter: file - the file to output the results
-    '''
-    def write_observation_result(self, real_event_counts, student_observations, time_per_observation, file):
-        file.write("Time per observation = " + str(time_per_observation))
-        file.write("\r\n\r\n")
-
-        for i in range(self.numberOfStudents):
-            file.write(",tally student" + str(i+1) + ",percentage student" + str(i+1))
-        
-        file.write(",,total tally, average tally, std tally, average percentage, std percentage")
-        file.write(",,target percentage")
-        file.write("\r\n")
-        number_of_target_observations = 0
-        for num in real_event_counts.values():
-            number_of_target_observations += num
-        
-        for event in self.events:
-            file.write(event.get_name())
-            tallies = []
-            percentages = []
-            for student_index in range(self.numberOfStudents):
-                observations = student_observations[student_index]
-                tally = observations[event]
-                file.write("," + str(tally))
-                number_of_observations = 0
-                for num in observations.values():
-                    number_of_observations += num
-
-                percentage = float(tally) / float(number_of_observations)
-                file.write("," + str(percentage))
-                tallies.append(tally)
-                percentages.append(percentage)
-            total_tally = 0
-            for tally in tallies:
-                total_tally += tally
-            average_taly = float(((float(total_tally)) / (float(self.numberOfStudents))))
-            std_tally = 0
-            for tally in tallies:
-                std_tally += (tally - average_taly) * (tally - average_taly)
-            std_tally = float(math.sqrt(std_tally / (float(self.numberOfStudents-1))))
-            average_percentage = 0
-            for percentage in percentages:
-                average_percentage += percentage
-            average_percentage = average_percentage / float(self.numberOfStudents)
-            std_percentage = 0
-            for percentage in percentages:
-                std_percentage += (percentage - average_percentage) * (percentage - average_percentage)
-            std_percentage = math.sqrt(std_percentage / float(self.numberOfStudents))
-            file.write(",,," + str(total_tally) + "," + str(average_taly) + "," + str(std_tally) + "," + str(average_percentage) + "," + str(std_percentage) + ",," + float(event.get_proportion()) / float(100))
-            file.write(",," + str(float(real_event_counts[event]) / float(number_of_target_observations)))
-            file.write("\r\n")
-        file.write("\r\n\r\n")
-    
-    '''
-    Summary: Function to generate the states for each student
-    '''
-    def generate_students_states(self):
-        student_states = []
-        for i in range(self.numberOfStudents):
-            student_states.append(self.generate_states_for_one_student())
-        return student_states
-    
-    '''
-    Summary: Function to generate the state for a single student, executing the Monte Carlo Simulation
-    '''
-    def generate_states_for_one_student(self):
-        states = []
-        nonRandomizedEvents = []
-        for event in self.events:
-            count_of_event = (float(self.totalObservationTime) * float(event.get_proportion())) / (100 * float(event.get_duration()))
-            #print(math.floor(count_of_event))
-            for i in range(int(count_of_event)):
-                nonRandomizedEvents.append(event)
-        randomizedEvents = []
-        while(len(nonRandomizedEvents) > 0):
-            randomIndex = self.randomGenerator.randrange(len(nonRandomizedEvents))
-            randomizedEvents.append(nonRandomizedEvents.pop(randomIndex))
-                    
-        for event in randomizedEvents:
-            for i in range(int(event.get_duration())):
-                states.append(event)
-
-        return states
-    
-    '''
-    Summary: Function to write the student states to a file
-    Parameter: student_states - the states of each student
-    Parameter: file - the file to output the student states
-    '''
-    def write_student_states(self, student_states, file):
-        file.write("time")
-        for i in range(len(student_states)):
-            file.write(",student" + str(i+1))
-        
-        file.write("\r\n")
-
-        for timeIndex in range(len(student_states[0])):
-            file.write(str(timeIndex+1))
-            for studentIndex in range(len(student_states)):
-                file.write("," + student_states[studentIndex][timeIndex].get_name())
-            file.write("\r\n")
+from tkinter import messagebox, filedialog, ttk
+import multiprocessing
+import queue
+import threading
+import time
+from simulation_core import Event, BROMPSimulator
 
 # Event Manager Class to handle the GUI
 class EventManager:
@@ -370,6 +18,9 @@ class EventManager:
 
         self.events = []
         self.times_per_observation = []
+        self.simulation_thread = None
+        self.cancel_event = None
+        self.progress_queue = queue.Queue()
 
         self.init_event_input_fields()
         self.init_simulation_parameters()
@@ -472,6 +123,22 @@ class EventManager:
         self.run_button = tk.Button(self.root, text="Run", state='disabled', command=self.run_simulation)
         self.run_button.place(x=450, y=660, width=100, height=30)
 
+        self.progress_bar = ttk.Progressbar(self.root, mode='determinate', maximum=1)
+        self.progress_bar.place(x=100, y=720, width=330, height=20)
+
+        self.cancel_button = tk.Button(self.root, text="Cancel", state='disabled', command=self.cancel_simulation)
+        self.cancel_button.place(x=450, y=715, width=100, height=30)
+
+        self.progress_label = tk.Label(self.root, text="", anchor='w')
+        self.progress_label.place(x=100, y=750, width=450, height=30)
+
+        tolerance_label = tk.Label(self.root, text="Tolerance (optional)")
+        tolerance_label.place(x=100, y=790, width=150, height=30)
+
+        self.tolerance_entry = tk.Entry(self.root, state='disabled')
+        self.tolerance_entry.place(x=270, y=790, width=160, height=30)
+        self.tolerance_entry.bind("<KeyRelease>", self.validate_entries)
+
         self.repeated_simulation_entry.bind("<KeyRelease>", self.validate_entries)
 
     '''
@@ -488,27 +155,29 @@ class EventManager:
         time_per_observation_valid = self.is_time_per_observation_valid()
         print(f"Time per observation valid: {time_per_observation_valid}")
         
-        self.add_button.config(state='normal' if event_valid else 'disabled')
-        self.run_button.config(state='normal' if run_valid else 'disabled')
-        self.time_per_observation_add_button.config(state='normal' if time_per_observation_valid else 'disabled')
+        # The events and times per observation cannot be edited while a simulation runs
+        editable = not self.is_simulation_running()
+        self.add_button.config(state='normal' if event_valid and editable else 'disabled')
+        self.run_button.config(state='normal' if run_valid and editable else 'disabled')
+        self.time_per_observation_add_button.config(state='normal' if time_per_observation_valid and editable else 'disabled')
 
     '''
     Summary: Validate the selection in the listbox
     '''
     def validate_listbox_selection(self, event):
-        self.remove_button.config(state='normal' if self.event_listbox.curselection() else 'disabled')
+        self.remove_button.config(state='normal' if self.event_listbox.curselection() and not self.is_simulation_running() else 'disabled')
 
     '''
     Summary: Validate the time per observation entry
     '''
     def validate_time_per_observation_selection(self, event):
-        self.time_per_observation_remove_button.config(state='normal' if self.time_per_observation_listbox.curselection() else 'disabled')
+        self.time_per_observation_remove_button.config(state='normal' if self.time_per_observation_listbox.curselection() and not self.is_simulation_running() else 'disabled')
 
     '''
     Summary: Validate the time per observation entry
     '''
     def validate_time_per_observation_entry(self, event):
-        self.time_per_observation_add_button.config(state='normal' if self.is_time_per_observation_valid() else 'disabled')
+        self.time_per_observation_add_button.config(state='normal' if self.is_time_per_observation_valid() and not self.is_simulation_running() else 'disabled')
 
     '''
     Summary: Validate the event data
@@ -549,15 +218,29 @@ class EventManager:
             and students.isdigit() and int(students) > 0
             and total_observation_time.isdigit() and int(total_observation_time) > 0
             and (not self.repeated_simulation_check.get() or (repeated_simulation.isdigit() and int(repeated_simulation) > 0))
+            and (not self.repeated_simulation_check.get() or self.is_tolerance_valid())
             and output)
         print(f"Run valid: {valid}")
         return valid
 
+    '''
+    Summary: Check that the tolerance is empty, to run every repeated simulation, or a positive number
+    '''
+    def is_tolerance_valid(self):
+        tolerance = self.tolerance_entry.get().strip()
+        if not tolerance:
+            return True
+        try:
+            return float(tolerance) > 0
+        except ValueError:
+            return False
+
     '''
     Summary: Allow the user to toggle if they would like to have repeated simulations
     '''
     def toggle_repeated_simulation(self):
         self.repeated_simulation_entry.config(state='normal' if self.repeated_simulation_check.get() else 'disabled')
+        self.tolerance_entry.config(state='normal' if self.repeated_simulation_check.get() else 'disabled')
         self.validate_entries()
 
     '''
@@ -636,12 +319,121 @@ class EventManager:
         #print(events, self.times_per_observation, number_of_students, total_observation_time, output_file, repeated_simulation, number_of_simulations)
         #for event in events:
         #    print(event.name, event.duration, event.proportion)
-        simulator = BROMPSimulator(self.events, self.times_per_observation, number_of_students, total_observation_time)
-        simulator.run(output_file)
-        messagebox.showinfo("Run", "Simulation has been run.")
+        # Every engine draws the same timelines, so the GUI uses the fastest one
+        # The simulator gets its own copies, so the configuration of a running simulation cannot change
+        simulator = BROMPSimulator(events, list(self.times_per_observation), number_of_students, total_observation_time, engine="sampled")
+        self.cancel_event = threading.Event()
+        simulator.set_progress_monitor(self.post_progress, self.cancel_event)
+        tolerance = self.tolerance_entry.get().strip() if repeated_simulation else ""
+        simulator.set_precision_target(float(tolerance) if tolerance else None)
+        self.progress_bar.config(maximum=number_of_simulations, value=0)
+        self.progress_label.config(text="Starting...")
+        self.run_button.config(state='disabled')
+        for button in (self.add_button, self.remove_button, self.time_per_observation_add_button, self.time_per_observation_remove_button):
+            button.config(state='disabled')
+        self.cancel_button.config(state='normal' if repeated_simulation else 'disabled')
+        self.simulation_start_time = time.monotonic()
+        self.simulation_thread = threading.Thread(target=self.run_simulation_in_background,
+            args=(simulator, output_file, number_of_simulations if repeated_simulation else None), daemon=True)
+        self.simulation_thread.start()
+        self.root.after(100, self.poll_simulation)
+
+    '''
+    Summary: Run the simulation on the background thread, posting its outcome to the progress queue.
+    Tkinter is not thread safe, so the background thread never touches the widgets itself.
+    Parameter: simulator - the simulator to run
+    Parameter: output_file - the file to write the results to
+    Parameter: number_of_simulations - the number of repeated simulations, None for a single simulation
+    '''
+    def run_simulation_in_background(self, simulator, output_file, number_of_simulations):
+        try:
+            completed = simulator.run(output_file, number_of_simulations)
+            self.progress_queue.put(("done", completed, number_of_simulations or 1))
+        except Exception as error:
+            self.progress_queue.put(("error", error, None))
+
+    '''
+    Summary: Post the progress of the simulation from the background thread
+    Parameter: completed - the number of completed simulations
+    Parameter: total - the total number of simulations
+    '''
+    def post_progress(self, completed, total):
+        self.progress_queue.put(("progress", completed, total))
+
+    '''
+    Summary: Return whether a simulation is running in the background; it counts as running until poll_simulation has
+    handled its outcome
+    '''
+    def is_simulation_running(self):
+        return self.simulation_thread is not None
+
+    '''
+    Summary: Ask the running simulation to stop; the results of the completed simulations are still written
+    '''
+    def cancel_simulation(self):
+        if self.cancel_event is not None:
+            self.cancel_event.set()
+            self.cancel_button.config(state='disabled')
+            self.progress_label.config(text="Cancelling...")
+
+    '''
+    Summary: Show the progress posted by the background thread and report the outcome once the simulation finishes
+    '''
+    def poll_simulation(self):
+        outcome = None
+        while True:
+            try:
+                message = self.progress_queue.get_nowait()
+            except queue.Empty:
+                break
+            if message[0] == "progress":
+                self.show_progress(message[1], message[2])
+            else:
+                outcome = message
+        if outcome is None:
+            self.root.after(100, self.poll_simulation)
+            return
+        self.simulation_thread.join()
+        self.simulation_thread = None
+        self.cancel_button.config(state='disabled')
+        self.validate_entries()
+        self.validate_listbox_selection(None)
+        self.validate_time_per_observation_selection(None)
+        kind, completed, total = outcome
+        if kind == "error":
+            self.progress_label.config(text="Simulation failed.")
+            messagebox.showerror("Run", f"Simulation failed: {completed}")
+        elif completed < total and self.cancel_event.is_set():
+            self.progress_label.config(text=f"Cancelled after {completed} of {total} simulations.")
+            messagebox.showinfo("Run", f"Simulation was cancelled after {completed} of {total} simulations. The results of the completed simulations have been saved.")
+        elif completed < total:
+            self.progress_bar.config(value=total)
+            self.progress_label.config(text=f"Reached the tolerance after {completed} simulations in {time.monotonic() - self.simulation_start_time:.1f} s.")
+            messagebox.showinfo("Run", f"Simulation has been run. The tolerance was reached after {completed} of at most {total} simulations.")
+        else:
+            self.progress_bar.config(value=total)
+            self.progress_label.config(text=f"Finished {total} simulations in {time.monotonic() - self.simulation_start_time:.1f} s.")
+            messagebox.showinfo("Run", "Simulation has been run.")
+
+    '''
+    Summary: Update the progress bar and the throughput and estimated time remaining
+    Parameter: completed - the number of completed simulations
+    Parameter: total - the total number of simulations
+    '''
+    def show_progress(self, completed, total):
+        self.progress_bar.config(value=completed)
+        elapsed = time.monotonic() - self.simulation_start_time
+        rate = completed / elapsed if elapsed > 0 else 0
+        if rate > 0:
+            remaining = (total - completed) / rate
+            minutes, seconds = divmod(int(round(remaining)), 60)
+            self.progress_label.config(text=f"{completed} / {total} simulations, {rate:.1f} per second, {minutes}:{seconds:02d} remaining")
+        else:
+            self.progress_label.config(text=f"{completed} / {total} simulations")
 
 # Main function to run the GUI
 if __name__ == "__main__":
+    multiprocessing.freeze_support()
     root = tk.Tk()
     app = EventManager(root)
     root.mainloop()
\ No newline at end of file
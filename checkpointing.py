@@ -0,0 +1,47 @@
+import os
+import pickle
+
+# Checkpoints
+#
+# A checkpoint is a pickled dict holding everything a repeated simulation needs
+# to carry on where it stopped: the configuration it was started with, the
+# number of completed replicates, the accumulated statistics and the seed
+# entropy every replicate's random stream is spawned from. It is written to a temporary file and moved over the
+# previous checkpoint, so an interruption never leaves a partial checkpoint.
+
+# Version 2: serial replicates draw from per-replicate seed streams
+# Version 3: only the seed entropy is kept, and the engine and workers may change on resume
+CHECKPOINT_VERSION = 3
+
+'''
+Summary: Atomically write a checkpoint
+Parameter: checkpoint_file - the checkpoint file
+Parameter: state - the state to save
+'''
+def save_checkpoint(checkpoint_file, state):
+    state = dict(state, version=CHECKPOINT_VERSION)
+    temporary_file = checkpoint_file + ".tmp"
+    with open(temporary_file, 'wb') as file:
+        pickle.dump(state, file, protocol=pickle.HIGHEST_PROTOCOL)
+        file.flush()
+        os.fsync(file.fileno())
+    os.replace(temporary_file, checkpoint_file)
+
+'''
+Summary: Read a checkpoint written by save_checkpoint
+Parameter: checkpoint_file - the checkpoint file
+'''
+def load_checkpoint(checkpoint_file):
+    with open(checkpoint_file, 'rb') as file:
+        state = pickle.load(file)
+    if state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"{checkpoint_file} is not a supported checkpoint")
+    return state
+
+'''
+Summary: Delete a checkpoint once the run it belongs to has finished
+Parameter: checkpoint_file - the checkpoint file
+'''
+def remove_checkpoint(checkpoint_file):
+    if os.path.exists(checkpoint_file):
+        os.remove(checkpoint_file)
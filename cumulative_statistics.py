@@ -0,0 +1,224 @@
+import os
+import statistics
+import tempfile
+import numpy as np
+
+# Running Statistics Class
+class RunningStatistics:
+    '''
+    Summary: Constructor to populate a running statistics object, tracking the count, mean and sum of squared
+    deviations (M2) of every cell of an array with Welford's online algorithm. The plain running total is kept as
+    well so the reported mean is the same total / count as a two-pass computation
+    Parameter: shape - the shape of the values added at each update
+    '''
+    def __init__(self, shape):
+        self.count = 0
+        self.total = np.zeros(shape)
+        self.mean = np.zeros(shape)
+        self.m2 = np.zeros(shape)
+
+    '''
+    Summary: Add one set of values to the statistics
+    Parameter: values - an array with the shape given to the constructor
+    '''
+    def update(self, values):
+        self.count += 1
+        self.total += values
+        delta = values - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (values - self.mean)
+
+    '''
+    Summary: Return the number of values added so far
+    '''
+    def get_count(self):
+        return self.count
+
+    '''
+    Summary: Return the mean of the values added so far
+    '''
+    def get_mean(self):
+        if self.count == 0:
+            return np.full(self.mean.shape, np.nan)
+        return self.total / self.count
+
+    '''
+    Summary: Return the sample standard deviation of the values added so far, nan until two values have been added
+    '''
+    def get_std(self):
+        if self.count < 2:
+            return np.full(self.mean.shape, np.nan)
+        return np.sqrt(self.m2 / (self.count - 1))
+
+    '''
+    Summary: Return the half width of the normal confidence interval of the mean, nan until two values have been added
+    Parameter: z - the standard normal quantile of the confidence level
+    '''
+    def get_mean_half_width(self, z):
+        return z * self.get_std() / np.sqrt(max(self.count, 1))
+
+    '''
+    Summary: Return the half width of the confidence interval of the standard deviation, using the large sample
+    standard error std / sqrt(2 (n - 1)); nan until two values have been added
+    Parameter: z - the standard normal quantile of the confidence level
+    '''
+    def get_std_half_width(self, z):
+        return z * self.get_std() / np.sqrt(2 * max(self.count - 1, 1))
+
+    '''
+    Summary: Return a copy of the accumulated state, for checkpointing
+    '''
+    def get_state(self):
+        return {"count": self.count, "total": self.total.copy(), "mean": self.mean.copy(), "m2": self.m2.copy()}
+
+    '''
+    Summary: Restore a state returned by get_state
+    Parameter: state - the state to restore
+    '''
+    def set_state(self, state):
+        self.count = state["count"]
+        self.total = state["total"].copy()
+        self.mean = state["mean"].copy()
+        self.m2 = state["m2"].copy()
+
+# Cumulative Results Class
+class CumulativeResults:
+    '''
+    Summary: Constructor to populate a cumulative results object. Statistics are accumulated per (interval, event) as
+    each replicate finishes and the per-replicate rows are spooled to temporary files, so memory does not grow with
+    the number of replicates
+    Parameter: events - the events of the simulation
+    Parameter: timesPerObservation - the times per observation of the simulation
+    Parameter: row_file_prefix - optional prefix of named files to spool the rows to, so they survive an interrupted run;
+    None spools them to anonymous temporary files
+    Parameter: resume - whether the rows already in the named files belong to a checkpoint about to be restored with
+    set_state; otherwise the files are emptied, so rows left by a run that died before its first checkpoint are dropped
+    '''
+    def __init__(self, events, timesPerObservation, row_file_prefix=None, resume=False):
+        self.events = events
+        self.timesPerObservation = timesPerObservation
+        shape = (len(timesPerObservation), len(events))
+        self.tally_statistics = RunningStatistics(shape)
+        self.percentage_statistics = RunningStatistics(shape)
+        if row_file_prefix is None:
+            self.row_file_names = []
+            self.row_files = [tempfile.TemporaryFile(mode='w+', newline='') for _ in timesPerObservation]
+        else:
+            self.row_file_names = [row_file_prefix + ".rows" + str(interval_index) for interval_index in range(len(timesPerObservation))]
+            mode = 'a+' if resume else 'w+'
+            self.row_files = [open(row_file_name, mode, newline='', encoding='utf-8') for row_file_name in self.row_file_names]
+
+    '''
+    Summary: Add the class level results of one replicate
+    Parameter: tallies - the (intervals x events) class tallies of the replicate
+    Parameter: percentages - the (intervals x events) class average percentages of the replicate
+    '''
+    def add_run(self, tallies, percentages):
+        self.tally_statistics.update(np.asarray(tallies, dtype=float))
+        self.percentage_statistics.update(np.asarray(percentages, dtype=float))
+        simulation_index = str(self.tally_statistics.get_count())
+        tallies = np.asarray(tallies).tolist()
+        percentages = np.asarray(percentages, dtype=float).tolist()
+        for interval_index, row_file in enumerate(self.row_files):
+            row = [simulation_index]
+            for tally, percentage in zip(tallies[interval_index], percentages[interval_index]):
+                row.append(str(tally))
+                row.append(str(percentage))
+            row_file.write(",".join(row) + "\r\n")
+
+    '''
+    Summary: Add the results of one replicate given as a map from time per observation to its class level data, either a
+    ClassRunResults or a map from each event to its ClassRunEventData
+    Parameter: all_observation_time_data - the class level data of the replicate for every time per observation
+    '''
+    def add_run_data(self, all_observation_time_data):
+        tallies = []
+        percentages = []
+        for time_per_observation in self.timesPerObservation:
+            class_level_data = all_observation_time_data[time_per_observation]
+            if hasattr(class_level_data, "get_total_tallies"):
+                tallies.append(class_level_data.get_total_tallies())
+                percentages.append(class_level_data.get_percentages())
+                continue
+            tallies.append([class_level_data[event].get_total_tally() for event in self.events])
+            percentages.append([class_level_data[event].get_percentage() or 0 for event in self.events])
+        self.add_run(tallies, percentages)
+
+    '''
+    Summary: Return the number of replicates added so far
+    '''
+    def get_count(self):
+        return self.tally_statistics.get_count()
+
+    '''
+    Summary: Return the widest confidence interval half width over every reported statistic (average and std of the
+    tally and of the percentage, per time per observation and event). Tallies are divided by the number of
+    observations of their time per observation, so every half width is a fraction of the observations, like the
+    percentages. Infinite until two replicates have been added.
+    Parameter: confidence - the confidence level, for example 0.95
+    '''
+    def get_largest_half_width(self, confidence):
+        if self.get_count() < 2:
+            return float("inf")
+        z = statistics.NormalDist().inv_cdf(0.5 + confidence / 2)
+        observations = self.tally_statistics.get_mean().sum(axis=1, keepdims=True)
+        tally_scale = np.divide(1, observations, out=np.zeros(observations.shape), where=observations > 0)
+        half_widths = [
+            self.tally_statistics.get_mean_half_width(z) * tally_scale,
+            self.tally_statistics.get_std_half_width(z) * tally_scale,
+            self.percentage_statistics.get_mean_half_width(z),
+            self.percentage_statistics.get_std_half_width(z),
+        ]
+        return max(float(np.max(half_width, initial=0.0)) for half_width in half_widths)
+
+    '''
+    Summary: Copy the spooled per-replicate rows of one time per observation into a file
+    Parameter: interval_index - the index of the time per observation
+    Parameter: file - the file to copy the rows into
+    '''
+    def copy_rows(self, interval_index, file):
+        row_file = self.row_files[interval_index]
+        row_file.seek(0)
+        while True:
+            chunk = row_file.read(1 << 20)
+            if not chunk:
+                break
+            file.write(chunk)
+        row_file.seek(0, 2)
+
+    '''
+    Summary: Return the accumulated statistics and the size of every row file, after forcing the rows to disk
+    '''
+    def get_state(self):
+        row_sizes = []
+        for row_file in self.row_files:
+            row_file.flush()
+            os.fsync(row_file.fileno())
+            row_sizes.append(row_file.seek(0, 2))
+        return {"tally_statistics": self.tally_statistics.get_state(), "percentage_statistics": self.percentage_statistics.get_state(), "row_sizes": row_sizes}
+
+    '''
+    Summary: Restore a state returned by get_state, dropping any row written after it was taken
+    Parameter: state - the state to restore
+    '''
+    def set_state(self, state):
+        self.tally_statistics.set_state(state["tally_statistics"])
+        self.percentage_statistics.set_state(state["percentage_statistics"])
+        for row_file, row_size in zip(self.row_files, state["row_sizes"]):
+            row_file.truncate(row_size)
+            row_file.seek(0, 2)
+
+    '''
+    Summary: Close the row files; anonymous temporary files are deleted, named row files are kept
+    '''
+    def close(self):
+        for row_file in self.row_files:
+            row_file.close()
+
+    '''
+    Summary: Delete the named row files, once the results they hold have been written out
+    '''
+    def remove_row_files(self):
+        for row_file_name in self.row_file_names:
+            if os.path.exists(row_file_name):
+                os.remove(row_file_name)
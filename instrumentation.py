@@ -0,0 +1,169 @@
+import csv
+import functools
+import json
+import time
+
+# Instrumentation
+#
+# Records where a run spends its time without an external profiler. Enabling
+# it replaces the instrumented methods of one simulator object with timing
+# wrappers; disabling it removes the wrappers again, so a simulator that is
+# not instrumented calls its methods directly and pays nothing.
+#
+# For every instrumented method it keeps the number of calls, the total,
+# smallest and largest time per call, and the number of items processed
+# (time units generated, observations made, students aggregated, rows
+# written). Methods calling each other are each timed, so nested times are
+# also included in the time of the caller. Replicates run by worker processes
+# are not timed; only the work done in the calling process is.
+
+'''
+Summary: Return the number of items to record for a call, or 0 when the counter does not apply
+Parameter: count_items - a function taking (arguments, result) and returning the number of items processed, or None
+Parameter: args - the arguments of the call
+Parameter: result - the result of the call
+'''
+def count_call_items(count_items, args, result):
+    if count_items is None:
+        return 0
+    return int(count_items(args, result))
+
+# Stage Record Class
+class StageRecord:
+    '''
+    Summary: Constructor to populate a stage record object, accumulating the calls of one instrumented method
+    Parameter: name - the name of the method
+    '''
+    def __init__(self, name):
+        self.name = name
+        self.clear()
+
+    '''
+    Summary: Forget every call recorded so far
+    '''
+    def clear(self):
+        self.calls = 0
+        self.totalSeconds = 0.0
+        self.minSeconds = float("inf")
+        self.maxSeconds = 0.0
+        self.items = 0
+
+    '''
+    Summary: Add one call
+    Parameter: seconds - the time the call took
+    Parameter: items - the number of items the call processed
+    '''
+    def add(self, seconds, items):
+        self.calls += 1
+        self.totalSeconds += seconds
+        self.minSeconds = min(self.minSeconds, seconds)
+        self.maxSeconds = max(self.maxSeconds, seconds)
+        self.items += items
+
+    '''
+    Summary: Return the record as a dict of plain values
+    '''
+    def to_dict(self):
+        return {
+            "stage": self.name,
+            "calls": self.calls,
+            "total_seconds": self.totalSeconds,
+            "mean_seconds": self.totalSeconds / self.calls if self.calls else None,
+            "min_seconds": self.minSeconds if self.calls else None,
+            "max_seconds": self.maxSeconds,
+            "items": self.items,
+            "items_per_second": self.items / self.totalSeconds if self.totalSeconds > 0 else None,
+        }
+
+# Instrumentation Class
+class Instrumentation:
+    '''
+    Summary: Constructor to populate an instrumentation object
+    Parameter: summary_file - optional file the summary is written to at the end of a run, as JSON if its name ends in
+    .json and as CSV otherwise
+    '''
+    def __init__(self, summary_file=None):
+        self.summaryFile = summary_file
+        self.records = {}
+        self.instrumented = []
+
+    '''
+    Summary: Replace a method of an object with a wrapper recording its calls
+    Parameter: owner - the object whose method is instrumented
+    Parameter: name - the name of the method
+    Parameter: count_items - a function taking (arguments, result) and returning the number of items processed, or None
+    '''
+    def instrument_method(self, owner, name, count_items=None):
+        method = getattr(owner, name)
+        record = self.records.setdefault(name, StageRecord(name))
+        clock = time.perf_counter
+
+        @functools.wraps(method)
+        def instrumented(*args, **kwargs):
+            start = clock()
+            result = method(*args, **kwargs)
+            record.add(clock() - start, count_call_items(count_items, args, result))
+            return result
+
+        setattr(owner, name, instrumented)
+        self.instrumented.append((owner, name))
+
+    '''
+    Summary: Remove every wrapper installed by instrument_method, keeping the records
+    '''
+    def remove(self):
+        for owner, name in self.instrumented:
+            # The wrappers shadow the class methods on the object, so deleting them restores the methods
+            if name in vars(owner):
+                delattr(owner, name)
+        self.instrumented = []
+
+    '''
+    Summary: Clear the records, keeping the wrappers installed
+    '''
+    def reset(self):
+        for record in self.records.values():
+            record.clear()
+
+    '''
+    Summary: Return the record of every instrumented method that has been called, as a list of dicts
+    '''
+    def get_summary(self):
+        return [record.to_dict() for record in self.records.values() if record.calls > 0]
+
+    '''
+    Summary: Return the record of one method
+    Parameter: name - the name of the method
+    '''
+    def get_record(self, name):
+        return self.records[name]
+
+    '''
+    Summary: Write the summary as JSON
+    Parameter: output_file - the file to write the summary to
+    '''
+    def write_json(self, output_file):
+        with open(output_file, 'w') as file:
+            json.dump(self.get_summary(), file, indent=2)
+
+    '''
+    Summary: Write the summary as CSV, one row per method
+    Parameter: output_file - the file to write the summary to
+    '''
+    def write_csv(self, output_file):
+        columns = ["stage", "calls", "total_seconds", "mean_seconds", "min_seconds", "max_seconds", "items", "items_per_second"]
+        with open(output_file, 'w', newline='') as file:
+            writer = csv.DictWriter(file, fieldnames=columns)
+            writer.writeheader()
+            writer.writerows(self.get_summary())
+
+    '''
+    Summary: Write the summary to the summary file, if one was given
+    '''
+    def write_summary(self):
+        if self.summaryFile is None:
+            return
+        if self.summaryFile.lower().endswith(".json"):
+            self.write_json(self.summaryFile)
+        else:
+            self.write_csv(self.summaryFile)
@@ -0,0 +1,77 @@
+import re
+import sys
+import tracemalloc
+
+try:
+    import resource
+except ImportError:
+    # Not available on Windows; the resident memory is then reported as unavailable
+    resource = None
+
+# Memory Budget
+#
+# Helpers to keep a repeated simulation under a memory budget: the simulator
+# estimates a fixed cost and a cost per student, and the number of students
+# generated and observed at once is the largest that fits the budget. The peak
+# memory actually used is measured with tracemalloc over one replicate, and the
+# peak resident memory of the process (and of its worker processes) is read
+# from the operating system where it is available.
+
+UNITS = {"": 1, "B": 1, "K": 1 << 10, "KB": 1 << 10, "M": 1 << 20, "MB": 1 << 20, "G": 1 << 30, "GB": 1 << 30, "T": 1 << 40, "TB": 1 << 40}
+
+'''
+Summary: Parse a memory size such as "2G", "512MB" or "1000000" into a number of bytes (K, M, G and T are powers of 1024)
+Parameter: text - the memory size
+'''
+def parse_memory_size(text):
+    match = re.fullmatch(r"\s*(\d+(?:\.\d+)?)\s*([KMGT]?B?)\s*", str(text), re.IGNORECASE)
+    if match is None:
+        raise ValueError(f"invalid memory size {text!r}, expected a number of bytes optionally followed by K, M, G or T")
+    size = int(float(match.group(1)) * UNITS[match.group(2).upper()])
+    if size <= 0:
+        raise ValueError(f"memory size must be positive, got {text!r}")
+    return size
+
+'''
+Summary: Return the largest number of items processed at once that keeps every concurrent process under its share
+of the budget
+Parameter: budget - the memory budget in bytes, shared by every concurrent process
+Parameter: fixed_bytes - the memory each process needs whatever the number of items
+Parameter: bytes_per_item - the memory needed per item processed at once
+Parameter: number_of_items - the total number of items, the largest useful chunk
+Parameter: concurrency - the number of processes working at the same time
+'''
+def plan_chunk_size(budget, fixed_bytes, bytes_per_item, number_of_items, concurrency=1):
+    chunk_size = (budget // concurrency - fixed_bytes) // max(1, bytes_per_item)
+    if chunk_size < 1:
+        needed = concurrency * (fixed_bytes + bytes_per_item)
+        raise ValueError(f"a memory budget of {budget} bytes is too small for this simulation, at least {needed} bytes are needed")
+    return int(min(chunk_size, number_of_items))
+
+'''
+Summary: Call a function while tracing the memory allocated by Python and numpy, returning (result, peak bytes). The
+peak is None when tracing was already started by someone else, so their measurement is left alone.
+Parameter: function - the function to call
+Parameter: args - the arguments of the function
+'''
+def trace_peak_memory(function, *args):
+    if tracemalloc.is_tracing():
+        return function(*args), None
+    tracemalloc.start()
+    try:
+        result = function(*args)
+        return result, tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+'''
+Summary: Return the peak resident memory in bytes of this process, or of its largest finished worker process, or None
+where the operating system does not report it
+Parameter: children - whether to return the peak of the worker processes instead of this process
+'''
+def get_peak_resident_memory(children=False):
+    if resource is None:
+        return None
+    usage = resource.getrusage(resource.RUSAGE_CHILDREN if children else resource.RUSAGE_SELF)
+    # ru_maxrss is in bytes on macOS and in kilobytes elsewhere
+    return usage.ru_maxrss if sys.platform == "darwin" else usage.ru_maxrss * 1024
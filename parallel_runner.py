@@ -0,0 +1,134 @@
+import collections
+import functools
+import itertools
+import math
+from concurrent.futures import ProcessPoolExecutor
+import numpy as np
+import simulation_engine
+import replicate_store
+
+# Parallel Replicate Runner
+#
+# Every replicate draws from its own child of a master numpy SeedSequence, so a
+# replicate's result depends only on the master seed and its index. Splitting the
+# replicates over any number of worker processes therefore gives bit-identical
+# results, and the serial path of BROMPSimulator draws each replicate from the
+# same child stream with get_replicate_generator. Workers only send back per-replicate class level tallies and
+# percentages, never whole timelines; when a replicate store is given, each
+# worker writes its replicates' timelines straight into the memory-mapped file.
+
+'''
+Summary: Return the random generator of one replicate, drawing from the child of the master seed at the replicate's
+index; it is the same generator a worker uses for that replicate, so serial runs give the same results as any number of
+workers
+Parameter: seed - the master seed
+Parameter: replicate_index - the index of the replicate
+'''
+def get_replicate_generator(seed, replicate_index):
+    # Identical to SeedSequence(seed).spawn(n)[replicate_index] for any n > replicate_index
+    return np.random.default_rng(np.random.SeedSequence(seed, spawn_key=(replicate_index,)))
+
+'''
+Summary: Run a block of replicates and return their class level tallies and percentages
+Parameter: block - a tuple of (durations, counts, numberOfStudents, timesPerObservation, seed_sequences, store_file,
+first_replicate_index, students_per_chunk); store_file is None when the timelines are not kept, students_per_chunk is
+None to generate each class at once
+'''
+def run_replicate_block(block):
+    durations, counts, numberOfStudents, timesPerObservation, seed_sequences, store_file, first_replicate_index, students_per_chunk = block
+    store = replicate_store.open_replicate_store(store_file, mode='r+') if store_file is not None else None
+    number_of_events = len(durations)
+    tallies = np.zeros((len(seed_sequences), len(timesPerObservation), number_of_events), dtype=np.int64)
+    percentages = np.zeros((len(seed_sequences), len(timesPerObservation), number_of_events))
+    for replicate_index, seed_sequence in enumerate(seed_sequences):
+        generator = np.random.default_rng(seed_sequence)
+        if students_per_chunk is not None:
+            write_rows = None if store is None else functools.partial(store.write_replicate, first_replicate_index + replicate_index)
+            all_student_tallies = simulation_engine.compute_chunked_observation_tallies(durations, counts, numberOfStudents, students_per_chunk,
+                timesPerObservation, generator, write_rows)
+        elif store is not None:
+            state_matrix = simulation_engine.generate_state_matrix(durations, counts, numberOfStudents, generator)
+            store.write_replicate(first_replicate_index + replicate_index, state_matrix)
+            all_student_tallies = simulation_engine.compute_all_observation_tallies(state_matrix, timesPerObservation, number_of_events)
+        else:
+            # Same draws as the state matrix, but only the sampled time units are looked up
+            episode_boundaries = simulation_engine.generate_episode_boundaries(durations, counts, numberOfStudents, generator)
+            all_student_tallies = episode_boundaries.compute_all_observation_tallies(timesPerObservation, number_of_events)
+        tallies[replicate_index], percentages[replicate_index] = simulation_engine.compute_class_level_arrays(all_student_tallies)
+    if store is not None:
+        store.close()
+    return tallies, percentages
+
+'''
+Summary: Run replicates over a process pool, yielding the (replicates x intervals x events) class tallies and percentages
+of each block of replicates in replicate order as soon as it is available
+Parameter: registry - the EventRegistry of the simulation
+Parameter: timesPerObservation - the times per observation to evaluate
+Parameter: numberOfStudents - the number of students in the class
+Parameter: totalObservationTime - the total observation time of the simulation
+Parameter: number_of_simulations - the number of replicates to run
+Parameter: seed - the master seed; None draws fresh entropy from the operating system
+Parameter: workers - the number of worker processes, 1 runs every replicate in this process
+Parameter: store_file - an existing replicate store to write every replicate's timelines to, None to discard them
+Parameter: first_replicate - the index of the first replicate to run, to resume an interrupted run
+Parameter: students_per_chunk - the number of students each worker generates and observes at once, None for the whole class
+Parameter: max_block_size - the largest number of replicates in a block, None for about four blocks per worker. When it is
+set, blocks are only submitted as earlier ones finish, with one block per worker running at a time, so a caller that
+stops early (for example once a precision target is reached) waits for and discards at most one block per worker
+'''
+def iterate_parallel_replicates(registry, timesPerObservation, numberOfStudents, totalObservationTime, number_of_simulations, seed=None, workers=1, store_file=None, first_replicate=0, students_per_chunk=None, max_block_size=None):
+    durations = registry.get_durations()
+    counts = registry.compute_episode_counts(totalObservationTime)
+    timesPerObservation = list(timesPerObservation)
+    # Drawn once, so that without a seed every block still spawns from the same master entropy
+    entropy = np.random.SeedSequence(seed).entropy
+    blocks = ((durations, counts, numberOfStudents, timesPerObservation, [np.random.SeedSequence(entropy, spawn_key=(index,)) for index in range(start, end)],
+        store_file, start, students_per_chunk) for start, end in split_replicates(number_of_simulations, workers, first_replicate, max_block_size))
+
+    return map_blocks(run_replicate_block, blocks, workers, None if max_block_size is None else workers)
+
+'''
+Summary: Split a number of replicates into contiguous (start, end) ranges, about four per worker so that the work
+stays balanced when some blocks run slower than others
+Parameter: number_of_simulations - the number of replicates
+Parameter: workers - the number of worker processes
+Parameter: first_replicate - the index of the first replicate to run
+Parameter: max_block_size - the largest number of replicates in a range, None for no limit
+'''
+def split_replicates(number_of_simulations, workers, first_replicate=0, max_block_size=None):
+    block_size = max(1, math.ceil((number_of_simulations - first_replicate) / (4 * workers)))
+    if max_block_size is not None:
+        block_size = min(block_size, max_block_size)
+    return [(start, min(start + block_size, number_of_simulations)) for start in range(first_replicate, number_of_simulations, block_size)]
+
+'''
+Summary: Apply a function to every block, in this process or over a process pool, yielding the results in block order
+as soon as they are available
+Parameter: function - a picklable module level function taking one block
+Parameter: blocks - the blocks to process
+Parameter: workers - the number of worker processes, 1 runs every block in this process
+Parameter: max_in_flight - the largest number of blocks submitted to the pool and not yet yielded, None to submit every
+block at once; blocks are then only taken from the iterable as earlier ones finish
+'''
+def map_blocks(function, blocks, workers=1, max_in_flight=None):
+    if workers == 1:
+        for block in blocks:
+            yield function(block)
+    else:
+        executor = ProcessPoolExecutor(max_workers=workers)
+        try:
+            if max_in_flight is None:
+                for result in executor.map(function, blocks):
+                    yield result
+            else:
+                blocks = iter(blocks)
+                pending = collections.deque(executor.submit(function, block) for block in itertools.islice(blocks, max_in_flight))
+                while pending:
+                    result = pending.popleft().result()
+                    # Keep the workers busy while the caller handles this result
+                    pending.extend(executor.submit(function, block) for block in itertools.islice(blocks, 1))
+                    yield result
+        finally:
+            # If the caller stops early, the blocks that have not started are dropped and only the running ones are
+            # waited for; not waiting at all leaves the pool to be torn down at interpreter exit, which can fail
+            executor.shutdown(wait=True, cancel_futures=True)
@@ -0,0 +1,136 @@
+import numpy as np
+import simulation_engine
+import parallel_runner
+from cumulative_statistics import RunningStatistics
+
+# Parameter Sweep
+#
+# Evaluates a grid of designs (number of students x total observation time x
+# time per observation) in one job, using common random numbers: every design
+# sees the same simulated classes, so the differences between designs are not
+# buried under replicate noise, and the timelines are generated once instead of
+# once per design.
+#
+# For each replicate and total observation time, a single state matrix is built
+# for the largest class of the grid. A design with fewer students observes the
+# first rows of that matrix (the rows are independent students, so any subset
+# of rows is a valid smaller class), and all its times per observation are
+# tallied with one gather. Every total observation time reuses the replicate's
+# seed, so a replicate draws from the same random stream in every design.
+#
+# The results are written as one table with a row per (design, event).
+
+'''
+Summary: Run a block of replicates over the whole grid and return their class level tallies and percentages as
+(replicates x observation times x student counts x intervals x events) arrays
+Parameter: block - a tuple of (durations, counts of every total observation time, student counts, timesPerObservation,
+seed_sequences)
+'''
+def run_sweep_block(block):
+    durations, counts_by_time, studentCounts, timesPerObservation, seed_sequences = block
+    number_of_events = len(durations)
+    shape = (len(seed_sequences), len(counts_by_time), len(studentCounts), len(timesPerObservation), number_of_events)
+    tallies = np.zeros(shape, dtype=np.int64)
+    percentages = np.zeros(shape)
+    largest_class = max(studentCounts)
+    for replicate_index, seed_sequence in enumerate(seed_sequences):
+        for time_index, counts in enumerate(counts_by_time):
+            generator = np.random.default_rng(seed_sequence)
+            state_matrix = simulation_engine.generate_state_matrix(durations, counts, largest_class, generator)
+            for student_index, numberOfStudents in enumerate(studentCounts):
+                student_tallies = simulation_engine.compute_all_observation_tallies(state_matrix[:numberOfStudents], timesPerObservation, number_of_events)
+                class_tallies, class_percentages = simulation_engine.compute_class_level_arrays(student_tallies)
+                tallies[replicate_index, time_index, student_index] = class_tallies
+                percentages[replicate_index, time_index, student_index] = class_percentages
+    return tallies, percentages
+
+# Parameter Sweep Class
+class ParameterSweep:
+    '''
+    Summary: Constructor to populate a parameter sweep object
+    Parameter: events - the events of the simulation
+    Parameter: timesPerObservation - the times per observation to evaluate
+    Parameter: studentCounts - the numbers of students to evaluate
+    Parameter: totalObservationTimes - the total observation times to evaluate
+    Parameter: seed - optional seed making the sweep reproducible, None to seed from the operating system
+    Parameter: workers - number of worker processes, None to run the replicates serially
+    '''
+    def __init__(self, events, timesPerObservation, studentCounts, totalObservationTimes, seed=None, workers=None):
+        self.events = events
+        self.registry = simulation_engine.EventRegistry(events)
+        self.timesPerObservation = list(timesPerObservation)
+        self.studentCounts = list(studentCounts)
+        self.totalObservationTimes = list(totalObservationTimes)
+        self.seed = seed
+        self.workers = workers
+        self.seedEntropy = np.random.SeedSequence(seed).entropy
+
+    '''
+    Summary: Return the number of designs in the grid
+    '''
+    def get_number_of_designs(self):
+        return len(self.totalObservationTimes) * len(self.studentCounts) * len(self.timesPerObservation)
+
+    '''
+    Summary: Run replicates over the whole grid, yielding the class tallies and percentages of each block of replicates
+    in replicate order
+    Parameter: number_of_simulations - the number of replicates of every design
+    '''
+    def iterate_blocks(self, number_of_simulations):
+        durations = self.registry.get_durations()
+        counts_by_time = [self.registry.compute_episode_counts(totalObservationTime) for totalObservationTime in self.totalObservationTimes]
+        seed_sequences = np.random.SeedSequence(self.seedEntropy).spawn(number_of_simulations)
+        workers = self.workers or 1
+        blocks = []
+        for start, end in parallel_runner.split_replicates(number_of_simulations, workers):
+            blocks.append((durations, counts_by_time, self.studentCounts, self.timesPerObservation, seed_sequences[start:end]))
+        return parallel_runner.map_blocks(run_sweep_block, blocks, workers)
+
+    '''
+    Summary: Run the sweep and write the consolidated table
+    Parameter: output_file - the CSV file to write the table to
+    Parameter: number_of_simulations - the number of replicates of every design
+    Returns the number of replicates run
+    '''
+    def run(self, output_file, number_of_simulations):
+        shape = (len(self.totalObservationTimes), len(self.studentCounts), len(self.timesPerObservation), len(self.events))
+        tally_statistics = RunningStatistics(shape)
+        percentage_statistics = RunningStatistics(shape)
+        for tallies, percentages in self.iterate_blocks(number_of_simulations):
+            # One replicate at a time, so the statistics do not depend on the number of workers
+            for replicate_tallies, replicate_percentages in zip(tallies, percentages):
+                tally_statistics.update(replicate_tallies)
+                percentage_statistics.update(replicate_percentages)
+        self.output_results(tally_statistics, percentage_statistics, output_file)
+        return tally_statistics.get_count()
+
+    '''
+    Summary: Write one row per design and event with the statistics of its class tallies and percentages, and the bias
+    and root mean squared error of the percentage against the target percentage
+    Parameter: tally_statistics - the RunningStatistics of the class tallies
+    Parameter: percentage_statistics - the RunningStatistics of the class percentages
+    Parameter: output_file - the CSV file to write the table to
+    '''
+    def output_results(self, tally_statistics, percentage_statistics, output_file):
+        target_percentages = self.registry.get_proportions() / float(100)
+        average_percentages = percentage_statistics.get_mean()
+        bias = average_percentages - target_percentages
+        count = percentage_statistics.get_count()
+        rmse = np.sqrt(percentage_statistics.m2 / count + bias ** 2) if count else np.full(bias.shape, np.nan)
+        columns = [tally_statistics.get_mean(), tally_statistics.get_std(), average_percentages, percentage_statistics.get_std(), bias, rmse]
+        columns = [column.tolist() for column in columns]
+        target_percentages = target_percentages.tolist()
+        names = self.registry.get_names()
+        lines = ["students,total observation time,time per observation,event,average tally,std tally,average percentage,std percentage,target percentage,bias,rmse\r\n"]
+        for time_index, totalObservationTime in enumerate(self.totalObservationTimes):
+            for student_index, numberOfStudents in enumerate(self.studentCounts):
+                for interval_index, time_per_observation in enumerate(self.timesPerObservation):
+                    for event_index, name in enumerate(names):
+                        values = [column[time_index][student_index][interval_index][event_index] for column in columns]
+                        row = [str(numberOfStudents), str(totalObservationTime), str(time_per_observation), name]
+                        row.extend(str(value) for value in values[:4])
+                        row.append(str(target_percentages[event_index]))
+                        row.extend(str(value) for value in values[4:])
+                        lines.append(",".join(row) + "\r\n")
+        with open(output_file, 'w') as file:
+            file.write("".join(lines))
@@ -0,0 +1,189 @@
+import argparse
+import multiprocessing
+import sys
+import memory_budget
+from simulation_core import Event, BROMPSimulator, load_simulator_from_store
+from parameter_sweep import ParameterSweep
+
+# Headless batch entry point
+#
+# Runs a simulation from explicit command line parameters without importing
+# tkinter, so it can be launched on compute nodes and from job schedulers.
+#
+# Example:
+#   python possums_batch.py --event on-task 20 70 --event off-task 10 30 \
+#       --students 30 --observation-time 3600 --time-per-observation 20 40 \
+#       --simulations 1000 --output results.csv --store-timelines class.possums
+#
+# Stored timelines can then be re-analysed with other times per observation:
+#   python possums_batch.py --analyze-store class.possums \
+#       --time-per-observation 10 60 --output reanalysis.csv
+#
+# A grid of designs is evaluated in one job, on shared timelines, with --sweep:
+#   python possums_batch.py --sweep --event on-task 20 70 --event off-task 10 30 \
+#       --students 10 20 30 --observation-time 1800 3600 \
+#       --time-per-observation 10 20 40 --simulations 1000 --output sweep.csv
+#
+# A design is screened in milliseconds, without simulating, with --analytical,
+# and --validate-analytical --simulations 1000 compares that estimate with
+# the simulations of the same design.
+
+'''
+Summary: Validate and build an event from the values given on the command line, using the same rules as the GUI
+Parameter: parser - the argument parser used to report invalid values
+Parameter: values - the name, duration and proportion of the event
+'''
+def parse_event(parser, values):
+    name, duration, proportion = values
+    try:
+        proportion_value = float(proportion)
+    except ValueError:
+        parser.error(f"event {name}: proportion must be a number, got {proportion!r}")
+    if not (0 < proportion_value <= 100):
+        parser.error(f"event {name}: proportion must be in (0, 100], got {proportion}")
+    if not (duration.isdigit() and int(duration) > 0):
+        parser.error(f"event {name}: duration must be a positive integer, got {duration!r}")
+    return Event(name, duration, proportion)
+
+'''
+Summary: Build the command line argument parser
+'''
+def build_parser():
+    parser = argparse.ArgumentParser(description="Run a POSSUMS momentary time sampling simulation without the GUI.")
+    parser.add_argument("--event", nargs=3, action="append", metavar=("NAME", "DURATION", "PROPORTION"),
+        help="an event with its duration in time units and its proportion in percent; repeat for each event")
+    parser.add_argument("--time-per-observation", nargs="+", type=int, required=True, metavar="TIME",
+        help="one or more times per observation")
+    parser.add_argument("--students", nargs="+", type=int, help="number of students; several values with --sweep")
+    parser.add_argument("--observation-time", nargs="+", type=int, help="total observation time; several values with --sweep")
+    parser.add_argument("--simulations", type=int, default=None,
+        help="number of repeated simulations; omit to run a single simulation")
+    parser.add_argument("--output", required=True, help="CSV file to write the results to")
+    parser.add_argument("--engine", choices=["list", "matrix", "runlength", "sampled"], default="matrix",
+        help="timeline representation (default: matrix)")
+    parser.add_argument("--seed", type=int, default=None, help="seed for reproducible runs")
+    parser.add_argument("--workers", type=int, default=None,
+        help="number of worker processes for repeated simulations (default: run serially)")
+    parser.add_argument("--store-timelines", metavar="STORE", default=None,
+        help="keep the timelines of every repeated simulation in this memory-mapped replicate store")
+    parser.add_argument("--analyze-store", metavar="STORE", default=None,
+        help="analyse the times per observation against the timelines of an existing replicate store instead of simulating")
+    parser.add_argument("--checkpoint", metavar="FILE", default=None,
+        help="save progress of repeated simulations to this file and resume from it if it already exists")
+    parser.add_argument("--checkpoint-interval", type=int, default=1000,
+        help="number of replicates between two checkpoints (default: 1000)")
+    parser.add_argument("--tolerance", type=float, default=None,
+        help="stop repeated simulations early once the confidence interval of every reported average and std is at most "
+        "this wide on each side, as a fraction of the observations; --simulations is then the maximum")
+    parser.add_argument("--confidence", type=float, default=0.95, help="confidence level used with --tolerance (default: 0.95)")
+    parser.add_argument("--batch-size", type=int, default=100,
+        help="number of replicates between two precision checks with --tolerance (default: 100)")
+    parser.add_argument("--memory-budget", metavar="SIZE", default=None,
+        help="keep repeated simulations under this much memory, for example 2G or 512M, by generating and observing each "
+        "class a chunk of students at a time; the peak memory used is written to the output")
+    parser.add_argument("--profile", metavar="FILE", default=None,
+        help="record the calls, time and items processed of every simulation stage and write the summary to this file, "
+        "as JSON if it ends in .json and as CSV otherwise")
+    parser.add_argument("--analytical", action="store_true",
+        help="write an analytical estimate of the average and std of every tally and percentage instead of simulating")
+    parser.add_argument("--validate-analytical", action="store_true",
+        help="run --simulations repeated simulations and write how far the analytical estimate is from them")
+    parser.add_argument("--sweep", action="store_true",
+        help="evaluate every combination of --students, --observation-time and --time-per-observation on shared timelines "
+        "and write one table with a row per design and event")
+    return parser
+
+'''
+Summary: Parse the command line and run the simulation
+Parameter: argv - the command line arguments, None to use sys.argv
+'''
+def main(argv=None):
+    parser = build_parser()
+    args = parser.parse_args(argv)
+    if any(time_per_observation <= 0 for time_per_observation in args.time_per_observation):
+        parser.error("--time-per-observation values must be positive")
+    if args.analyze_store is not None:
+        try:
+            simulator = load_simulator_from_store(args.analyze_store, args.time_per_observation)
+            simulator.analyze_replicate_store(args.analyze_store, args.output)
+        except (OSError, ValueError) as error:
+            # A missing, damaged or empty store is reported like any other invalid argument
+            parser.error(f"--analyze-store: {error}")
+        return 0
+
+    if not args.event:
+        parser.error("at least one --event is required")
+    if args.students is None or any(students <= 0 for students in args.students):
+        parser.error("--students must be given and positive")
+    if args.observation_time is None or any(observation_time <= 0 for observation_time in args.observation_time):
+        parser.error("--observation-time must be given and positive")
+    if not args.sweep and (len(args.students) > 1 or len(args.observation_time) > 1):
+        parser.error("several --students or --observation-time values require --sweep")
+    if args.store_timelines is not None and args.simulations is None:
+        parser.error("--store-timelines requires --simulations")
+    events = [parse_event(parser, values) for values in args.event]
+    if args.simulations is not None and args.simulations <= 0:
+        parser.error("--simulations must be positive")
+    if args.workers is not None and args.workers <= 0:
+        parser.error("--workers must be positive")
+    if args.checkpoint is not None and args.simulations is None:
+        parser.error("--checkpoint requires --simulations")
+    if args.checkpoint_interval <= 0:
+        parser.error("--checkpoint-interval must be positive")
+    if args.tolerance is not None:
+        if args.simulations is None:
+            parser.error("--tolerance requires --simulations")
+        if args.tolerance <= 0:
+            parser.error("--tolerance must be positive")
+        if not 0 < args.confidence < 1:
+            parser.error("--confidence must be between 0 and 1")
+        if args.batch_size < 2:
+            parser.error("--batch-size must be at least 2")
+        if args.store_timelines is not None or args.sweep:
+            parser.error("--tolerance cannot be combined with --store-timelines or --sweep")
+    memory_budget_bytes = None
+    if args.memory_budget is not None:
+        try:
+            memory_budget_bytes = memory_budget.parse_memory_size(args.memory_budget)
+        except ValueError as error:
+            parser.error(f"--memory-budget: {error}")
+        if args.simulations is None or args.sweep:
+            parser.error("--memory-budget requires --simulations and cannot be combined with --sweep")
+    if args.analytical or args.validate_analytical:
+        if args.analytical and args.validate_analytical:
+            parser.error("--analytical and --validate-analytical cannot be combined")
+        if args.validate_analytical and args.simulations is None:
+            parser.error("--validate-analytical requires --simulations")
+        if args.sweep or args.store_timelines is not None or args.checkpoint is not None or args.profile is not None:
+            parser.error("--analytical and --validate-analytical cannot be combined with --sweep, --store-timelines, --checkpoint or --profile")
+    if args.sweep:
+        if args.simulations is None:
+            parser.error("--sweep requires --simulations")
+        if args.store_timelines is not None or args.checkpoint is not None or args.profile is not None:
+            parser.error("--sweep cannot be combined with --store-timelines, --checkpoint or --profile")
+        sweep = ParameterSweep(events, args.time_per_observation, args.students, args.observation_time, seed=args.seed, workers=args.workers)
+        sweep.run(args.output, args.simulations)
+        return 0
+
+    simulator = BROMPSimulator(events, args.time_per_observation, args.students[0], args.observation_time[0],
+        engine=args.engine, seed=args.seed, workers=args.workers)
+    simulator.set_precision_target(args.tolerance, args.confidence, args.batch_size)
+    simulator.set_memory_budget(memory_budget_bytes)
+    try:
+        simulator.get_students_per_chunk(args.store_timelines is not None)
+    except ValueError as error:
+        parser.error(f"--memory-budget: {error}")
+    if args.analytical:
+        simulator.run_analytical_estimate(args.output)
+        return 0
+    if args.validate_analytical:
+        simulator.validate_analytical_estimate(args.output, args.simulations)
+        return 0
+    if args.profile is not None:
+        simulator.enable_instrumentation(args.profile)
+    simulator.run(args.output, args.simulations, args.store_timelines, args.checkpoint, args.checkpoint_interval)
+    return 0
+
+if __name__ == "__main__":
+    multiprocessing.freeze_support()
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import json
+import os
+import struct
+import numpy as np
+
+# Replicate Store
+#
+# A replicate store keeps the integer-coded state matrix of every replicate of a
+# repeated simulation in one file so that new times per observation can be
+# analysed later without regenerating the timelines. The file starts with a
+# small header:
+#
+#   8 bytes  magic "POSSUMS1"
+#   4 bytes  little-endian length of the JSON metadata
+#   JSON     metadata (dtype, shape, events, students, observation time, seed,
+#            completed replicates), padded with spaces so the data starts on
+#            a 64 byte boundary
+#
+# followed by a C-ordered (replicates x students x time) array that is accessed
+# through numpy.memmap, so any replicate can be read without loading the file.
+#
+# The file is sized for every replicate up front. The number of replicates
+# actually written is kept in the header and updated in place as the run goes,
+# so a cancelled or interrupted run leaves a store whose remaining replicates
+# are known to be empty. Stores written without the count are complete.
+
+MAGIC = b"POSSUMS1"
+ALIGNMENT = 64
+
+# Replicate Store Class
+class ReplicateStore:
+    '''
+    Summary: Constructor to populate a replicate store object; use create_replicate_store or open_replicate_store
+    Parameter: path - the file backing the store
+    Parameter: metadata - the metadata read from or written to the header
+    Parameter: states - the memory-mapped (replicates x students x time) array
+    '''
+    def __init__(self, path, metadata, states):
+        self.path = path
+        self.metadata = metadata
+        self.states = states
+
+    '''
+    Summary: Return the number of replicates in the store
+    '''
+    def __len__(self):
+        return self.states.shape[0]
+
+    '''
+    Summary: Return the metadata of the store
+    '''
+    def get_metadata(self):
+        return self.metadata
+
+    '''
+    Summary: Return the (name, duration, proportion) of every stored event, indexed by event code
+    '''
+    def get_events(self):
+        return [(event["name"], event["duration"], event["proportion"]) for event in self.metadata["events"]]
+
+    '''
+    Summary: Return the number of replicates written so far; only these hold timelines
+    '''
+    def get_completed(self):
+        return self.metadata.get("completed", len(self))
+
+    '''
+    Summary: Record the number of replicates written so far in the header, after flushing them to disk
+    Parameter: completed - the number of replicates written, which are the first ones of the store
+    '''
+    def set_completed(self, completed):
+        self.flush()
+        set_completed_replicates(self.path, completed)
+        self.metadata["completed"] = completed
+
+    '''
+    Summary: Return the memory-mapped state matrix of one replicate
+    Parameter: replicate_index - the index of the replicate
+    '''
+    def get_replicate(self, replicate_index):
+        return self.states[replicate_index]
+
+    '''
+    Summary: Store the state matrix of one replicate, or of a chunk of its students
+    Parameter: replicate_index - the index of the replicate
+    Parameter: state_matrix - the (students x time) integer-coded states of the replicate or of the chunk
+    Parameter: first_student - the index of the first student of the chunk
+    '''
+    def write_replicate(self, replicate_index, state_matrix, first_student=0):
+        self.states[replicate_index, first_student:first_student + len(state_matrix)] = state_matrix
+
+    '''
+    Summary: Flush pending writes to disk
+    '''
+    def flush(self):
+        if isinstance(self.states, np.memmap) and self.states.mode != 'r':
+            self.states.flush()
+
+    '''
+    Summary: Flush and release the memory map
+    '''
+    def close(self):
+        self.flush()
+        self.states = None
+
+'''
+Summary: Return the bytes of a store header holding the given metadata
+Parameter: metadata - the metadata to encode
+Parameter: reserve - the number of spaces kept free for the metadata to grow when it is rewritten
+Parameter: metadata_length - the exact length of the padded metadata, to rewrite the header of an existing store;
+None pads the metadata so the data starts on an aligned boundary
+'''
+def encode_header(metadata, reserve=0, metadata_length=None):
+    encoded_metadata = json.dumps(metadata).encode("utf-8")
+    if metadata_length is None:
+        header_length = len(MAGIC) + 4 + len(encoded_metadata) + reserve
+        metadata_length = len(encoded_metadata) + reserve + (-header_length) % ALIGNMENT
+    elif len(encoded_metadata) > metadata_length:
+        raise ValueError("the metadata no longer fits in the header of the replicate store")
+    encoded_metadata += b" " * (metadata_length - len(encoded_metadata))
+    return MAGIC + struct.pack("<I", len(encoded_metadata)) + encoded_metadata
+
+'''
+Summary: Read the metadata and the data offset from the header of a store file
+Parameter: path - the file backing the store
+'''
+def read_header(path):
+    with open(path, 'rb') as file:
+        magic = file.read(len(MAGIC))
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a POSSUMS replicate store")
+        try:
+            (metadata_length,) = struct.unpack("<I", file.read(4))
+            metadata = json.loads(file.read(metadata_length).decode("utf-8"))
+        except (struct.error, ValueError):
+            raise ValueError(f"{path} has a damaged replicate store header") from None
+    return metadata, len(MAGIC) + 4 + metadata_length
+
+'''
+Summary: Create a new replicate store file, sized for every replicate up front
+Parameter: path - the file backing the store
+Parameter: registry - the EventRegistry of the simulation
+Parameter: number_of_simulations - the number of replicates to store
+Parameter: numberOfStudents - the number of students in the class
+Parameter: timeline_length - the number of time units of each student timeline
+Parameter: totalObservationTime - the total observation time of the simulation
+Parameter: seed - the seed of the simulation, None if it was not seeded
+'''
+def create_replicate_store(path, registry, number_of_simulations, numberOfStudents, timeline_length, totalObservationTime, seed=None):
+    dtype = np.dtype(registry.code_dtype)
+    events = []
+    for event in registry.events:
+        events.append({"name": event.get_name(), "duration": str(event.get_duration()), "proportion": str(event.get_proportion())})
+    metadata = {
+        "version": 1,
+        "dtype": dtype.str,
+        "shape": [number_of_simulations, numberOfStudents, timeline_length],
+        "events": events,
+        "numberOfStudents": numberOfStudents,
+        "totalObservationTime": totalObservationTime,
+        "seed": seed,
+        "completed": 0,
+    }
+    # Room for the completed count to grow up to number_of_simulations
+    header = encode_header(metadata, reserve=len(str(number_of_simulations)))
+    with open(path, 'wb') as file:
+        file.write(header)
+        file.truncate(len(header) + number_of_simulations * numberOfStudents * timeline_length * dtype.itemsize)
+    return open_replicate_store(path, mode='r+')
+
+'''
+Summary: Rewrite the number of completed replicates in the header of a store file, in place
+Parameter: path - the file backing the store
+Parameter: completed - the number of replicates written, which are the first ones of the store
+'''
+def set_completed_replicates(path, completed):
+    metadata, offset = read_header(path)
+    metadata["completed"] = completed
+    header = encode_header(metadata, metadata_length=offset - len(MAGIC) - 4)
+    with open(path, 'r+b') as file:
+        file.write(header)
+        file.flush()
+        os.fsync(file.fileno())
+
+'''
+Summary: Open an existing replicate store file
+Parameter: path - the file backing the store
+Parameter: mode - 'r' to read the replicates, 'r+' to also write them
+'''
+def open_replicate_store(path, mode='r'):
+    metadata, offset = read_header(path)
+    shape = tuple(metadata["shape"])
+    if 0 in shape:
+        states = np.zeros(shape, dtype=np.dtype(metadata["dtype"]))
+    else:
+        states = np.memmap(path, dtype=np.dtype(metadata["dtype"]), mode=mode, offset=offset, shape=shape)
+    return ReplicateStore(path, metadata, states)
@@ -0,0 +1,1018 @@
+import os
+import math
+import time
+import numpy as np
+import simulation_engine
+import parallel_runner
+import cumulative_statistics
+import replicate_store
+import checkpointing
+import instrumentation
+import memory_budget
+import analytical_model
+
+# Event Class
+class Event:
+    __slots__ = ("name", "duration", "proportion", "duration_value", "proportion_value")
+
+    '''
+    Summary: Constructor to population an event object. The duration and proportion are kept as given and are also
+    parsed once into numbers
+    '''
+    def __init__(self, name, duration, proportion):
+        self.name = name
+        self.duration = duration
+        self.proportion = proportion
+        self.duration_value = int(duration)
+        self.proportion_value = float(proportion)
+
+    '''
+    Summary: Return the name of the event
+    '''
+    def get_name(self):
+        return self.name
+
+    '''
+    Summary: Return the duration of the event
+    '''
+    def get_duration(self):
+        return self.duration
+
+    '''
+    Summary: Return the proportion of the event
+    '''
+    def get_proportion(self):
+        return self.proportion
+
+    '''
+    Summary: Return the duration of the event as an integer number of time units
+    '''
+    def get_duration_value(self):
+        return self.duration_value
+
+    '''
+    Summary: Return the proportion of the event as a number of percent
+    '''
+    def get_proportion_value(self):
+        return self.proportion_value
+
+    '''
+    Summary: Return a formatted string representation of an event
+    '''
+    def __str__(self):
+        return f"{self.name} - {self.duration} - {self.proportion}"
+
+# Run Event Data Class
+class ClassRunEventData:
+    __slots__ = ("total_tally", "percentage")
+
+    '''
+    Summary: Constructor to populate a run event data class object
+    '''
+    def __init__(self, total_tally, percentage):
+        self.total_tally = total_tally
+        self.percentage = percentage
+
+    '''
+    Summary: Return the total tally of the event's data
+    '''
+    def get_total_tally(self):
+        return self.total_tally
+
+    '''
+    Summary: Return the percentage
+    '''
+    def get_percentage(self):
+        return self.percentage
+
+# Class Run Results Class
+class ClassRunResults:
+    '''
+    Summary: Constructor to populate the class level results of one run, stored as arrays indexed by event code
+    Parameter: registry - the EventRegistry of the simulation
+    Parameter: total_tallies - the total class tally of each event
+    Parameter: percentages - the class average percentage of each event
+    '''
+    def __init__(self, registry, total_tallies, percentages):
+        self.registry = registry
+        self.total_tallies = total_tallies
+        self.percentages = percentages
+
+    '''
+    Summary: Return the total class tally of every event
+    '''
+    def get_total_tallies(self):
+        return self.total_tallies
+
+    '''
+    Summary: Return the class average percentage of every event
+    '''
+    def get_percentages(self):
+        return self.percentages
+
+    '''
+    Summary: Return the ClassRunEventData of a single event
+    Parameter: event - the event to look up
+    '''
+    def __getitem__(self, event):
+        event_index = self.registry.get_code(event)
+        return ClassRunEventData(int(self.total_tallies[event_index]), float(self.percentages[event_index]))
+
+# Simulator Class
+class BROMPSimulator:
+    '''
+    Summary: Constructor to populate a simulator object
+    Parameter: engine - "list" to build one Event list per student, "matrix" to build an integer-coded numpy matrix for the class,
+    "runlength" to build one run-length encoded timeline per student, "sampled" to build only the episode boundaries of the
+    class and look up the sampled time units, so the work per replicate follows the number of episodes and observations
+    rather than students x total observation time
+    Parameter: seed - optional seed making the generated timelines reproducible, None to seed from the operating system.
+    Every replicate of a repeated simulation draws from its own stream spawned from the seed, so a seed gives the same
+    results with or without workers, and with every engine
+    Parameter: workers - number of worker processes used for repeated simulations, None to run the replicates serially
+    '''
+    def __init__(self, events, timesPerObservation, numberOfStudents, totalObservationTime, engine="list", seed=None, workers=None):
+        self.events = events
+        self.registry = simulation_engine.EventRegistry(events)
+        self.timesPerObservation = timesPerObservation
+        self.numberOfStudents = numberOfStudents
+        self.totalObservationTime = totalObservationTime
+        self.engine = engine
+        self.seed = seed
+        self.workers = workers
+        self.numpyGenerator = np.random.default_rng(seed)
+        self.seedEntropy = np.random.SeedSequence(seed).entropy
+        self.progressCallback = None
+        self.cancelEvent = None
+        self.tolerance = None
+        self.confidence = 0.95
+        self.batchSize = 100
+        self.instrumentation = None
+        self.memoryBudget = None
+        self.memoryReport = None
+
+    '''
+    Summary: Set how repeated simulations report progress and are cancelled, typically from another thread
+    Parameter: progress_callback - called with (completed replicates, total replicates) as replicates finish, or None
+    Parameter: cancel_event - a threading.Event; once set, the run stops after the replicates in progress and writes the
+    results of the completed replicates. None disables cancellation
+    '''
+    def set_progress_monitor(self, progress_callback=None, cancel_event=None):
+        self.progressCallback = progress_callback
+        self.cancelEvent = cancel_event
+
+    '''
+    Summary: Make repeated simulations stop early, once every reported statistic is precise enough. The replicates run
+    in batches and after each batch the confidence interval of every average and std of the tallies and percentages is
+    checked; the run stops when none is wider than the tolerance, or after number_of_simulations replicates.
+    Parameter: tolerance - the largest accepted confidence interval half width, as a fraction of the observations (the
+    unit of the percentage columns; tallies are divided by the number of observations). None always runs every replicate
+    Parameter: confidence - the confidence level of the intervals
+    Parameter: batch_size - the number of replicates between two precision checks, at least 2
+    '''
+    def set_precision_target(self, tolerance=None, confidence=0.95, batch_size=100):
+        if tolerance is not None and tolerance <= 0:
+            raise ValueError("tolerance must be positive")
+        if not 0 < confidence < 1:
+            raise ValueError("confidence must be between 0 and 1")
+        if batch_size < 2:
+            raise ValueError("batch_size must be at least 2")
+        self.tolerance = tolerance
+        self.confidence = confidence
+        self.batchSize = batch_size
+
+    '''
+    Summary: Return whether a precision target is set and was reached by the replicates added so far; only checked at
+    the end of a batch, so the number of replicates run does not depend on the number of workers
+    Parameter: cumulative_results - the results accumulated so far
+    '''
+    def is_precision_reached(self, cumulative_results):
+        if self.tolerance is None or cumulative_results.get_count() % self.batchSize != 0:
+            return False
+        return cumulative_results.get_largest_half_width(self.confidence) <= self.tolerance
+
+    '''
+    Summary: Keep repeated simulations under a memory budget. The memory a replicate needs is estimated from the class
+    and the session; when the whole class does not fit, each replicate is generated and observed a chunk of
+    students at a time, with the largest chunk that fits, and only one chunk of timelines is held at once. A seeded run
+    gives the same results whatever the chunk size. With workers, the budget is shared by the worker processes. The
+    peak memory actually used is reported in the output.
+    Parameter: max_bytes - the memory budget in bytes, None for no budget
+    '''
+    def set_memory_budget(self, max_bytes=None):
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("memory budget must be positive")
+        self.memoryBudget = max_bytes
+
+    '''
+    Summary: Return the estimated (fixed bytes, bytes per student) of generating and observing one replicate under a
+    memory budget: the observation schedules and class tallies, and the timelines and sampled time units of every student
+    held at once. Under a budget every engine runs compute_chunked_observation_tallies, so the timelines are estimated as
+    the episode boundaries, or the state matrices when they are kept, that it builds
+    Parameter: keep_timelines - whether the timelines are built as state matrices to be written to a replicate store
+    '''
+    def get_memory_requirements(self, keep_timelines=False):
+        timeline_length = self.get_timeline_length()
+        episodes = int(self.registry.compute_episode_counts(self.totalObservationTime).sum())
+        code_bytes = np.dtype(self.registry.code_dtype).itemsize
+        observations = sum(len(range(0, timeline_length, time_per_observation)) for time_per_observation in self.timesPerObservation)
+        # The cached schedules of every interval, the schedule grouped by student with the sort building it, and the tallies
+        fixed_bytes = observations * 48 + 2 * len(self.timesPerObservation) * self.numberOfStudents * len(self.events) * 8
+        if keep_timelines:
+            # Episode order and durations, and the state matrix row
+            bytes_per_student = episodes * (code_bytes + 8) + timeline_length * code_bytes
+        else:
+            # Episode order, durations and ends
+            bytes_per_student = episodes * (code_bytes + 16)
+        # Index, searched episode, bin and event of every sampled time unit of the student
+        bytes_per_student += (observations // self.numberOfStudents + 1) * (24 + code_bytes)
+        return fixed_bytes, bytes_per_student
+
+    '''
+    Summary: Return the number of students generated and observed at once under the memory budget, or None when no budget
+    is set and each engine generates the whole class its own way. Raises ValueError when the budget cannot hold a single
+    student.
+    Parameter: keep_timelines - whether the timelines are built as state matrices to be written to a replicate store
+    '''
+    def get_students_per_chunk(self, keep_timelines=False):
+        if self.memoryBudget is None:
+            return None
+        fixed_bytes, bytes_per_student = self.get_memory_requirements(keep_timelines)
+        return memory_budget.plan_chunk_size(self.memoryBudget, fixed_bytes, bytes_per_student, self.numberOfStudents, self.workers or 1)
+
+    '''
+    Summary: Return the memory report of the last repeated simulation run under a memory budget, as a dict with the
+    budget, the students per chunk, the traced peak bytes of one replicate (None when the replicates ran in worker
+    processes) and the peak resident bytes of this process and of the largest worker (None where unavailable); None if
+    no budget was set
+    '''
+    def get_memory_report(self):
+        return self.memoryReport
+
+    '''
+    Summary: Start recording the call count, time and items processed of every stage of the simulation: generating the
+    timelines (time units), observing the class (observations), aggregating the class (students), writing the
+    cumulative results (replicates) and writing the timelines and observation results (rows). Disabled by default; the
+    stages are then called directly, without any recording cost
+    Parameter: summary_file - optional file the summary is written to at the end of every run, as JSON if its name ends
+    in .json and as CSV otherwise
+    Returns the Instrumentation holding the records
+    '''
+    def enable_instrumentation(self, summary_file=None):
+        self.disable_instrumentation()
+        timeline_length = self.get_timeline_length()
+        observations = sum(len(range(0, timeline_length, time_per_observation)) for time_per_observation in self.timesPerObservation)
+        monitor = instrumentation.Instrumentation(summary_file)
+        monitor.instrument_method(self, "generate_students_states", lambda args, result: self.numberOfStudents * timeline_length)
+        monitor.instrument_method(self, "compute_observation_results", lambda args, result: len(range(0, timeline_length, args[1])))
+        monitor.instrument_method(self, "compute_all_observation_tallies", lambda args, result: observations)
+        monitor.instrument_method(self, "compute_chunked_observation_tallies", lambda args, result: observations)
+        monitor.instrument_method(self, "compute_class_level_results", lambda args, result: len(args[0]))
+        monitor.instrument_method(self, "output_cumulative_results",
+            lambda args, result: args[0].get_count() if isinstance(args[0], cumulative_statistics.CumulativeResults) else len(args[0]))
+        monitor.instrument_method(self, "write_student_states", lambda args, result: timeline_length)
+        monitor.instrument_method(self, "write_observation_result", lambda args, result: len(self.events))
+        self.instrumentation = monitor
+        return monitor
+
+    '''
+    Summary: Stop recording the stages of the simulation
+    Returns the Instrumentation holding the records made so far, or None if instrumentation was not enabled
+    '''
+    def disable_instrumentation(self):
+        monitor = self.instrumentation
+        if monitor is not None:
+            monitor.remove()
+            self.instrumentation = None
+        return monitor
+
+    '''
+    Summary: Return the records of the stages called since instrumentation was enabled, as a list of dicts with the
+    stage, calls, total_seconds, mean_seconds, min_seconds, max_seconds, items and items_per_second; empty if
+    instrumentation is not enabled
+    '''
+    def get_instrumentation_summary(self):
+        if self.instrumentation is None:
+            return []
+        return self.instrumentation.get_summary()
+
+    '''
+    Summary: Return whether the run has been cancelled
+    '''
+    def is_cancelled(self):
+        return self.cancelEvent is not None and self.cancelEvent.is_set()
+
+    '''
+    Summary: Report the progress of a repeated simulation to the progress callback, if any
+    Parameter: completed - the number of completed replicates
+    Parameter: total - the total number of replicates
+    '''
+    def report_progress(self, completed, total):
+        if self.progressCallback is not None:
+            self.progressCallback(completed, total)
+    
+    '''
+    Summary: Run the simulation
+    Parameter: output_file - the file to output the results to
+    Parameter: number_of_simulations - the number of repeated simulations to run, None to run a single simulation
+    Parameter: store_file - optional replicate store file to keep the timelines of repeated simulations in
+    Parameter: checkpoint_file - optional checkpoint file letting an interrupted repeated simulation resume
+    Parameter: checkpoint_interval - the number of replicates between two checkpoints
+    '''
+    def run(self, output_file, number_of_simulations=None, store_file=None, checkpoint_file=None, checkpoint_interval=1000):
+        if number_of_simulations is not None:
+            completed = self.run_repeated_simulation(output_file, number_of_simulations, store_file, checkpoint_file, checkpoint_interval)
+        else:
+            self.run_single_simulation(output_file)
+            completed = 1
+        if self.instrumentation is not None:
+            self.instrumentation.write_summary()
+        return completed
+    
+    '''
+    Summary: Run the simulation multiple times as specified by user. The statistics are accumulated as each replicate
+    finishes and the per-replicate rows are streamed to disk, so memory does not grow with the number of replicates
+    Parameter: output_file - the file to output the results
+    Parameter: number_of_simulations - the number of simulations to run
+    Parameter: store_file - optional replicate store file to keep the integer-coded timelines of every replicate in, so
+    that other times per observation can be analysed later with analyze_replicate_store
+    Parameter: checkpoint_file - optional checkpoint file. The statistics, the random generator states and the number of
+    completed replicates are saved to it every checkpoint_interval replicates; if it already exists the run resumes from
+    it and produces the same results as an uninterrupted run. It is deleted once the output has been written, unless the
+    run was cancelled, in which case it is kept up to date so that the run can be resumed.
+    Parameter: checkpoint_interval - the number of replicates between two checkpoints
+    Returns the number of completed replicates, which is less than number_of_simulations if the run was cancelled or
+    reached the precision target set with set_precision_target
+    '''
+    def run_repeated_simulation(self, output_file, number_of_simulations, store_file=None, checkpoint_file=None, checkpoint_interval=1000):
+        if self.tolerance is not None and store_file is not None:
+            raise ValueError("a replicate store cannot be combined with a precision target")
+        students_per_chunk = self.get_students_per_chunk(store_file is not None)
+        checkpoint = None
+        if checkpoint_file is not None and os.path.exists(checkpoint_file):
+            checkpoint = checkpointing.load_checkpoint(checkpoint_file)
+            if checkpoint["configuration"] != self.get_checkpoint_configuration(number_of_simulations):
+                raise ValueError(f"{checkpoint_file} was written by a different simulation")
+        cumulative_results = cumulative_statistics.CumulativeResults(self.events, self.timesPerObservation, checkpoint_file,
+            resume=checkpoint is not None)
+        first_replicate = 0
+        if checkpoint is not None:
+            cumulative_results.set_state(checkpoint["cumulative_results"])
+            # Every replicate draws from its own stream spawned from the seed entropy, so nothing else needs restoring
+            self.seedEntropy = checkpoint["seed_entropy"]
+            first_replicate = checkpoint["completed"]
+        store = None
+        if store_file is not None and first_replicate > 0:
+            store = replicate_store.open_replicate_store(store_file, mode='r+')
+        elif store_file is not None:
+            store = replicate_store.create_replicate_store(store_file, self.registry, number_of_simulations, self.numberOfStudents,
+                self.get_timeline_length(), self.totalObservationTime, self.seed)
+        self.memoryReport = None
+        if self.memoryBudget is not None:
+            self.memoryReport = {"budget_bytes": self.memoryBudget, "students_per_chunk": students_per_chunk, "replicate_peak_bytes": None}
+        precision_reached = False
+        try:
+            if self.workers is not None:
+                if store is not None:
+                    store.close()
+                    store = None
+                precision_reached = self.run_parallel_replicates(number_of_simulations, cumulative_results, store_file, first_replicate,
+                    checkpoint_file, checkpoint_interval, students_per_chunk)
+            else:
+                precision_reached = self.run_serial_replicates(number_of_simulations, cumulative_results, store, first_replicate,
+                    checkpoint_file, checkpoint_interval, students_per_chunk)
+            completed = cumulative_results.get_count()
+            if store is not None:
+                store.set_completed(completed)
+            elif store_file is not None:
+                replicate_store.set_completed_replicates(store_file, completed)
+            if self.memoryReport is not None:
+                self.memoryReport["process_peak_bytes"] = memory_budget.get_peak_resident_memory()
+                self.memoryReport["worker_peak_bytes"] = memory_budget.get_peak_resident_memory(children=True) if self.workers is not None else None
+            self.output_cumulative_results(cumulative_results, output_file, precision_reached)
+            finished = completed == number_of_simulations or precision_reached
+            if checkpoint_file is not None and not finished:
+                self.save_checkpoint(checkpoint_file, number_of_simulations, cumulative_results)
+        finally:
+            cumulative_results.close()
+            if store is not None:
+                store.close()
+        if checkpoint_file is not None and finished:
+            cumulative_results.remove_row_files()
+            checkpointing.remove_checkpoint(checkpoint_file)
+        return completed
+
+    '''
+    Summary: Approximate the statistics of a repeated simulation without simulating, with analytical_model. Every engine
+    of this simulator generates the same shuffled timelines, so the estimate applies to all of them.
+    Returns (average tallies, std tallies, average percentages, std percentages), each as an (intervals x events) array
+    '''
+    def estimate_repeated_simulation(self):
+        return analytical_model.estimate_class_statistics(self.registry.get_durations(), self.registry.compute_episode_counts(self.totalObservationTime),
+            self.numberOfStudents, self.timesPerObservation, self.get_timeline_length())
+
+    '''
+    Summary: Return the reasons why the analytical stds may be far from the simulations, empty when the configuration is
+    inside the validity range of analytical_model
+    '''
+    def get_analytical_validity_problems(self):
+        return analytical_model.get_validity_problems(self.registry.get_durations(), self.registry.compute_episode_counts(self.totalObservationTime),
+            self.numberOfStudents, self.timesPerObservation)
+
+    '''
+    Summary: Write the analytical estimate of the statistics of a repeated simulation, in the same tables as the output
+    of run_repeated_simulation but without per-simulation rows
+    Parameter: output_file - the file to output the estimate
+    '''
+    def run_analytical_estimate(self, output_file):
+        average_tallies, std_tallies, average_percentages, std_percentages = [statistic.tolist() for statistic in self.estimate_repeated_simulation()]
+        with open(output_file, 'w') as file:
+            file.write("Analytical estimate, no simulations run\r\n")
+            for problem in self.get_analytical_validity_problems():
+                file.write("Outside the validity range of the stds: " + problem + "\r\n")
+            file.write("\r\n")
+            for interval_index in range(len(self.timesPerObservation)):
+                self.write_interval_statistics(file, interval_index, average_tallies, std_tallies, average_percentages, std_percentages)
+                file.write("\r\n\r\n")
+
+    '''
+    Summary: Compare the analytical estimate with a repeated simulation of the same configuration. For every time per
+    observation, event and statistic, the output has the estimate, the simulated value, their difference, the relative
+    difference, the standard error of the simulated value and the difference as a number of standard errors.
+    Parameter: output_file - the file to output the comparison
+    Parameter: number_of_simulations - the number of simulations to compare the estimate with
+    Returns the largest absolute difference, as a number of standard errors of the simulated value; infinite when a
+    statistic that was the same in every simulation is estimated differently
+    '''
+    def validate_analytical_estimate(self, output_file, number_of_simulations):
+        start = time.perf_counter()
+        estimates = self.estimate_repeated_simulation()
+        analytical_seconds = time.perf_counter() - start
+        students_per_chunk = self.get_students_per_chunk()
+        cumulative_results = cumulative_statistics.CumulativeResults(self.events, self.timesPerObservation)
+        try:
+            start = time.perf_counter()
+            if self.workers is not None:
+                self.run_parallel_replicates(number_of_simulations, cumulative_results, students_per_chunk=students_per_chunk)
+            else:
+                self.run_serial_replicates(number_of_simulations, cumulative_results, students_per_chunk=students_per_chunk)
+            simulation_seconds = time.perf_counter() - start
+            tally_statistics = cumulative_results.tally_statistics
+            percentage_statistics = cumulative_results.percentage_statistics
+            simulated = [tally_statistics.get_mean(), tally_statistics.get_std(), percentage_statistics.get_mean(), percentage_statistics.get_std()]
+            standard_errors = [tally_statistics.get_mean_half_width(1), tally_statistics.get_std_half_width(1),
+                percentage_statistics.get_mean_half_width(1), percentage_statistics.get_std_half_width(1)]
+            replicates = cumulative_results.get_count()
+        finally:
+            cumulative_results.close()
+        statistic_names = ["average tally", "std tally", "average percentage", "std percentage"]
+        largest_score = 0.0
+        with open(output_file, 'w') as file:
+            file.write("Analytical estimate = " + str(analytical_seconds * 1000) + " ms, " + str(replicates) + " simulations = "
+                + str(simulation_seconds * 1000) + " ms\r\n\r\n")
+            for interval_index, time_per_observation in enumerate(self.timesPerObservation):
+                file.write("Time per observation = " + str(time_per_observation))
+                file.write("\r\n\r\n")
+                file.write(",statistic,analytical,simulated,difference,relative difference,standard error,standard errors\r\n")
+                for event_index, event in enumerate(self.events):
+                    for name, estimate, value, standard_error in zip(statistic_names, estimates, simulated, standard_errors):
+                        estimate = float(estimate[interval_index][event_index])
+                        value = float(value[interval_index][event_index])
+                        standard_error = float(standard_error[interval_index][event_index])
+                        difference = estimate - value
+                        relative_difference = difference / value if value != 0 else ""
+                        score = self.get_standard_score(difference, value, standard_error)
+                        if score != "":
+                            largest_score = max(largest_score, abs(score))
+                        file.write(event.get_name() + "," + name + "," + str(estimate) + "," + str(value) + "," + str(difference) + ","
+                            + str(relative_difference) + "," + str(standard_error) + "," + str(score) + "\r\n")
+                file.write("\r\n\r\n")
+        return largest_score
+
+    '''
+    Summary: Return the difference between an estimate and a simulated value as a number of standard errors of the
+    simulated value. A simulated value with no spread is matched only by the same estimate, so any other estimate is
+    infinitely many standard errors away.
+    Parameter: difference - the estimate minus the simulated value
+    Parameter: value - the simulated value
+    Parameter: standard_error - the standard error of the simulated value, nan when too few simulations ran
+    Returns the number of standard errors, or "" when the standard error is unknown
+    '''
+    def get_standard_score(self, difference, value, standard_error):
+        if math.isnan(standard_error):
+            return ""
+        if standard_error > 0:
+            return difference / standard_error
+        # Agreement to a millionth of the value is counted as a match rather than an infinite difference
+        if abs(difference) <= 1e-6 * max(1.0, abs(value)):
+            return 0.0
+        return math.copysign(math.inf, difference)
+
+    '''
+    Summary: Return the parameters a checkpoint must have been written with to be resumed by this simulator. The engine
+    and the number of workers are not among them, since every engine and any number of workers give the same results
+    Parameter: number_of_simulations - the number of simulations of the run
+    '''
+    def get_checkpoint_configuration(self, number_of_simulations):
+        return {
+            "events": [(event.get_name(), str(event.get_duration()), str(event.get_proportion())) for event in self.events],
+            "timesPerObservation": list(self.timesPerObservation),
+            "numberOfStudents": self.numberOfStudents,
+            "totalObservationTime": self.totalObservationTime,
+            "number_of_simulations": number_of_simulations,
+            "precision_target": (self.tolerance, self.confidence, self.batchSize) if self.tolerance is not None else None,
+        }
+
+    '''
+    Summary: Save a checkpoint of a repeated simulation
+    Parameter: checkpoint_file - the checkpoint file
+    Parameter: number_of_simulations - the number of simulations of the run
+    Parameter: cumulative_results - the results accumulated so far
+    '''
+    def save_checkpoint(self, checkpoint_file, number_of_simulations, cumulative_results):
+        checkpointing.save_checkpoint(checkpoint_file, {
+            "configuration": self.get_checkpoint_configuration(number_of_simulations),
+            "completed": cumulative_results.get_count(),
+            "cumulative_results": cumulative_results.get_state(),
+            "seed_entropy": self.seedEntropy,
+        })
+
+    '''
+    Summary: Apply this simulator's times per observation to the timelines kept in a replicate store, without
+    regenerating them, and output the cumulative results. Replicates are read one at a time from the memory map, and
+    only the replicates completed by the run that wrote the store are analysed.
+    Parameter: store_file - the replicate store written by run_repeated_simulation
+    Parameter: output_file - the file to output the results
+    '''
+    def analyze_replicate_store(self, store_file, output_file):
+        store = replicate_store.open_replicate_store(store_file)
+        cumulative_results = cumulative_statistics.CumulativeResults(self.events, self.timesPerObservation)
+        try:
+            if store.get_metadata()["numberOfStudents"] != self.numberOfStudents or len(store.get_events()) != len(self.events):
+                raise ValueError(f"{store_file} was not generated for this class and these events")
+            if store.get_completed() == 0:
+                raise ValueError(f"{store_file} holds no completed replicate")
+            for replicate_index in range(store.get_completed()):
+                all_tallies = self.compute_all_observation_tallies(store.get_replicate(replicate_index))
+                total_tallies, percentages = simulation_engine.compute_class_level_arrays(all_tallies)
+                cumulative_results.add_run(total_tallies, percentages)
+            self.output_cumulative_results(cumulative_results, output_file)
+        finally:
+            cumulative_results.close()
+            store.close()
+
+    '''
+    Summary: Run the replicates in this process, each replicate drawing from the same stream spawned from the seed as it
+    would in a worker, so the results are identical to those of run_parallel_replicates
+    Parameter: number_of_simulations - the number of replicates to run
+    Parameter: cumulative_results - the cumulative results to add each replicate to
+    Parameter: store - optional open replicate store to write the timelines to
+    Parameter: first_replicate - the index of the first replicate to run
+    Parameter: checkpoint_file - optional checkpoint file saved every checkpoint_interval replicates
+    Parameter: checkpoint_interval - the number of replicates between two checkpoints
+    Parameter: students_per_chunk - the number of students generated and observed at once, None for the whole class
+    Returns whether the run stopped because the precision target was reached
+    '''
+    def run_serial_replicates(self, number_of_simulations, cumulative_results, store=None, first_replicate=0, checkpoint_file=None, checkpoint_interval=1000, students_per_chunk=None):
+        for i in range(first_replicate, number_of_simulations):
+            if self.is_cancelled():
+                break
+            self.numpyGenerator = parallel_runner.get_replicate_generator(self.seedEntropy, i)
+            if self.memoryReport is not None and i == first_replicate:
+                all_tallies, self.memoryReport["replicate_peak_bytes"] = memory_budget.trace_peak_memory(self.compute_replicate_tallies,
+                    i, store, students_per_chunk)
+            else:
+                all_tallies = self.compute_replicate_tallies(i, store, students_per_chunk)
+            all_observation_time_data = {}
+            for time_per_observation, tallies in zip(self.timesPerObservation, all_tallies):
+                all_observation_time_data[time_per_observation] = self.compute_class_level_results(tallies)
+            cumulative_results.add_run_data(all_observation_time_data)
+            if checkpoint_file is not None and (i + 1) % checkpoint_interval == 0 and i + 1 < number_of_simulations:
+                if store is not None:
+                    store.set_completed(i + 1)
+                self.save_checkpoint(checkpoint_file, number_of_simulations, cumulative_results)
+            self.report_progress(i + 1, number_of_simulations)
+            if self.is_precision_reached(cumulative_results):
+                return True
+        return False
+
+    '''
+    Summary: Run the replicates over a process pool, each replicate drawing from its own stream spawned from the seed,
+    so the results are identical for a given seed whatever the number of workers
+    Parameter: number_of_simulations - the number of replicates to run
+    Parameter: cumulative_results - the cumulative results to add each replicate to
+    Parameter: store_file - optional replicate store file the workers write the timelines to
+    Parameter: first_replicate - the index of the first replicate to run
+    Parameter: checkpoint_file - optional checkpoint file saved after each block completing checkpoint_interval replicates
+    Parameter: checkpoint_interval - the number of replicates between two checkpoints
+    Parameter: students_per_chunk - the number of students each worker generates and observes at once, None for the whole class
+    Returns whether the run stopped because the precision target was reached
+    '''
+    def run_parallel_replicates(self, number_of_simulations, cumulative_results, store_file=None, first_replicate=0, checkpoint_file=None, checkpoint_interval=1000, students_per_chunk=None):
+        blocks = parallel_runner.iterate_parallel_replicates(self.registry, self.timesPerObservation, self.numberOfStudents,
+            self.totalObservationTime, number_of_simulations, self.seedEntropy, self.workers, store_file, first_replicate, students_per_chunk,
+            # With a precision target, blocks of one batch are run a few at a time so the run stops soon after the target
+            self.batchSize if self.tolerance is not None else None)
+        precision_reached = False
+        try:
+            for tallies, percentages in blocks:
+                completed_before = cumulative_results.get_count()
+                # One replicate at a time, so the precision is checked exactly at the end of each batch
+                for replicate_tallies, replicate_percentages in zip(tallies, percentages):
+                    cumulative_results.add_run(replicate_tallies, replicate_percentages)
+                    if self.is_precision_reached(cumulative_results):
+                        precision_reached = True
+                        break
+                completed = cumulative_results.get_count()
+                if checkpoint_file is not None and completed // checkpoint_interval > completed_before // checkpoint_interval and completed < number_of_simulations:
+                    if store_file is not None:
+                        # The workers have flushed and closed the store before returning their block
+                        replicate_store.set_completed_replicates(store_file, completed)
+                    self.save_checkpoint(checkpoint_file, number_of_simulations, cumulative_results)
+                self.report_progress(completed, number_of_simulations)
+                if precision_reached or self.is_cancelled():
+                    break
+        finally:
+            # Closing the generator cancels the blocks that have not started yet
+            blocks.close()
+        return precision_reached
+        
+    '''
+    Summary: Output the cumulative results to a file, using specific formatting and calculations
+    Parameter: cumulative_results - the CumulativeResults accumulated throughout the simulation, or a list holding the class level data of each replicate
+    Parameter: output_file - the file to output the results
+    Parameter: precision_reached - whether the precision target was reached; when a target is set, the number of
+    replicates run and whether the target was reached are written first
+    '''
+    def output_cumulative_results(self, cumulative_results, output_file, precision_reached=False):
+        if not isinstance(cumulative_results, cumulative_statistics.CumulativeResults):
+            cumulative_run_data = cumulative_results
+            cumulative_results = cumulative_statistics.CumulativeResults(self.events, self.timesPerObservation)
+            try:
+                for all_observation_time_data in cumulative_run_data:
+                    cumulative_results.add_run_data(all_observation_time_data)
+                self.output_cumulative_results(cumulative_results, output_file, precision_reached)
+            finally:
+                # The rows of a list of results are spooled to temporary files that only live for this call
+                cumulative_results.close()
+            return
+        average_tallies = cumulative_results.tally_statistics.get_mean().tolist()
+        std_tallies = cumulative_results.tally_statistics.get_std().tolist()
+        average_percentages = cumulative_results.percentage_statistics.get_mean().tolist()
+        std_percentages = cumulative_results.percentage_statistics.get_std().tolist()
+        with open(output_file, 'w') as file:
+            if self.tolerance is not None:
+                file.write("Replicates run = " + str(cumulative_results.get_count()) + "\r\n")
+                file.write("Precision target = " + str(self.tolerance) + " at " + str(self.confidence) + " confidence, "
+                    + ("reached" if precision_reached else "not reached") + "\r\n\r\n")
+            if self.memoryReport is not None:
+                self.write_memory_report(file)
+            for interval_index in range(len(self.timesPerObservation)):
+                self.write_interval_statistics(file, interval_index, average_tallies, std_tallies, average_percentages, std_percentages)
+                file.write("\r\n\r\n")
+
+                file.write("Simulation#")
+                for event in self.events:
+                    file.write("," + event.get_name() + " tally," + event.get_name() + " percentage")
+                file.write("\r\n")
+                cumulative_results.copy_rows(interval_index, file)
+                file.write("\r\n")
+    
+    '''
+    Summary: Write the table of the average and std of the tally and percentage of every event for one time per observation
+    Parameter: file - the file to output the table to
+    Parameter: interval_index - the index of the time per observation
+    Parameter: average_tallies - the (intervals x events) average class tallies, as nested lists
+    Parameter: std_tallies - the (intervals x events) std of the class tallies, as nested lists
+    Parameter: average_percentages - the (intervals x events) average class percentages, as nested lists
+    Parameter: std_percentages - the (intervals x events) std of the class percentages, as nested lists
+    '''
+    def write_interval_statistics(self, file, interval_index, average_tallies, std_tallies, average_percentages, std_percentages):
+        target_percentages = (self.registry.get_proportions() / float(100)).tolist()
+        file.write("Time per observation = " + str(self.timesPerObservation[interval_index]))
+        file.write("\r\n\r\n")
+        file.write(",average tally,std tally,average percentage,std percentage,,target percentage\r\n")
+        for event_index, event in enumerate(self.events):
+            file.write(event.get_name() + "," + str(average_tallies[interval_index][event_index]) + "," + str(std_tallies[interval_index][event_index])
+                + "," + str(average_percentages[interval_index][event_index]) + "," + str(std_percentages[interval_index][event_index])
+                + ',,' + str(target_percentages[event_index]) + "\r\n")
+
+    '''
+    Summary: Write the memory budget and the peak memory used by the run
+    Parameter: file - the file to output the report to
+    '''
+    def write_memory_report(self, file):
+        report = self.memoryReport
+        file.write("Memory budget = " + str(report["budget_bytes"]) + " bytes, students per chunk = " + str(report["students_per_chunk"])
+            + " of " + str(self.numberOfStudents) + "\r\n")
+        if report["replicate_peak_bytes"] is not None:
+            file.write("Peak memory of one replicate = " + str(report["replicate_peak_bytes"]) + " bytes\r\n")
+        if report["process_peak_bytes"] is not None:
+            file.write("Peak resident memory = " + str(report["process_peak_bytes"]) + " bytes")
+            if report["worker_peak_bytes"] is not None:
+                file.write(", largest worker = " + str(report["worker_peak_bytes"]) + " bytes")
+            file.write("\r\n")
+        file.write("\r\n")
+
+    '''
+    Summary: Generate one replicate and return its (intervals x students x events) observation tallies, keeping its
+    timelines in the replicate store if one is given. Under a memory budget the class is generated and observed a chunk
+    of students at a time, so that the memory used follows the estimate the chunk size was planned with.
+    Parameter: replicate_index - the index of the replicate
+    Parameter: store - the open replicate store to write the timelines to, or None
+    Parameter: students_per_chunk - the number of students generated and observed at once, None to generate the whole
+    class with the engine
+    '''
+    def compute_replicate_tallies(self, replicate_index, store=None, students_per_chunk=None):
+        if students_per_chunk is not None:
+            return self.compute_chunked_observation_tallies(students_per_chunk, store, replicate_index)
+        student_states = self.generate_students_states()
+        if store is not None:
+            store.write_replicate(replicate_index, self.to_state_matrix(student_states))
+        return self.compute_all_observation_tallies(student_states)
+
+    '''
+    Summary: Generate and observe a replicate a chunk of students at a time, returning its (intervals x students x events)
+    observation tallies. The chunks draw from the same random streams, in the same order, as generating the whole class,
+    so the tallies are the same as those of compute_all_observation_tallies. Every engine draws the same timelines, so
+    the chunks are built as episode boundaries, or as state matrices when the timelines are kept.
+    Parameter: students_per_chunk - the number of students generated and observed at once
+    Parameter: store - the open replicate store to write the timelines to, or None
+    Parameter: replicate_index - the index of the replicate in the store
+    '''
+    def compute_chunked_observation_tallies(self, students_per_chunk, store=None, replicate_index=0):
+        write_rows = None if store is None else (lambda chunk_states, first_student: store.write_replicate(replicate_index, chunk_states, first_student))
+        return simulation_engine.compute_chunked_observation_tallies(self.registry.get_durations(), self.registry.compute_episode_counts(self.totalObservationTime),
+            self.numberOfStudents, students_per_chunk, self.timesPerObservation, self.numpyGenerator, write_rows)
+
+    '''
+    Summary: Compute the results at the level of the class from a (students x events) tally array, without building
+    per-student maps
+    Parameter: student_observations - the observations made by the students, as a (students x events) tally array or
+    as one map from event to tally per student
+    '''
+    def compute_class_level_results(self, student_observations):
+        if isinstance(student_observations, np.ndarray):
+            tallies = student_observations
+        else:
+            tallies = np.array([[observations[event] for event in self.events] for observations in student_observations], dtype=np.int64)
+            tallies = tallies.reshape(len(student_observations), len(self.events))
+        total_tallies, percentages = simulation_engine.compute_class_level_arrays(tallies)
+        return ClassRunResults(self.registry, total_tallies, percentages)
+    
+    '''
+    Summary: Run a single simulation
+    Parameter: output_file - the file to output the results
+    '''
+    def run_single_simulation(self, output_file):
+        with open(output_file, 'w') as file:
+            student_states = self.generate_students_states()
+            for time_per_observation in self.timesPerObservation:
+                self.compute_and_output_observation_results(student_states, time_per_observation, file)
+            file.write("Randomized events:\r\n\r\n")
+            self.write_student_states(student_states, file)
+
+    '''
+    Summary: Calls functions to compute and output the observation results obtained from the simulation
+    Parameter: student_states - the states of each student, based on the simulation
+    Parameter: time_per_observation - the time per observation
+    Parameter: file - the file to output the results
+    '''
+    def compute_and_output_observation_results(self, student_states, time_per_observation, file):
+        student_observations = self.compute_observation_results(student_states, time_per_observation)
+        real_event_counts = self.compute_real_event_counts(student_states)
+        self.write_observation_result(real_event_counts, student_observations, time_per_observation, file)
+
+    '''
+    Summary: Computes the observation results obtained from the simulation
+    Parameter: student_states - the states of each student, based on the simulation
+    Parameter: time_per_observation - the time per observation
+    '''
+    def compute_observation_results(self, student_states, time_per_observation):
+        assert len(student_states) == self.numberOfStudents
+        if isinstance(student_states, np.ndarray):
+            tallies = simulation_engine.compute_observation_tallies(student_states, time_per_observation, len(self.events))
+            return [dict(zip(self.events, student_tallies)) for student_tallies in tallies.tolist()]
+        if isinstance(student_states, simulation_engine.EpisodeBoundaries):
+            tallies = student_states.compute_all_observation_tallies((time_per_observation,), len(self.events))[0]
+            return [dict(zip(self.events, student_tallies)) for student_tallies in tallies.tolist()]
+        if isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            tallies = simulation_engine.compute_run_length_observation_tallies(student_states, time_per_observation, len(self.events))
+            return [dict(zip(self.events, student_tallies)) for student_tallies in tallies.tolist()]
+        current_time_index = 0
+        current_student_index = 0
+
+        student_observations = []
+        for i in range(self.numberOfStudents):
+            observation_map = {}
+            for event in self.events:
+                observation_map[event] = 0
+            student_observations.append(observation_map)
+        while current_time_index < len(student_states[0]):
+            observed_event = student_states[current_student_index][current_time_index]
+            observation_map = student_observations[current_student_index]
+            observation_map[observed_event] = observation_map[observed_event] + 1
+            current_time_index += time_per_observation
+            current_student_index = (current_student_index + 1) % self.numberOfStudents
+        return student_observations
+    
+    '''
+    Summary: Computes the observation tallies of every time per observation as an (intervals x students x events) array.
+    Integer-coded matrices are sampled for all intervals in a single pass.
+    Parameter: student_states - the states of each student, based on the simulation
+    '''
+    def compute_all_observation_tallies(self, student_states):
+        if isinstance(student_states, np.ndarray):
+            return simulation_engine.compute_all_observation_tallies(student_states, self.timesPerObservation, len(self.events))
+        if isinstance(student_states, simulation_engine.EpisodeBoundaries):
+            return student_states.compute_all_observation_tallies(self.timesPerObservation, len(self.events))
+        if isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            return np.array([simulation_engine.compute_run_length_observation_tallies(student_states, time_per_observation, len(self.events))
+                for time_per_observation in self.timesPerObservation]).reshape(len(self.timesPerObservation), self.numberOfStudents, len(self.events))
+        all_tallies = np.zeros((len(self.timesPerObservation), self.numberOfStudents, len(self.events)), dtype=np.int64)
+        for interval_index, time_per_observation in enumerate(self.timesPerObservation):
+            student_observations = self.compute_observation_results(student_states, time_per_observation)
+            all_tallies[interval_index] = [[observations[event] for event in self.events] for observations in student_observations]
+        return all_tallies
+
+    '''
+    Summary: Compute the real event counts
+    Parameter: student_states - the states of each student, based on the simulation
+    '''
+    def compute_real_event_counts(self, student_states):
+        if isinstance(student_states, np.ndarray):
+            time_counts = simulation_engine.compute_event_time_counts(student_states[0], len(self.events))
+            return dict(zip(self.events, time_counts.tolist()))
+        if isinstance(student_states, simulation_engine.EpisodeBoundaries):
+            time_counts = student_states.event_time_counts(0, len(self.events))
+            return dict(zip(self.events, time_counts.tolist()))
+        if isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            time_counts = student_states[0].event_time_counts(len(self.events))
+            return dict(zip(self.events, time_counts.tolist()))
+        real_event_counts = {}
+        for event in self.events:
+            real_event_counts[event] = 0
+        for event in student_states[0]:
+            real_event_counts[event] = real_event_counts[event] + 1
+        return real_event_counts
+    
+    '''
+    Summary: Write the observation results to a file
+    Parameter: real_event_counts - the real event counts
+    Parameter: student_observations - the observations for each student
+    Parameter: time_per_observation - the time per observation
+    Parameter: file - the file to output the results
+    '''
+    def write_observation_result(self, real_event_counts, student_observations, time_per_observation, file):
+        lines = ["Time per observation = " + str(time_per_observation) + "\r\n\r\n"]
+
+        header = []
+        for i in range(self.numberOfStudents):
+            header.append(",tally student" + str(i+1) + ",percentage student" + str(i+1))
+        header.append(",,total tally, average tally, std tally, average percentage, std percentage")
+        header.append(",,target percentage")
+        lines.append("".join(header) + "\r\n")
+        number_of_target_observations = sum(real_event_counts.values())
+        number_of_observations = [sum(observations.values()) for observations in student_observations]
+        
+        for event in self.events:
+            row = [event.get_name()]
+            tallies = []
+            percentages = []
+            for student_index in range(self.numberOfStudents):
+                tally = student_observations[student_index][event]
+                # A student who is never observed, when there are more students than observations, counts as 0%
+                percentage = float(tally) / float(number_of_observations[student_index]) if number_of_observations[student_index] > 0 else 0.0
+                row.append(str(tally))
+                row.append(str(percentage))
+                tallies.append(tally)
+                percentages.append(percentage)
+            total_tally = sum(tallies)
+            average_taly = float(((float(total_tally)) / (float(self.numberOfStudents))))
+            std_tally = 0
+            for tally in tallies:
+                std_tally += (tally - average_taly) * (tally - average_taly)
+            std_tally = float(math.sqrt(std_tally / (float(self.numberOfStudents-1))))
+            average_percentage = 0
+            for percentage in percentages:
+                average_percentage += percentage
+            average_percentage = average_percentage / float(self.numberOfStudents)
+            std_percentage = 0
+            for percentage in percentages:
+                std_percentage += (percentage - average_percentage) * (percentage - average_percentage)
+            std_percentage = math.sqrt(std_percentage / float(self.numberOfStudents))
+            row.append(",," + str(total_tally))
+            row.extend([str(average_taly), str(std_tally), str(average_percentage), str(std_percentage)])
+            row.append("," + str(event.get_proportion_value() / float(100)))
+            row.append("," + str(float(real_event_counts[event]) / float(number_of_target_observations)))
+            lines.append(",".join(row) + "\r\n")
+        lines.append("\r\n\r\n")
+        file.write("".join(lines))
+    
+    '''
+    Summary: Function to generate the states for each student
+    '''
+    def generate_students_states(self):
+        if self.engine == "matrix":
+            return self.generate_students_state_matrix()
+        if self.engine == "runlength":
+            return self.generate_students_run_length_timelines()
+        if self.engine == "sampled":
+            return self.generate_students_episode_boundaries()
+        # The episode orders are drawn like those of the other engines, so a seed gives the same timelines with every engine
+        counts = self.registry.compute_episode_counts(self.totalObservationTime)
+        orders = simulation_engine.generate_episode_orders(counts, self.numberOfStudents, self.numpyGenerator)
+        student_states = []
+        for order in orders.tolist():
+            student_states.append(self.generate_states_for_one_student(order))
+        return student_states
+    
+    '''
+    Summary: Function to build the state list of a single student from its shuffled episode order
+    Parameter: order - the event code of every episode of the student, in timeline order
+    '''
+    def generate_states_for_one_student(self, order):
+        states = []
+        events = self.registry.events
+        durations = self.registry.get_durations().tolist()
+        for code in order:
+            states.extend([events[code]] * durations[code])
+
+        return states
+
+    '''
+    Summary: Function to generate the states of the whole class at once as an integer-coded matrix (students x time),
+    where each entry is the index of the active event in self.events
+    '''
+    def generate_students_state_matrix(self):
+        durations = self.registry.get_durations()
+        counts = self.registry.compute_episode_counts(self.totalObservationTime)
+        return simulation_engine.generate_state_matrix(durations, counts, self.numberOfStudents, self.numpyGenerator)
+
+    '''
+    Summary: Function to generate a run-length encoded timeline for each student, storing episode starts and event codes
+    so that memory grows with the number of episodes rather than with the total observation time
+    '''
+    def generate_students_run_length_timelines(self):
+        durations = self.registry.get_durations()
+        counts = self.registry.compute_episode_counts(self.totalObservationTime)
+        return simulation_engine.generate_run_length_timelines(durations, counts, self.numberOfStudents, self.numpyGenerator)
+    
+    '''
+    Summary: Function to generate only the episode order and episode boundaries of every student, so that observing the
+    class looks up the sampled time units instead of materialising every time unit
+    '''
+    def generate_students_episode_boundaries(self):
+        durations = self.registry.get_durations()
+        counts = self.registry.compute_episode_counts(self.totalObservationTime)
+        return simulation_engine.generate_episode_boundaries(durations, counts, self.numberOfStudents, self.numpyGenerator)
+
+    '''
+    Summary: Return the number of time units of every student timeline
+    '''
+    def get_timeline_length(self):
+        return int(np.dot(self.registry.get_durations(), self.registry.compute_episode_counts(self.totalObservationTime)))
+
+    '''
+    Summary: Convert the states of each student, from any engine, into an integer-coded (students x time) matrix
+    Parameter: student_states - the states of each student
+    '''
+    def to_state_matrix(self, student_states):
+        if isinstance(student_states, np.ndarray):
+            return student_states
+        if isinstance(student_states, simulation_engine.EpisodeBoundaries):
+            return student_states.to_state_matrix()
+        if isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            return np.array([timeline.expand() for timeline in student_states])
+        codes = self.registry.codes
+        return np.array([[codes[event] for event in states] for states in student_states], dtype=self.registry.code_dtype)
+
+    '''
+    Summary: Function to write the student states to a file
+    Parameter: student_states - the states of each student
+    Parameter: file - the file to output the student states
+    '''
+    def write_student_states(self, student_states, file):
+        header = ["time"]
+        for i in range(len(student_states)):
+            header.append(",student" + str(i+1))
+        file.write("".join(header) + "\r\n")
+        # The run-length and sampled engines are resolved a block of rows at a time, never expanding the timelines
+        if isinstance(student_states, simulation_engine.EpisodeBoundaries):
+            simulation_engine.write_episode_boundary_rows(student_states, self.registry.get_names(), file)
+        elif not isinstance(student_states, np.ndarray) and isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            simulation_engine.write_run_length_rows(student_states, self.registry.get_names(), file)
+        else:
+            simulation_engine.write_state_matrix_rows(self.to_state_matrix(student_states), self.registry.get_names(), file)
+
+'''
+Summary: Build a simulator for the class and events kept in a replicate store, to analyse new times per observation
+Parameter: store_file - the replicate store written by a repeated simulation
+Parameter: timesPerObservation - the times per observation to analyse
+'''
+def load_simulator_from_store(store_file, timesPerObservation):
+    store = replicate_store.open_replicate_store(store_file)
+    metadata = store.get_metadata()
+    events = [Event(name, duration, proportion) for name, duration, proportion in store.get_events()]
+    store.close()
+    return BROMPSimulator(events, timesPerObservation, metadata["numberOfStudents"], metadata["totalObservationTime"], engine="matrix", seed=metadata["seed"])
@@ -0,0 +1,762 @@
+import bisect
+import functools
+import warnings
+import numpy as np
+
+# Integer-coded timeline engine
+#
+# A class timeline is stored as a (students x time) matrix of event codes, where
+# the code of an event is its index in the simulator's event list. This keeps a
+# whole class in a single compact array instead of one Event reference per tick.
+
+'''
+Summary: Return the smallest unsigned dtype able to hold a code for every event
+Parameter: number_of_events - the number of distinct events
+'''
+def event_code_dtype(number_of_events):
+    if number_of_events <= np.iinfo(np.uint8).max + 1:
+        return np.uint8
+    if number_of_events <= np.iinfo(np.uint16).max + 1:
+        return np.uint16
+    return np.uint32
+
+'''
+Summary: Return the (duration, proportion) of an event as numbers, using the values parsed by the simulation_core Event
+and parsing those of events that only keep the values as given, such as the Event of the HMM modules
+Parameter: event - the event
+'''
+def get_event_values(event):
+    if hasattr(event, "get_duration_value"):
+        return event.get_duration_value(), event.get_proportion_value()
+    return int(event.get_duration()), float(event.get_proportion())
+
+# Event Registry Class
+class EventRegistry:
+    '''
+    Summary: Constructor to populate an event registry, assigning each event a dense integer code (its index in the
+    list) and parsing its duration and proportion once into arrays indexed by code
+    Parameter: events - the events of the simulation
+    '''
+    def __init__(self, events):
+        self.events = list(events)
+        self.codes = {event: code for code, event in enumerate(self.events)}
+        self.names = [event.get_name() for event in self.events]
+        values = [get_event_values(event) for event in self.events]
+        self.durations = np.array([duration for duration, _ in values], dtype=np.intp)
+        self.proportions = np.array([proportion for _, proportion in values])
+        self.code_dtype = event_code_dtype(len(self.events))
+
+    '''
+    Summary: Return the number of registered events
+    '''
+    def __len__(self):
+        return len(self.events)
+
+    '''
+    Summary: Return the code of an event
+    Parameter: event - the event to look up
+    '''
+    def get_code(self, event):
+        return self.codes[event]
+
+    '''
+    Summary: Return the event with a given code
+    Parameter: code - the code to look up
+    '''
+    def get_event(self, code):
+        return self.events[code]
+
+    '''
+    Summary: Return the name of every event, indexed by code
+    '''
+    def get_names(self):
+        return self.names
+
+    '''
+    Summary: Return the duration of every event, indexed by code
+    '''
+    def get_durations(self):
+        return self.durations
+
+    '''
+    Summary: Return the proportion in percent of every event, indexed by code
+    '''
+    def get_proportions(self):
+        return self.proportions
+
+    '''
+    Summary: Return the number of episodes of every event in a single student timeline, indexed by code
+    Parameter: totalObservationTime - the total observation time of the simulation
+    '''
+    def compute_episode_counts(self, totalObservationTime):
+        count_of_events = (float(totalObservationTime) * self.proportions) / (100 * self.durations.astype(float))
+        return count_of_events.astype(np.intp)
+
+'''
+Summary: Draw a uniformly random episode order for every student of the class in a single batched call.
+Each row is shuffled independently with a linear-time Fisher-Yates permutation.
+Parameter: counts - the number of episodes of each event for a single student
+Parameter: numberOfStudents - the number of students in the class
+Parameter: generator - the numpy random generator used to order the episodes
+'''
+def generate_episode_orders(counts, numberOfStudents, generator):
+    episodes = np.repeat(np.arange(len(counts), dtype=event_code_dtype(len(counts))), counts)
+    orders = np.tile(episodes, (numberOfStudents, 1))
+    generator.permuted(orders, axis=1, out=orders)
+    return orders
+
+'''
+Summary: Build the integer-coded state matrix of a whole class, one row per student
+Parameter: durations - the duration of each event, indexed by event code
+Parameter: counts - the number of episodes of each event for a single student
+Parameter: numberOfStudents - the number of students in the class
+Parameter: generator - the numpy random generator used to order the episodes
+'''
+def generate_state_matrix(durations, counts, numberOfStudents, generator):
+    orders = generate_episode_orders(counts, numberOfStudents, generator)
+    timeline_length = int(np.dot(durations, counts))
+    states = np.repeat(orders.ravel(), durations[orders].ravel())
+    return states.reshape(numberOfStudents, timeline_length)
+
+'''
+Summary: Return the round robin sampling schedule of a class as (observed students, observation times) arrays.
+The schedule only depends on its arguments, so it is computed once and cached; the returned arrays are read-only.
+Parameter: numberOfStudents - the number of students in the class
+Parameter: time_per_observation - the time per observation
+Parameter: timeline_length - the number of time units of each student timeline
+'''
+@functools.lru_cache(maxsize=256)
+def observation_schedule(numberOfStudents, time_per_observation, timeline_length):
+    observation_times = np.arange(0, timeline_length, time_per_observation)
+    observed_students = np.arange(len(observation_times)) % numberOfStudents
+    observation_times.setflags(write=False)
+    observed_students.setflags(write=False)
+    return observed_students, observation_times
+
+'''
+Summary: Return the sampling schedules of several times per observation merged into flat lookups, as
+(flat indices into a (students x time) matrix, tally bins before adding the event code). The bins place the
+tally of event e for student s under interval i at (i * numberOfStudents + s) * number_of_events + e.
+Parameter: numberOfStudents - the number of students in the class
+Parameter: timesPerObservation - a tuple of the times per observation
+Parameter: timeline_length - the number of time units of each student timeline
+Parameter: number_of_events - the number of distinct events
+'''
+@functools.lru_cache(maxsize=64)
+def combined_observation_schedule(numberOfStudents, timesPerObservation, timeline_length, number_of_events):
+    flat_indices = []
+    bins = []
+    for interval_index, time_per_observation in enumerate(timesPerObservation):
+        observed_students, observation_times = observation_schedule(numberOfStudents, time_per_observation, timeline_length)
+        flat_indices.append(observed_students * timeline_length + observation_times)
+        bins.append((interval_index * numberOfStudents + observed_students) * number_of_events)
+    flat_indices = np.concatenate(flat_indices) if flat_indices else np.zeros(0, dtype=np.intp)
+    bins = np.concatenate(bins) if bins else np.zeros(0, dtype=np.intp)
+    flat_indices.setflags(write=False)
+    bins.setflags(write=False)
+    return flat_indices, bins
+
+'''
+Summary: Tally the events observed for each student when the class is observed in round robin
+Parameter: state_matrix - the integer-coded states of each student
+Parameter: time_per_observation - the time per observation
+Parameter: number_of_events - the number of distinct events
+'''
+def compute_observation_tallies(state_matrix, time_per_observation, number_of_events):
+    return compute_all_observation_tallies(state_matrix, (time_per_observation,), number_of_events)[0]
+
+'''
+Summary: Tally the events observed for each student under every time per observation in a single gather and bincount,
+returning an (intervals x students x events) array
+Parameter: state_matrix - the integer-coded states of each student
+Parameter: timesPerObservation - the times per observation
+Parameter: number_of_events - the number of distinct events
+'''
+def compute_all_observation_tallies(state_matrix, timesPerObservation, number_of_events):
+    numberOfStudents, timeline_length = state_matrix.shape
+    flat_indices, bins = combined_observation_schedule(numberOfStudents, tuple(timesPerObservation), timeline_length, number_of_events)
+    observed_events = state_matrix.ravel()[flat_indices]
+    size = len(timesPerObservation) * numberOfStudents * number_of_events
+    tallies = np.bincount(bins + observed_events, minlength=size)
+    return tallies.reshape(len(timesPerObservation), numberOfStudents, number_of_events)
+
+'''
+Summary: Return the sampling schedules of several times per observation merged and grouped by observed student, as
+(flat indices into a (students x time) matrix, tally bins before adding the event code, student offsets). The
+observations of students [a, b) are the slice [offsets[a], offsets[b]) of both arrays, so the class can be observed
+a chunk of students at a time. Cached like combined_observation_schedule; the returned arrays are read-only.
+Parameter: numberOfStudents - the number of students in the class
+Parameter: timesPerObservation - a tuple of the times per observation
+Parameter: timeline_length - the number of time units of each student timeline
+Parameter: number_of_events - the number of distinct events
+'''
+@functools.lru_cache(maxsize=16)
+def student_grouped_observation_schedule(numberOfStudents, timesPerObservation, timeline_length, number_of_events):
+    all_observed_students = []
+    flat_indices = []
+    bins = []
+    for interval_index, time_per_observation in enumerate(timesPerObservation):
+        observed_students, observation_times = observation_schedule(numberOfStudents, time_per_observation, timeline_length)
+        all_observed_students.append(observed_students)
+        flat_indices.append(observed_students * timeline_length + observation_times)
+        bins.append((interval_index * numberOfStudents + observed_students) * number_of_events)
+    all_observed_students = np.concatenate(all_observed_students) if all_observed_students else np.zeros(0, dtype=np.intp)
+    order = np.argsort(all_observed_students, kind='stable')
+    flat_indices = np.concatenate(flat_indices)[order] if flat_indices else np.zeros(0, dtype=np.intp)
+    bins = np.concatenate(bins)[order] if bins else np.zeros(0, dtype=np.intp)
+    offsets = np.searchsorted(all_observed_students[order], np.arange(numberOfStudents + 1))
+    for array in (flat_indices, bins, offsets):
+        array.setflags(write=False)
+    return flat_indices, bins, offsets
+
+'''
+Summary: Add the observation tallies of a chunk of consecutive students of a class to the (intervals x students x events)
+tallies of the whole class. A student's tallies only depend on its own timeline, so observing the class a chunk at a
+time gives the same tallies as observing it at once.
+Parameter: chunk_states - the states of the chunk, as an integer-coded (chunk students x time) matrix or EpisodeBoundaries
+Parameter: numberOfStudents - the number of students in the whole class
+Parameter: first_student - the index of the first student of the chunk in the class
+Parameter: timesPerObservation - the times per observation
+Parameter: number_of_events - the number of distinct events
+Parameter: tallies - the (intervals x students x events) tallies of the class, updated in place
+'''
+def add_student_chunk_tallies(chunk_states, numberOfStudents, first_student, timesPerObservation, number_of_events, tallies):
+    if isinstance(chunk_states, EpisodeBoundaries):
+        timeline_length = chunk_states.get_timeline_length()
+    else:
+        timeline_length = chunk_states.shape[1]
+    flat_indices, bins, offsets = student_grouped_observation_schedule(numberOfStudents, tuple(timesPerObservation), timeline_length, number_of_events)
+    low = offsets[first_student]
+    high = offsets[first_student + len(chunk_states)]
+    chunk_flat_indices = flat_indices[low:high] - first_student * timeline_length
+    if isinstance(chunk_states, EpisodeBoundaries):
+        observed_events = chunk_states.events_at_flat_indices(chunk_flat_indices)
+    else:
+        observed_events = chunk_states.ravel()[chunk_flat_indices]
+    tallies += np.bincount(bins[low:high] + observed_events, minlength=tallies.size).reshape(tallies.shape)
+
+'''
+Summary: Generate and observe a class a chunk of students at a time, so that only one chunk of timelines is held in memory,
+returning the (intervals x students x events) observation tallies. Chunks of rows draw from the generator in the same
+order as a single call for the whole class, so a seeded run gives the same tallies whatever the chunk size.
+Parameter: durations - the duration of each event, indexed by event code
+Parameter: counts - the number of episodes of each event for a single student
+Parameter: numberOfStudents - the number of students in the class
+Parameter: students_per_chunk - the number of students generated and observed at once
+Parameter: timesPerObservation - the times per observation
+Parameter: generator - the numpy random generator used to order the episodes
+Parameter: write_rows - optional function taking (chunk state matrix, first student) to keep the timelines; the chunks
+are then built as state matrices instead of episode boundaries
+'''
+def compute_chunked_observation_tallies(durations, counts, numberOfStudents, students_per_chunk, timesPerObservation, generator, write_rows=None):
+    number_of_events = len(durations)
+    tallies = np.zeros((len(timesPerObservation), numberOfStudents, number_of_events), dtype=np.int64)
+    for first_student in range(0, numberOfStudents, students_per_chunk):
+        chunk_size = min(students_per_chunk, numberOfStudents - first_student)
+        if write_rows is not None:
+            chunk_states = generate_state_matrix(durations, counts, chunk_size, generator)
+            write_rows(chunk_states, first_student)
+        else:
+            chunk_states = generate_episode_boundaries(durations, counts, chunk_size, generator)
+        add_student_chunk_tallies(chunk_states, numberOfStudents, first_student, timesPerObservation, number_of_events, tallies)
+        # Released before the next chunk is generated, so two chunks are never held at once
+        chunk_states = None
+    return tallies
+
+'''
+Summary: Count how many time units a single student timeline spends in each event
+Parameter: state_row - the integer-coded states of one student
+Parameter: number_of_events - the number of distinct events
+'''
+def compute_event_time_counts(state_row, number_of_events):
+    return np.bincount(state_row, minlength=number_of_events)
+
+# Run Length Timeline Class
+class RunLengthTimeline:
+    '''
+    Summary: Constructor to populate a run-length encoded timeline of a single student
+    Parameter: starts - the time index at which each episode starts, in increasing order
+    Parameter: codes - the event code of each episode
+    Parameter: length - the total number of time units covered by the timeline
+    '''
+    def __init__(self, starts, codes, length):
+        self.starts = starts
+        self.codes = codes
+        self.length = length
+
+    '''
+    Summary: Return the number of time units covered by the timeline
+    '''
+    def __len__(self):
+        return self.length
+
+    '''
+    Summary: Return the event code active at a single time index, using a binary search over episode starts
+    Parameter: time_index - the time index to look up
+    '''
+    def event_at(self, time_index):
+        return self.codes[bisect.bisect_right(self.starts, time_index) - 1]
+
+    '''
+    Summary: Return the event codes active at an array of time indices, using a binary search over episode starts
+    Parameter: time_indices - the time indices to look up
+    '''
+    def events_at(self, time_indices):
+        return self.codes[np.searchsorted(self.starts, time_indices, side='right') - 1]
+
+    '''
+    Summary: Return the length of each episode of the timeline
+    '''
+    def episode_lengths(self):
+        return np.diff(self.starts, append=self.length)
+
+    '''
+    Summary: Count how many time units the timeline spends in each event
+    Parameter: number_of_events - the number of distinct events
+    '''
+    def event_time_counts(self, number_of_events):
+        return np.bincount(self.codes, weights=self.episode_lengths(), minlength=number_of_events).astype(np.int64)
+
+    '''
+    Summary: Expand the timeline into one event code per time unit
+    '''
+    def expand(self):
+        return np.repeat(self.codes, self.episode_lengths())
+
+'''
+Summary: Build run-length encoded timelines for a whole class, storing only episode starts and event codes
+Parameter: durations - the duration of each event, indexed by event code
+Parameter: counts - the number of episodes of each event for a single student
+Parameter: numberOfStudents - the number of students in the class
+Parameter: generator - the numpy random generator used to order the episodes
+'''
+def generate_run_length_timelines(durations, counts, numberOfStudents, generator):
+    orders = generate_episode_orders(counts, numberOfStudents, generator)
+    ends = np.cumsum(durations[orders], axis=1)
+    starts = ends - durations[orders]
+    timeline_length = int(np.dot(durations, counts))
+    return [RunLengthTimeline(starts[i], orders[i], timeline_length) for i in range(numberOfStudents)]
+
+'''
+Summary: Return the cumulative transition probabilities of a Markov chain as a read-only table whose rows, read one
+after the other, are increasing: row r holds r + the cumulative sum of row r of the transition matrix, with its last
+entry set to exactly r + 1. Drawing the next state of a chain in state r with a uniform u in [0, 1) is then one binary
+search for r + u over the flattened table, so chains in different states are advanced together by a single
+searchsorted call.
+Parameter: transition_matrix - the (states x states) row-stochastic transition matrix
+'''
+def cumulative_transition_table(transition_matrix):
+    transition_matrix = np.asarray(transition_matrix, dtype=float)
+    number_of_states = transition_matrix.shape[0]
+    cumulative = np.cumsum(transition_matrix, axis=1)
+    cumulative[:, -1] = 1.0
+    table = cumulative + np.arange(number_of_states)[:, None]
+    table.setflags(write=False)
+    return table
+
+'''
+Summary: Advance every chain by one transition with a single vectorized uniform draw
+Parameter: transition_table - the table returned by cumulative_transition_table
+Parameter: current_states - the current state of every chain
+Parameter: generator - the numpy random generator
+'''
+def advance_markov_chains(transition_table, current_states, generator):
+    number_of_states = transition_table.shape[0]
+    uniforms = generator.random(len(current_states))
+    return np.searchsorted(transition_table.ravel(), current_states + uniforms, side='right') - current_states * number_of_states
+
+'''
+Summary: Build the alias tables of every row of a Markov transition matrix with Vose's method, returning read-only
+(probabilities, aliases) arrays of shape (states x states). Building costs O(states) per row and every draw then costs
+O(1) whatever the number of states.
+Parameter: transition_matrix - the (states x states) row-stochastic transition matrix
+'''
+def alias_transition_tables(transition_matrix):
+    transition_matrix = np.asarray(transition_matrix, dtype=float)
+    number_of_states = transition_matrix.shape[0]
+    probabilities = np.ones((number_of_states, number_of_states))
+    aliases = np.tile(np.arange(number_of_states), (number_of_states, 1))
+    for row_index, row in enumerate(transition_matrix):
+        scaled = (row * (number_of_states / row.sum())).tolist()
+        small = [state for state, value in enumerate(scaled) if value < 1.0]
+        large = [state for state, value in enumerate(scaled) if value >= 1.0]
+        while small and large:
+            small_state = small.pop()
+            large_state = large.pop()
+            probabilities[row_index, small_state] = scaled[small_state]
+            aliases[row_index, small_state] = large_state
+            scaled[large_state] -= 1.0 - scaled[small_state]
+            if scaled[large_state] < 1.0:
+                small.append(large_state)
+            else:
+                large.append(large_state)
+        # Whatever is left only differs from 1 by rounding, so it keeps probability 1 and its own index
+    probabilities.setflags(write=False)
+    aliases.setflags(write=False)
+    return probabilities, aliases
+
+'''
+Summary: Advance every chain by one transition with the alias method: one uniform column and one uniform threshold per
+chain, so a draw costs O(1) whatever the number of states
+Parameter: probabilities - the probabilities returned by alias_transition_tables
+Parameter: aliases - the aliases returned by alias_transition_tables
+Parameter: current_states - the current state of every chain
+Parameter: generator - the numpy random generator
+'''
+def advance_markov_chains_with_alias(probabilities, aliases, current_states, generator):
+    columns = generator.integers(probabilities.shape[1], size=len(current_states))
+    uniforms = generator.random(len(current_states))
+    return np.where(uniforms < probabilities[current_states, columns], columns, aliases[current_states, columns])
+
+'''
+Summary: Draw the episodes of many Markov chains at once, advancing every chain together until each one covers the
+timeline, and return (codes, starts) as (chains x steps) arrays. Episodes that start at or after timeline_length
+belong to chains that were already complete and must be ignored.
+Parameter: next_states - a function taking (current states, generator) and returning the next state of every chain,
+for example a HiddenMarkovModel's get_next_states
+Parameter: durations - the duration of each event, indexed by event code
+Parameter: initial_states - the first event code of every chain
+Parameter: timeline_length - the number of time units each chain has to cover
+Parameter: generator - the numpy random generator
+'''
+def generate_markov_episodes(next_states, durations, initial_states, timeline_length, generator):
+    current_states = np.asarray(initial_states, dtype=np.intp)
+    codes = [current_states]
+    covered = durations[current_states].astype(np.int64)
+    while len(covered) and covered.min() < timeline_length:
+        current_states = next_states(current_states, generator)
+        codes.append(current_states)
+        covered += durations[current_states]
+    codes = np.stack(codes, axis=1)
+    ends = np.cumsum(durations[codes], axis=1)
+    return codes, ends - durations[codes]
+
+'''
+Summary: Build the integer-coded (chains x time) state matrix of Markov episodes, cutting the last episode of every
+chain at the end of the timeline
+Parameter: codes - the (chains x steps) event codes returned by generate_markov_episodes
+Parameter: starts - the (chains x steps) episode starts returned by generate_markov_episodes
+Parameter: durations - the duration of each event, indexed by event code
+Parameter: timeline_length - the number of time units of each timeline
+'''
+def markov_episodes_to_state_matrix(codes, starts, durations, timeline_length):
+    lengths = np.clip(np.minimum(durations[codes], timeline_length - starts), 0, None)
+    states = np.repeat(codes.ravel().astype(event_code_dtype(len(durations))), lengths.ravel())
+    return states.reshape(len(codes), timeline_length)
+
+'''
+Summary: Build one run-length encoded timeline per chain from Markov episodes, dropping the episodes drawn after a
+chain covered the timeline
+Parameter: codes - the (chains x steps) event codes returned by generate_markov_episodes
+Parameter: starts - the (chains x steps) episode starts returned by generate_markov_episodes
+Parameter: number_of_events - the number of distinct events
+Parameter: timeline_length - the number of time units of each timeline
+'''
+def markov_episodes_to_run_length_timelines(codes, starts, number_of_events, timeline_length):
+    dtype = event_code_dtype(number_of_events)
+    timelines = []
+    for chain_codes, chain_starts in zip(codes, starts):
+        used = chain_starts < timeline_length
+        timelines.append(RunLengthTimeline(chain_starts[used], chain_codes[used].astype(dtype), timeline_length))
+    return timelines
+
+'''
+Summary: Return whether every state of a Markov chain can reach every other state, with a breadth-first search over the
+non-zero transitions in both directions
+Parameter: transition_matrix - the (states x states) transition matrix
+'''
+def is_irreducible(transition_matrix):
+    adjacency = np.asarray(transition_matrix) > 0
+    for graph in (adjacency, adjacency.T):
+        reached = np.zeros(len(graph), dtype=bool)
+        reached[0] = True
+        frontier = np.array([0])
+        while len(frontier):
+            newly_reached = graph[frontier].any(axis=0) & ~reached
+            reached |= newly_reached
+            frontier = np.flatnonzero(newly_reached)
+        if not reached.all():
+            return False
+    return True
+
+'''
+Summary: Return the stationary distribution pi of an irreducible Markov chain (pi P = pi, pi summing to one), solved
+directly by replacing one equation of (P^T - I) pi = 0 with the normalisation. Chains too large to solve directly, and
+the rare chains whose direct solution is inaccurate, fall back to power iteration on the lazy chain (P + I) / 2, which
+has the same stationary distribution and also converges for periodic chains; if it has not converged after
+max_iterations, a RuntimeWarning is issued and the last iterate is returned.
+Parameter: transition_matrix - the (states x states) transition matrix
+Parameter: direct_solve_max_states - the largest number of states solved directly; the solve needs a copy of the matrix
+Parameter: tolerance - the largest L1 residual |pi P - pi| of an accepted distribution
+Parameter: max_iterations - the largest number of power iterations
+'''
+def stationary_distribution(transition_matrix, direct_solve_max_states=4096, tolerance=1e-10, max_iterations=100000):
+    transition_matrix = np.asarray(transition_matrix, dtype=float)
+    number_of_states = transition_matrix.shape[0]
+    if not is_irreducible(transition_matrix):
+        raise ValueError("the transition matrix is reducible: some events cannot be reached from others, so there is no unique steady state distribution")
+    distribution = np.full(number_of_states, 1.0 / number_of_states)
+    if number_of_states <= direct_solve_max_states:
+        equations = transition_matrix.T - np.eye(number_of_states)
+        equations[-1] = 1.0
+        right_hand_side = np.zeros(number_of_states)
+        right_hand_side[-1] = 1.0
+        try:
+            solution = np.linalg.solve(equations, right_hand_side)
+        except np.linalg.LinAlgError:
+            solution = None
+        if solution is not None and np.isfinite(solution).all():
+            solution = np.clip(solution, 0, None)
+            solution /= solution.sum()
+            if np.abs(solution @ transition_matrix - solution).sum() <= tolerance:
+                return solution
+            # Power iteration refines an inaccurate solution faster than it converges from the uniform distribution
+            distribution = solution
+
+    lazy_transition_matrix = (transition_matrix + np.eye(number_of_states)) / 2
+    for _ in range(max_iterations):
+        next_distribution = distribution @ lazy_transition_matrix
+        converged = np.abs(next_distribution - distribution).sum() < tolerance / 2
+        distribution = next_distribution
+        if converged:
+            break
+    else:
+        warnings.warn(f"the steady state distribution did not converge in {max_iterations} power iterations; using the last iterate",
+            RuntimeWarning)
+    distribution = np.clip(distribution, 0, None)
+    return distribution / distribution.sum()
+
+'''
+Summary: Flatten a batch of integer-coded sequences into (codes, lengths), where codes holds every sequence end to end
+Parameter: sequences - a list of sequences of possibly different lengths, or a (sequences x steps) padded array
+Parameter: lengths - the length of every row of a padded array, None if sequences is a list or the rows are full
+'''
+def pack_sequences(sequences, lengths=None):
+    if isinstance(sequences, np.ndarray) and sequences.ndim == 2:
+        if lengths is None:
+            lengths = np.full(len(sequences), sequences.shape[1], dtype=np.intp)
+        lengths = np.asarray(lengths, dtype=np.intp)
+        mask = np.arange(sequences.shape[1]) < lengths[:, None]
+        return sequences[mask].astype(np.intp), lengths
+    lengths = np.array([len(sequence) for sequence in sequences], dtype=np.intp)
+    codes = np.concatenate([np.asarray(sequence, dtype=np.intp) for sequence in sequences]) if len(sequences) else np.zeros(0, dtype=np.intp)
+    return codes, lengths
+
+'''
+Summary: Return the log likelihood of the transitions of every sequence of a batch of state sequences, gathering the
+log probability of every transition at once and summing them per sequence. The first state is not scored.
+Parameter: transition_matrix - the (states x states) transition matrix
+Parameter: codes - the sequences end to end, as returned by pack_sequences
+Parameter: lengths - the length of every sequence
+'''
+def markov_log_likelihoods(transition_matrix, codes, lengths):
+    with np.errstate(divide='ignore'):
+        log_transitions = np.log(transition_matrix)
+    sequence_indices = np.repeat(np.arange(len(lengths)), lengths)
+    # A transition is only scored between two steps of the same sequence
+    same_sequence = sequence_indices[1:] == sequence_indices[:-1]
+    log_probabilities = log_transitions[codes[:-1][same_sequence], codes[1:][same_sequence]]
+    return np.bincount(sequence_indices[1:][same_sequence], weights=log_probabilities, minlength=len(lengths))
+
+'''
+Summary: Return the log likelihood of every observation sequence of a batch under a hidden Markov model with the scaled
+forward algorithm. All sequences advance together, one matrix product per time step; the forward variables are
+rescaled to sum to one at every step and the logs of the scales are accumulated, so long sequences do not underflow.
+Parameter: transition_matrix - the (states x states) transition matrix
+Parameter: emission_matrix - the (states x symbols) probability of observing each symbol in each state
+Parameter: initial_distribution - the probability of each state at the first step
+Parameter: codes - the observation sequences end to end, as returned by pack_sequences
+Parameter: lengths - the length of every sequence
+'''
+def forward_log_likelihoods(transition_matrix, emission_matrix, initial_distribution, codes, lengths):
+    number_of_sequences = len(lengths)
+    log_likelihoods = np.zeros(number_of_sequences)
+    if number_of_sequences == 0 or lengths.max() == 0:
+        return log_likelihoods
+    offsets = np.concatenate(([0], np.cumsum(lengths)[:-1]))
+    emissions_by_symbol = np.ascontiguousarray(emission_matrix.T)
+    forward = np.tile(initial_distribution, (number_of_sequences, 1))
+    for step in range(lengths.max()):
+        active = np.flatnonzero(lengths > step)
+        if step > 0:
+            forward[active] = forward[active] @ transition_matrix
+        forward[active] *= emissions_by_symbol[codes[offsets[active] + step]]
+        scales = forward[active].sum(axis=1)
+        with np.errstate(divide='ignore'):
+            log_likelihoods[active] += np.log(scales)
+        forward[active] /= np.where(scales > 0, scales, 1.0)[:, None]
+    return log_likelihoods
+
+# Episode Boundaries Class
+class EpisodeBoundaries:
+    '''
+    Summary: Constructor to populate the episode boundaries of a whole class: the episode order of every student and the
+    time at which each episode ends, with the timelines of all students laid end to end (student s covers
+    [s * length, (s + 1) * length)). Only the sampled time units are ever looked up, so observing the class costs a
+    binary search per observation instead of materialising every time unit of every student.
+    Parameter: orders - the (students x episodes) event code of every episode
+    Parameter: flat_ends - the exclusive end of every episode on the laid out timelines, in the order of orders.ravel()
+    Parameter: length - the number of time units of every student timeline
+    '''
+    def __init__(self, orders, flat_ends, length):
+        self.orders = orders
+        self.flat_ends = flat_ends
+        self.length = length
+
+    '''
+    Summary: Return the number of students
+    '''
+    def __len__(self):
+        return len(self.orders)
+
+    '''
+    Summary: Return the number of time units of every student timeline
+    '''
+    def get_timeline_length(self):
+        return self.length
+
+    '''
+    Summary: Return the event codes active at flat indices (student * length + time) of the laid out timelines, with a
+    single binary search over the episode ends of all students
+    Parameter: flat_indices - the flat indices to look up
+    '''
+    def events_at_flat_indices(self, flat_indices):
+        return self.orders.ravel()[np.searchsorted(self.flat_ends, flat_indices, side='right')]
+
+    '''
+    Summary: Tally the events observed for each student under every time per observation, returning an
+    (intervals x students x events) array
+    Parameter: timesPerObservation - the times per observation
+    Parameter: number_of_events - the number of distinct events
+    '''
+    def compute_all_observation_tallies(self, timesPerObservation, number_of_events):
+        numberOfStudents = len(self.orders)
+        flat_indices, bins = combined_observation_schedule(numberOfStudents, tuple(timesPerObservation), self.length, number_of_events)
+        observed_events = self.events_at_flat_indices(flat_indices)
+        size = len(timesPerObservation) * numberOfStudents * number_of_events
+        tallies = np.bincount(bins + observed_events, minlength=size)
+        return tallies.reshape(len(timesPerObservation), numberOfStudents, number_of_events)
+
+    '''
+    Summary: Return the (students x episodes) length of every episode
+    '''
+    def episode_lengths(self):
+        return np.diff(self.flat_ends, prepend=0).reshape(self.orders.shape)
+
+    '''
+    Summary: Count how many time units one student spends in each event
+    Parameter: student_index - the index of the student
+    Parameter: number_of_events - the number of distinct events
+    '''
+    def event_time_counts(self, student_index, number_of_events):
+        return np.bincount(self.orders[student_index], weights=self.episode_lengths()[student_index], minlength=number_of_events).astype(np.int64)
+
+    '''
+    Summary: Expand the episodes into the integer-coded (students x time) state matrix
+    '''
+    def to_state_matrix(self):
+        return np.repeat(self.orders.ravel(), self.episode_lengths().ravel()).reshape(len(self.orders), self.length)
+
+'''
+Summary: Draw the episode order of every student and compute the episode boundaries of the class, without building any
+per time unit state. Every student covers the same number of time units, so one cumulative sum over the laid out
+episodes gives the boundaries of every student at once. Uses the same draws as generate_state_matrix, so a seeded run
+observes the same timelines.
+Parameter: durations - the duration of each event, indexed by event code
+Parameter: counts - the number of episodes of each event for a single student
+Parameter: numberOfStudents - the number of students in the class
+Parameter: generator - the numpy random generator used to order the episodes
+'''
+def generate_episode_boundaries(durations, counts, numberOfStudents, generator):
+    orders = generate_episode_orders(counts, numberOfStudents, generator)
+    flat_ends = np.cumsum(durations[orders.ravel()])
+    return EpisodeBoundaries(orders, flat_ends, int(np.dot(durations, counts)))
+
+'''
+Summary: Tally the events observed for each student of run-length encoded timelines observed in round robin.
+All timelines are laid end to end so every sampled time is resolved with a single binary search.
+Parameter: timelines - the run-length encoded timeline of each student
+Parameter: time_per_observation - the time per observation
+Parameter: number_of_events - the number of distinct events
+'''
+def compute_run_length_observation_tallies(timelines, time_per_observation, number_of_events):
+    numberOfStudents = len(timelines)
+    timeline_length = len(timelines[0])
+    observed_students, observation_times = observation_schedule(numberOfStudents, time_per_observation, timeline_length)
+    offsets = np.arange(numberOfStudents, dtype=np.int64) * timeline_length
+    starts = np.concatenate([timeline.starts + offset for timeline, offset in zip(timelines, offsets)])
+    codes = np.concatenate([timeline.codes for timeline in timelines])
+    episode_indices = np.searchsorted(starts, offsets[observed_students] + observation_times, side='right') - 1
+    tallies = np.bincount(observed_students * number_of_events + codes[episode_indices], minlength=numberOfStudents * number_of_events)
+    return tallies.reshape(numberOfStudents, number_of_events)
+
+'''
+Summary: Compute the class level total tally and average percentage of each event from per-student tallies.
+A student with no observations contributes a percentage of 0 for every event. Leading axes (for example one per
+time per observation) are kept, so several intervals can be reduced at once.
+Parameter: tallies - the (... x students x events) observation tallies
+'''
+def compute_class_level_arrays(tallies):
+    student_totals = tallies.sum(axis=-1, keepdims=True)
+    percentages = np.divide(tallies, student_totals, out=np.zeros(tallies.shape), where=student_totals != 0)
+    return tallies.sum(axis=-2), percentages.mean(axis=-2)
+
+'''
+Summary: Write an integer-coded state matrix as CSV rows "time,name,name,..." (one row per time unit, one column per
+student). Each block of rows is formatted from a lookup table of ",name" strings and written with a single call.
+Parameter: state_matrix - the integer-coded states of each student
+Parameter: names - the name of every event, indexed by code
+Parameter: file - the file to write the rows to
+Parameter: rows_per_block - the number of rows formatted and written at once
+'''
+def write_state_matrix_rows(state_matrix, names, file, rows_per_block=8192):
+    prefixed_names = np.array(["," + name for name in names], dtype=object)
+    timeline_length = state_matrix.shape[1]
+    for block_start in range(0, timeline_length, rows_per_block):
+        block_end = min(block_start + rows_per_block, timeline_length)
+        write_code_block(state_matrix[:, block_start:block_end].T, block_start, prefixed_names, file)
+
+'''
+Summary: Write run-length encoded timelines as the same CSV rows as write_state_matrix_rows, resolving each block of
+time units against the episode boundaries so that the timelines are never expanded as a whole
+Parameter: timelines - the run-length encoded timeline of each student
+Parameter: names - the name of every event, indexed by code
+Parameter: file - the file to write the rows to
+Parameter: rows_per_block - the number of rows formatted and written at once
+'''
+def write_run_length_rows(timelines, names, file, rows_per_block=8192):
+    prefixed_names = np.array(["," + name for name in names], dtype=object)
+    timeline_length = len(timelines[0])
+    for block_start in range(0, timeline_length, rows_per_block):
+        time_indices = np.arange(block_start, min(block_start + rows_per_block, timeline_length))
+        block_codes = np.stack([timeline.events_at(time_indices) for timeline in timelines], axis=1)
+        write_code_block(block_codes, block_start, prefixed_names, file)
+
+'''
+Summary: Write the episode boundaries of a class as the same CSV rows as write_state_matrix_rows, looking up each block
+of time units of every student so that the timelines are never expanded as a whole
+Parameter: episode_boundaries - the EpisodeBoundaries of the class
+Parameter: names - the name of every event, indexed by code
+Parameter: file - the file to write the rows to
+Parameter: rows_per_block - the number of rows formatted and written at once
+'''
+def write_episode_boundary_rows(episode_boundaries, names, file, rows_per_block=8192):
+    prefixed_names = np.array(["," + name for name in names], dtype=object)
+    timeline_length = episode_boundaries.get_timeline_length()
+    offsets = np.arange(len(episode_boundaries), dtype=np.int64) * timeline_length
+    for block_start in range(0, timeline_length, rows_per_block):
+        time_indices = np.arange(block_start, min(block_start + rows_per_block, timeline_length))
+        block_codes = episode_boundaries.events_at_flat_indices(time_indices[:, None] + offsets)
+        write_code_block(block_codes, block_start, prefixed_names, file)
+
+'''
+Summary: Write one block of rows "time,name,name,..." from a (time x students) block of event codes
+Parameter: block_codes - the event codes of the block, one row per time unit
+Parameter: block_start - the time index of the first row of the block
+Parameter: prefixed_names - the ",name" string of every event, indexed by code
+Parameter: file - the file to write the rows to
+'''
+def write_code_block(block_codes, block_start, prefixed_names, file):
+    block = prefixed_names[block_codes].tolist()
+    lines = [str(time_index) + "".join(row) + "\r\n" for time_index, row in enumerate(block, block_start + 1)]
+    file.write("".join(lines))
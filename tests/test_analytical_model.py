@@ -0,0 +1,91 @@
+import csv
+import math
+import warnings
+import pytest
+from simulation_core import Event, BROMPSimulator
+
+'''
+Summary: Read the rows of a validation output, keyed by (time per observation, event, statistic)
+Parameter: path - the validation output
+'''
+def read_validation_rows(path):
+    rows = {}
+    time_per_observation = None
+    with open(path, newline='') as file:
+        for row in csv.reader(file):
+            if row and row[0].startswith("Time per observation = "):
+                time_per_observation = int(row[0].split("= ")[1])
+            elif len(row) == 8 and row[0]:
+                rows[(time_per_observation, row[0], row[1])] = row
+    return rows
+
+def test_validation_flags_estimate_of_constant_statistic(tmp_path):
+    # Every 300 unit episode covers exactly 6 observations of its student, so the simulated tallies never vary
+    events = [Event("short", "2", "50"), Event("long", "300", "50")]
+    simulator = BROMPSimulator(events, [10], 5, 1200, engine="sampled", seed=1)
+    output = tmp_path / "validation.csv"
+    with pytest.warns(UserWarning, match="less than 1.5 times the longest episode"):
+        largest_score = simulator.validate_analytical_estimate(str(output), 50)
+
+    assert largest_score == math.inf
+    row = read_validation_rows(output)[(10, "long", "std tally")]
+    assert float(row[3]) == 0.0
+    assert float(row[2]) > 1
+    assert row[7] == "inf"
+    # The averages agree to a millionth, which is not flagged
+    assert float(read_validation_rows(output)[(10, "long", "average tally")][7]) == 0.0
+
+@pytest.mark.parametrize("events, number_of_students, total_observation_time, times_per_observation", [
+    ([Event("on-task", "20", "70"), Event("off-task", "10", "30")], 3, 1200, [10, 20]),
+    ([Event("a", "5", "40"), Event("b", "15", "30"), Event("c", "30", "20"), Event("d", "60", "10")], 10, 3600, [10, 20]),
+])
+def test_estimate_matches_simulations_inside_validity_range(tmp_path, events, number_of_students, total_observation_time, times_per_observation):
+    simulator = BROMPSimulator(events, times_per_observation, number_of_students, total_observation_time, engine="sampled", seed=3)
+    assert simulator.get_analytical_validity_problems() == []
+    output = tmp_path / "validation.csv"
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        largest_score = simulator.validate_analytical_estimate(str(output), 2000)
+
+    # 2000 simulations estimate a std to about 1.6%
+    assert largest_score < 4
+    for (time_per_observation, event, statistic), row in read_validation_rows(output).items():
+        if statistic.startswith("std"):
+            assert abs(float(row[5])) < 0.06
+
+def test_estimate_warns_outside_validity_range(tmp_path):
+    # A short session of 13 episodes per student, each observed more often than its longest episodes change
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    simulator = BROMPSimulator(events, [7], 3, 200, engine="sampled", seed=1)
+    with pytest.warns(UserWarning, match="13 episodes, fewer than 50"):
+        simulator.estimate_repeated_simulation()
+
+    output = tmp_path / "estimate.csv"
+    with pytest.warns(UserWarning):
+        simulator.run_analytical_estimate(str(output))
+    lines = output.read_text().splitlines()
+    assert lines[1] == "Outside the validity range of the stds: every timeline has 13 episodes, fewer than 50"
+    assert lines[2].startswith("Outside the validity range of the stds: with a time per observation of 7, a student is observed every 21 time units")
+
+def test_validation_simulates_the_same_replicates_as_a_run(tmp_path):
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    simulator = BROMPSimulator(events, [10, 20], 3, 1200, engine="sampled", seed=8)
+    simulator.set_precision_target(0.02, batch_size=20)
+    run_output = tmp_path / "run.csv"
+    completed = simulator.run_repeated_simulation(str(run_output), 1000)
+    validation_output = tmp_path / "validation.csv"
+    simulator.validate_analytical_estimate(str(validation_output), 1000)
+
+    assert "Analytical estimate = " in validation_output.read_text() and (", " + str(completed) + " simulations") in validation_output.read_text()
+    rows = read_validation_rows(validation_output)
+    time_per_observation = None
+    compared = 0
+    with open(run_output, newline='') as file:
+        for row in csv.reader(file):
+            if row and row[0].startswith("Time per observation = "):
+                time_per_observation = int(row[0].split("= ")[1])
+            elif time_per_observation is not None and row and row[0] in ("on-task", "off-task") and len(row) == 7:
+                for name, value in zip(["average tally", "std tally", "average percentage", "std percentage"], row[1:5]):
+                    assert rows[(time_per_observation, row[0], name)][3] == value
+                    compared += 1
+    assert compared == 2 * 2 * 4
@@ -0,0 +1,40 @@
+import json
+import pytest
+import benchmark_suite
+
+QUICK = ["--scenario", "small_classroom", "--scale", "0.004", "--no-memory"]
+
+def test_single_simulation_writers_are_timed(tmp_path, capsys):
+    output_file = tmp_path / "before.json"
+    assert benchmark_suite.main(QUICK + ["--engine", "sampled", "--output", str(output_file)]) == 0
+    results = json.loads(output_file.read_text())
+    stages = results["scenarios"]["small_classroom"]["stages"]
+    assert set(stages) == set(benchmark_suite.STAGES)
+    assert stages["writers"]["seconds"] > 0
+    assert "writers ms" in capsys.readouterr().out
+
+def test_compare_reports_speedup_against_a_matching_baseline(tmp_path, capsys):
+    baseline_file = tmp_path / "before.json"
+    benchmark_suite.main(QUICK + ["--output", str(baseline_file)])
+    capsys.readouterr()
+    benchmark_suite.main(QUICK + ["--compare", str(baseline_file)])
+    row = capsys.readouterr().out.splitlines()[1]
+    assert row.startswith("small_classroom,") and row.endswith("x")
+
+def test_speedup_only_uses_the_stages_of_both_runs():
+    previous = {"stages": {"generation": {"per_replicate_ms": 4.0}, "csv": {"per_replicate_ms": 2.0}}}
+    result = {"stages": {"generation": {"per_replicate_ms": 2.0}, "csv": {"per_replicate_ms": 1.0}, "writers": {"per_replicate_ms": 100.0}}}
+    assert benchmark_suite.get_speedup(result, previous) == pytest.approx(2.0)
+
+@pytest.mark.parametrize("arguments, message", [
+    (["--engine", "runlength"], "engine is 'matrix' in the baseline but 'runlength' here"),
+    (["--scale", "0.008"], "scale is 0.004 in the baseline but 0.008 here"),
+])
+def test_compare_refuses_a_baseline_with_other_settings(tmp_path, capsys, arguments, message):
+    baseline_file = tmp_path / "before.json"
+    benchmark_suite.main(QUICK + ["--output", str(baseline_file)])
+    capsys.readouterr()
+    with pytest.raises(SystemExit) as exit_info:
+        benchmark_suite.main(QUICK + arguments + ["--compare", str(baseline_file)])
+    assert exit_info.value.code == 2
+    assert message in capsys.readouterr().err
@@ -0,0 +1,70 @@
+import os
+import threading
+from simulation_core import Event, BROMPSimulator
+
+'''
+Summary: Build a small seeded simulator
+Parameter: seed - the seed of the simulator
+Parameter: engine - the timeline engine
+Parameter: workers - the number of worker processes, None to run serially
+'''
+def build_simulator(seed=7, engine="matrix", workers=None):
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    return BROMPSimulator(events, [20, 40], 5, 600, engine=engine, seed=seed, workers=workers)
+
+'''
+Summary: Return the bytes of a file
+Parameter: path - the file to read
+'''
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+def test_stale_row_files_without_checkpoint_are_dropped(tmp_path):
+    reference = tmp_path / "reference.csv"
+    build_simulator().run_repeated_simulation(str(reference), 40)
+
+    checkpoint = str(tmp_path / "run.checkpoint")
+    # Rows left by a run that died before writing its first checkpoint
+    for interval_index in range(2):
+        with open(checkpoint + ".rows" + str(interval_index), 'w', newline='') as file:
+            for replicate in range(1, 6):
+                file.write(str(replicate) + ",1,0.5,1,0.5\r\n")
+    output = tmp_path / "output.csv"
+    build_simulator().run_repeated_simulation(str(output), 40, checkpoint_file=checkpoint, checkpoint_interval=10)
+
+    assert read_bytes(output) == read_bytes(reference)
+    assert not os.path.exists(checkpoint)
+    assert not os.path.exists(checkpoint + ".rows0")
+
+def test_resumed_run_matches_uninterrupted_run(tmp_path):
+    reference = tmp_path / "reference.csv"
+    build_simulator().run_repeated_simulation(str(reference), 40)
+
+    checkpoint = str(tmp_path / "run.checkpoint")
+    output = tmp_path / "output.csv"
+    simulator = build_simulator()
+    cancel_event = threading.Event()
+    simulator.set_progress_monitor(lambda completed, total: completed == 15 and cancel_event.set(), cancel_event)
+    assert simulator.run_repeated_simulation(str(output), 40, checkpoint_file=checkpoint, checkpoint_interval=10) == 15
+    assert os.path.exists(checkpoint)
+
+    # A new simulator, as after a restart; the checkpoint restores the seed entropy
+    assert build_simulator(seed=99).run_repeated_simulation(str(output), 40, checkpoint_file=checkpoint, checkpoint_interval=10) == 40
+    assert read_bytes(output) == read_bytes(reference)
+    assert not os.path.exists(checkpoint)
+
+def test_parallel_checkpoint_resumes_serially_with_another_engine(tmp_path):
+    reference = tmp_path / "reference.csv"
+    build_simulator().run_repeated_simulation(str(reference), 40)
+
+    checkpoint = str(tmp_path / "run.checkpoint")
+    output = tmp_path / "output.csv"
+    simulator = build_simulator(workers=2)
+    cancel_event = threading.Event()
+    simulator.set_progress_monitor(lambda completed, total: completed >= 15 and cancel_event.set(), cancel_event)
+    completed = simulator.run_repeated_simulation(str(output), 40, checkpoint_file=checkpoint, checkpoint_interval=10)
+    assert 15 <= completed < 40
+
+    assert build_simulator(seed=None, engine="sampled").run_repeated_simulation(str(output), 40, checkpoint_file=checkpoint, checkpoint_interval=10) == 40
+    assert read_bytes(output) == read_bytes(reference)
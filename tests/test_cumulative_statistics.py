@@ -0,0 +1,30 @@
+from unittest import mock
+import cumulative_statistics
+from simulation_core import Event, BROMPSimulator
+
+def test_output_of_results_list_closes_its_row_files(tmp_path):
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    simulator = BROMPSimulator(events, [20], 3, 600, engine="matrix", seed=5)
+    run_data = []
+    for _ in range(4):
+        tallies = simulator.compute_all_observation_tallies(simulator.generate_students_states())[0]
+        run_data.append({20: simulator.compute_class_level_results(tallies)})
+
+    created = []
+    original_init = cumulative_statistics.CumulativeResults.__init__
+    def recording_init(self, *args, **kwargs):
+        original_init(self, *args, **kwargs)
+        created.append(self)
+    with mock.patch.object(cumulative_statistics.CumulativeResults, "__init__", recording_init):
+        simulator.output_cumulative_results(run_data, str(tmp_path / "list.csv"))
+
+    assert len(created) == 1
+    assert all(row_file.closed for row_file in created[0].row_files)
+
+    # The same replicates streamed into CumulativeResults give the same output
+    cumulative_results = cumulative_statistics.CumulativeResults(events, [20])
+    for all_observation_time_data in run_data:
+        cumulative_results.add_run_data(all_observation_time_data)
+    simulator.output_cumulative_results(cumulative_results, str(tmp_path / "streamed.csv"))
+    cumulative_results.close()
+    assert (tmp_path / "list.csv").read_bytes() == (tmp_path / "streamed.csv").read_bytes()
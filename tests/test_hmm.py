@@ -0,0 +1,60 @@
+import itertools
+import math
+import numpy as np
+import pytest
+import simulation_engine
+from updated_hmm_integration import HiddenMarkovModel, Event
+
+def random_stochastic_matrix(rows, columns, generator):
+    matrix = generator.random((rows, columns)) + 0.05
+    return matrix / matrix.sum(axis=1, keepdims=True)
+
+def brute_force_log_likelihood(transition_matrix, emission_matrix, initial_distribution, sequence):
+    # Sums the probability of the sequence over every path of hidden states
+    likelihood = 0.0
+    for path in itertools.product(range(len(transition_matrix)), repeat=len(sequence)):
+        probability = initial_distribution[path[0]] * emission_matrix[path[0], sequence[0]]
+        for step in range(1, len(sequence)):
+            probability *= transition_matrix[path[step - 1], path[step]] * emission_matrix[path[step], sequence[step]]
+        likelihood += probability
+    return math.log(likelihood)
+
+def make_model(generator):
+    model = HiddenMarkovModel([Event(name, "10", "25") for name in "abc"])
+    model.set_transition_matrix(random_stochastic_matrix(3, 3, generator))
+    model.set_emission_model(random_stochastic_matrix(3, 2, generator), generator.dirichlet(np.ones(3)))
+    return model
+
+def test_forward_algorithm_matches_brute_force_enumeration():
+    generator = np.random.default_rng(7)
+    model = make_model(generator)
+    sequences = [generator.integers(2, size=length).tolist() for length in (1, 2, 3, 5, 6, 4)]
+    expected = [brute_force_log_likelihood(model.transition_matrix, model.emission_matrix, model.initial_distribution, sequence)
+        for sequence in sequences]
+    assert model.calculate_log_likelihoods(sequences) == pytest.approx(expected, rel=1e-12)
+
+    # A padded array with the length of every row scores the same sequences
+    padded = np.zeros((len(sequences), 6), dtype=np.intp)
+    for row, sequence in enumerate(sequences):
+        padded[row, :len(sequence)] = sequence
+    lengths = [len(sequence) for sequence in sequences]
+    assert model.calculate_log_likelihoods(padded, lengths) == pytest.approx(expected, rel=1e-12)
+
+def test_forward_algorithm_does_not_underflow_on_long_sequences():
+    generator = np.random.default_rng(8)
+    model = make_model(generator)
+    sequence = generator.integers(2, size=5000)
+    log_likelihood = model.calculate_observation_log_likelihood(sequence)
+    assert np.isfinite(log_likelihood)
+    # The log likelihood of the whole sequence is that of its first half plus that of the second half given the first
+    first_half = model.calculate_observation_log_likelihood(sequence[:2500])
+    assert log_likelihood < first_half < 0
+    assert model.calculate_observation_likelihood(sequence) == 0.0
+
+def test_markov_log_likelihoods_score_every_transition():
+    transition_matrix = np.array([[0.5, 0.5, 0.0], [0.2, 0.3, 0.5], [0.1, 0.1, 0.8]])
+    sequences = [[0, 1, 2, 2], [2], [1, 0, 0], [0, 2]]
+    codes, lengths = simulation_engine.pack_sequences(sequences)
+    log_likelihoods = simulation_engine.markov_log_likelihoods(transition_matrix, codes, lengths)
+    assert log_likelihoods[:3] == pytest.approx([math.log(0.5 * 0.5 * 0.8), 0.0, math.log(0.2 * 0.5)])
+    assert log_likelihoods[3] == -np.inf
@@ -0,0 +1,109 @@
+import numpy as np
+import pytest
+import simulation_engine
+from updated_hmm_integration import HiddenMarkovModel, Event
+
+'''
+Summary: Return a random transition matrix with a few impossible transitions
+Parameter: number_of_states - the number of states
+Parameter: seed - the seed of the matrix
+'''
+def random_transition_matrix(number_of_states, seed):
+    generator = np.random.default_rng(seed)
+    transition_matrix = generator.random((number_of_states, number_of_states)) * (generator.random((number_of_states, number_of_states)) > 0.2)
+    transition_matrix[:, 0] += 0.01
+    return transition_matrix / transition_matrix.sum(axis=1, keepdims=True)
+
+'''
+Summary: Return the Pearson chi-square statistic of the transitions drawn from every state against the transition
+matrix, and its degrees of freedom
+Parameter: next_states - a function taking (current states, generator) and returning the next state of every chain
+Parameter: transition_matrix - the transition matrix the draws should follow
+Parameter: draws_per_state - the number of transitions drawn from every state
+'''
+def chi_square(next_states, transition_matrix, draws_per_state, seed=0):
+    number_of_states = len(transition_matrix)
+    current_states = np.repeat(np.arange(number_of_states), draws_per_state)
+    next_codes = next_states(current_states, np.random.default_rng(seed))
+    observed = np.bincount(current_states * number_of_states + next_codes, minlength=number_of_states ** 2).reshape(number_of_states, number_of_states)
+    expected = transition_matrix * draws_per_state
+    # Transitions of probability 0 must never be drawn
+    assert not observed[expected == 0].any()
+    possible = expected > 0
+    statistic = (((observed - expected) ** 2)[possible] / expected[possible]).sum()
+    return statistic, possible.sum() - number_of_states
+
+'''
+Summary: Return whether a chi-square statistic is below the 99.99% quantile of its distribution, with the Wilson-Hilferty
+approximation
+Parameter: statistic - the chi-square statistic
+Parameter: degrees_of_freedom - its degrees of freedom
+'''
+def is_plausible(statistic, degrees_of_freedom):
+    quantile = degrees_of_freedom * (1 - 2 / (9 * degrees_of_freedom) + 3.72 * np.sqrt(2 / (9 * degrees_of_freedom))) ** 3
+    return statistic < quantile
+
+def test_cumulative_table_reproduces_transition_rows():
+    transition_matrix = random_transition_matrix(6, 1)
+    table = simulation_engine.cumulative_transition_table(transition_matrix)
+    rows = np.diff(table - np.arange(6)[:, None], axis=1, prepend=0)
+    assert rows == pytest.approx(transition_matrix, abs=1e-12)
+
+def test_cumulative_table_draws_follow_transition_rows():
+    transition_matrix = random_transition_matrix(6, 2)
+    table = simulation_engine.cumulative_transition_table(transition_matrix)
+    statistic, degrees_of_freedom = chi_square(lambda states, generator: simulation_engine.advance_markov_chains(table, states, generator),
+        transition_matrix, 20000)
+    assert is_plausible(statistic, degrees_of_freedom)
+    # The test notices draws that are 5% off
+    statistic, degrees_of_freedom = chi_square(lambda states, generator: simulation_engine.advance_markov_chains(table, states, generator),
+        0.95 * transition_matrix + 0.05 / 6, 20000)
+    assert not is_plausible(statistic, degrees_of_freedom)
+
+def test_set_transition_matrix_rebuilds_cumulative_table():
+    model = HiddenMarkovModel([Event(name, "10", "25") for name in "abcd"])
+    assert not model.uses_alias_sampler()
+    transition_matrix = random_transition_matrix(4, 4)
+    model.set_transition_matrix(transition_matrix)
+    assert model.transition_table == pytest.approx(simulation_engine.cumulative_transition_table(transition_matrix))
+    statistic, degrees_of_freedom = chi_square(model.get_next_states, transition_matrix, 20000)
+    assert is_plausible(statistic, degrees_of_freedom)
+
+def test_alias_tables_reproduce_transition_rows():
+    transition_matrix = random_transition_matrix(12, 5)
+    probabilities, aliases = simulation_engine.alias_transition_tables(transition_matrix)
+    # Every column keeps itself with its probability and hands the rest to its alias, each column drawn 1 / states of the time
+    rows = np.zeros_like(transition_matrix)
+    for row_index in range(12):
+        rows[row_index] = probabilities[row_index] + np.bincount(aliases[row_index], weights=1 - probabilities[row_index], minlength=12)
+    assert rows / 12 == pytest.approx(transition_matrix, abs=1e-12)
+
+def test_alias_draws_follow_transition_rows():
+    transition_matrix = random_transition_matrix(12, 6)
+    probabilities, aliases = simulation_engine.alias_transition_tables(transition_matrix)
+    next_states = lambda states, generator: simulation_engine.advance_markov_chains_with_alias(probabilities, aliases, states, generator)
+    statistic, degrees_of_freedom = chi_square(next_states, transition_matrix, 20000)
+    assert is_plausible(statistic, degrees_of_freedom)
+    statistic, degrees_of_freedom = chi_square(next_states, 0.95 * transition_matrix + 0.05 / 12, 20000)
+    assert not is_plausible(statistic, degrees_of_freedom)
+
+@pytest.mark.parametrize("number_of_states", [7, 8, 9])
+def test_automatic_sampler_switch_keeps_the_distribution(number_of_states):
+    model = HiddenMarkovModel([Event(str(index), "10", "10") for index in range(number_of_states)])
+    assert model.uses_alias_sampler() == (number_of_states >= HiddenMarkovModel.ALIAS_SAMPLER_MIN_STATES)
+    transition_matrix = random_transition_matrix(number_of_states, number_of_states)
+    model.set_transition_matrix(transition_matrix)
+    statistic, degrees_of_freedom = chi_square(model.get_next_states, transition_matrix, 20000)
+    assert is_plausible(statistic, degrees_of_freedom)
+
+def test_set_transition_matrix_rebuilds_alias_tables():
+    model = HiddenMarkovModel([Event(str(index), "10", "10") for index in range(10)])
+    first_tables = model.alias_tables
+    transition_matrix = random_transition_matrix(10, 7)
+    model.transition_matrix = transition_matrix
+    assert model.alias_tables is not first_tables and model.transition_table is None
+    expected_probabilities, expected_aliases = simulation_engine.alias_transition_tables(transition_matrix)
+    assert np.array_equal(model.alias_tables[0], expected_probabilities) and np.array_equal(model.alias_tables[1], expected_aliases)
+    assert model.get_steady_state_distribution() @ transition_matrix == pytest.approx(model.get_steady_state_distribution())
+    statistic, degrees_of_freedom = chi_square(model.get_next_states, transition_matrix, 20000)
+    assert is_plausible(statistic, degrees_of_freedom)
@@ -0,0 +1,57 @@
+import csv
+import json
+from simulation_core import Event, BROMPSimulator
+
+STAGES = ["generate_students_states", "compute_observation_results", "compute_all_observation_tallies", "compute_chunked_observation_tallies",
+    "compute_class_level_results", "output_cumulative_results", "write_student_states", "write_observation_result"]
+
+def build_simulator():
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    return BROMPSimulator(events, [20, 40], 5, 600, engine="matrix", seed=6)
+
+def test_records_every_stage_of_a_run(tmp_path):
+    simulator = build_simulator()
+    summary_file = tmp_path / "profile.json"
+    simulator.enable_instrumentation(str(summary_file))
+    simulator.run(str(tmp_path / "run.csv"), 4)
+
+    records = {record["stage"]: record for record in simulator.get_instrumentation_summary()}
+    assert records["generate_students_states"]["calls"] == 4
+    assert records["generate_students_states"]["items"] == 4 * 5 * 600
+    assert records["compute_all_observation_tallies"]["items"] == 4 * (30 + 15)
+    assert records["compute_class_level_results"]["calls"] == 4 * 2
+    assert records["output_cumulative_results"]["calls"] == 1
+    assert records["output_cumulative_results"]["items"] == 4
+    assert all(record["total_seconds"] >= 0 and record["min_seconds"] <= record["max_seconds"] for record in records.values())
+    with open(summary_file) as file:
+        assert {record["stage"] for record in json.load(file)} == set(records)
+
+def test_single_simulation_summary_as_csv(tmp_path):
+    simulator = build_simulator()
+    summary_file = tmp_path / "profile.csv"
+    simulator.enable_instrumentation(str(summary_file))
+    simulator.run(str(tmp_path / "single.csv"))
+    with open(summary_file, newline='') as file:
+        rows = {row["stage"]: row for row in csv.DictReader(file)}
+    assert rows["write_student_states"]["calls"] == "1"
+    assert rows["write_observation_result"]["calls"] == "2"
+
+def test_disable_leaves_no_wrappers(tmp_path):
+    simulator = build_simulator()
+    # Enabling twice replaces the wrappers rather than stacking them
+    simulator.enable_instrumentation()
+    monitor = simulator.enable_instrumentation()
+    simulator.run(str(tmp_path / "instrumented.csv"), 3)
+    assert simulator.disable_instrumentation() is monitor
+    assert not any(stage in vars(simulator) for stage in STAGES)
+    assert simulator.get_instrumentation_summary() == []
+    assert simulator.disable_instrumentation() is None
+
+    # The records are kept, and later calls are no longer recorded
+    calls = monitor.get_record("generate_students_states").calls
+    assert calls == 3
+    uninstrumented = build_simulator()
+    uninstrumented.run(str(tmp_path / "plain.csv"), 3)
+    simulator.run(str(tmp_path / "again.csv"), 3)
+    assert monitor.get_record("generate_students_states").calls == calls
+    assert (tmp_path / "instrumented.csv").read_bytes() == (tmp_path / "plain.csv").read_bytes() == (tmp_path / "again.csv").read_bytes()
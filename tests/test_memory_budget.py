@@ -0,0 +1,27 @@
+import pytest
+from simulation_core import Event, BROMPSimulator
+
+ENGINES = ["list", "matrix", "runlength", "sampled"]
+
+def build_simulator(engine):
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    simulator = BROMPSimulator(events, [20], 30, 3600, engine=engine, seed=4)
+    simulator.set_memory_budget(60000)
+    return simulator
+
+def test_chunk_size_does_not_depend_on_engine():
+    # Under a budget every engine generates the chunks as episode boundaries
+    chunk_sizes = [build_simulator(engine).get_students_per_chunk() for engine in ENGINES]
+    assert 1 < chunk_sizes[0] < 30
+    assert chunk_sizes == [chunk_sizes[0]] * len(ENGINES)
+
+def test_kept_timelines_need_more_memory_per_student():
+    simulator = build_simulator("sampled")
+    assert simulator.get_memory_requirements(keep_timelines=True)[1] > simulator.get_memory_requirements()[1]
+    assert simulator.get_students_per_chunk(keep_timelines=True) < simulator.get_students_per_chunk()
+
+def test_budget_too_small_for_one_student():
+    simulator = build_simulator("list")
+    simulator.set_memory_budget(1000)
+    with pytest.raises(ValueError):
+        simulator.get_students_per_chunk()
@@ -0,0 +1,31 @@
+import time
+import parallel_runner
+from simulation_core import Event, BROMPSimulator
+
+'''
+Summary: Build a seeded simulator that reaches a loose precision target after a few batches
+Parameter: workers - the number of worker processes, None to run serially
+'''
+def build_simulator(workers=None):
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    simulator = BROMPSimulator(events, [20], 30, 3600, engine="sampled", seed=11, workers=workers)
+    simulator.set_precision_target(0.01, batch_size=50)
+    return simulator
+
+def test_split_replicates_limits_block_size():
+    assert parallel_runner.split_replicates(200000, 2) == [(start, min(start + 25000, 200000)) for start in range(0, 200000, 25000)]
+    blocks = parallel_runner.split_replicates(1030, 2, first_replicate=30, max_block_size=100)
+    assert blocks[0] == (30, 130) and blocks[-1] == (930, 1030) and len(blocks) == 10
+
+def test_precision_target_stops_parallel_run_with_serial_run(tmp_path):
+    serial_output = tmp_path / "serial.csv"
+    serial_completed = build_simulator().run_repeated_simulation(str(serial_output), 200000)
+    assert serial_completed < 1000
+
+    parallel_output = tmp_path / "parallel.csv"
+    start = time.perf_counter()
+    parallel_completed = build_simulator(workers=2).run_repeated_simulation(str(parallel_output), 200000)
+    # Blocks of 25000 replicates would take minutes
+    assert time.perf_counter() - start < 30
+    assert parallel_completed == serial_completed
+    assert parallel_output.read_bytes() == serial_output.read_bytes()
@@ -0,0 +1,37 @@
+import numpy as np
+import pytest
+import parallel_runner
+import simulation_engine
+from parameter_sweep import ParameterSweep
+from simulation_core import Event, BROMPSimulator
+
+EVENTS = [Event("on-task", "20", "60"), Event("off-task", "10", "30"), Event("idle", "7", "10")]
+
+'''
+Summary: Return the (replicates x observation times x student counts x intervals x events) class tallies and percentages
+of a sweep
+Parameter: sweep - the ParameterSweep to run
+Parameter: number_of_simulations - the number of replicates
+'''
+def run_sweep_replicates(sweep, number_of_simulations):
+    blocks = list(sweep.iterate_blocks(number_of_simulations))
+    return np.concatenate([tallies for tallies, _ in blocks]), np.concatenate([percentages for _, percentages in blocks])
+
+@pytest.mark.parametrize("workers", [None, 2])
+def test_sweep_matches_standalone_simulations(workers):
+    studentCounts = [3, 8]
+    totalObservationTimes = [600, 900]
+    timesPerObservation = [7, 20]
+    sweep = ParameterSweep(EVENTS, timesPerObservation, studentCounts, totalObservationTimes, seed=31, workers=workers)
+    tallies, percentages = run_sweep_replicates(sweep, 6)
+
+    for time_index, totalObservationTime in enumerate(totalObservationTimes):
+        for student_index, numberOfStudents in enumerate(studentCounts):
+            simulator = BROMPSimulator(EVENTS, timesPerObservation, numberOfStudents, totalObservationTime, engine="matrix", seed=31)
+            for replicate_index in range(6):
+                # The replicate stream a repeated simulation gives this replicate
+                simulator.numpyGenerator = parallel_runner.get_replicate_generator(simulator.seedEntropy, replicate_index)
+                class_tallies, class_percentages = simulation_engine.compute_class_level_arrays(
+                    simulator.compute_all_observation_tallies(simulator.generate_students_states()))
+                assert np.array_equal(tallies[replicate_index, time_index, student_index], class_tallies)
+                assert np.array_equal(percentages[replicate_index, time_index, student_index], class_percentages)
@@ -0,0 +1,59 @@
+import pytest
+import possums_batch
+import replicate_store
+
+BASE = ["--event", "on-task", "20", "70", "--event", "off-task", "10", "30", "--students", "5", "--observation-time", "600",
+    "--time-per-observation", "20"]
+
+'''
+Summary: Run the command line and return the error message it exits with
+Parameter: capsys - the pytest capture fixture
+Parameter: argv - the command line arguments
+'''
+def run_with_error(capsys, argv):
+    with pytest.raises(SystemExit) as exit_info:
+        possums_batch.main(argv)
+    assert exit_info.value.code == 2
+    return capsys.readouterr().err
+
+@pytest.mark.parametrize("arguments, message", [
+    (["--students", "5", "10"], "require --sweep"),
+    (["--store-timelines", "class.possums"], "--store-timelines requires --simulations"),
+    (["--simulations", "10", "--tolerance", "0.01", "--sweep"], "--tolerance cannot be combined"),
+    (["--simulations", "10", "--analytical", "--validate-analytical"], "cannot be combined"),
+    (["--simulations", "10", "--sweep", "--checkpoint", "run.ckpt"], "--sweep cannot be combined"),
+    (["--memory-budget", "1G"], "--memory-budget requires --simulations"),
+    (["--simulations", "10", "--memory-budget", "lots"], "--memory-budget"),
+    (["--simulations", "10", "--memory-budget", "100"], "--memory-budget"),
+    (["--simulations", "0"], "--simulations must be positive"),
+    (["--time-per-observation", "0"], "must be positive"),
+    (["--event", "idle", "5", "200"], "proportion must be in (0, 100]"),
+])
+def test_invalid_arguments_are_reported(tmp_path, capsys, arguments, message):
+    error = run_with_error(capsys, BASE + ["--output", str(tmp_path / "out.csv")] + arguments)
+    assert message in error
+    assert not (tmp_path / "out.csv").exists()
+
+def test_missing_store_is_reported(tmp_path, capsys):
+    error = run_with_error(capsys, ["--analyze-store", str(tmp_path / "missing.possums"), "--time-per-observation", "20",
+        "--output", str(tmp_path / "out.csv")])
+    assert "--analyze-store" in error and "missing.possums" in error
+
+@pytest.mark.parametrize("content, message", [
+    (b"not a store", "is not a POSSUMS replicate store"),
+    (replicate_store.MAGIC + b"\x10", "damaged replicate store header"),
+    (replicate_store.MAGIC + b"\x10\x00\x00\x00{\"shape\"", "damaged replicate store header"),
+])
+def test_invalid_store_is_reported(tmp_path, capsys, content, message):
+    store_file = tmp_path / "invalid.possums"
+    store_file.write_bytes(content)
+    error = run_with_error(capsys, ["--analyze-store", str(store_file), "--time-per-observation", "20", "--output", str(tmp_path / "out.csv")])
+    assert message in error
+
+def test_stored_timelines_are_analysed(tmp_path):
+    store_file = str(tmp_path / "class.possums")
+    assert possums_batch.main(BASE + ["--simulations", "4", "--seed", "3", "--store-timelines", store_file, "--output", str(tmp_path / "run.csv")]) == 0
+    assert possums_batch.main(["--analyze-store", store_file, "--time-per-observation", "20", "--output", str(tmp_path / "analysis.csv")]) == 0
+    run = (tmp_path / "run.csv").read_bytes()
+    analysis = (tmp_path / "analysis.csv").read_bytes()
+    assert analysis[analysis.index(b"Time per observation"):] == run[run.index(b"Time per observation"):]
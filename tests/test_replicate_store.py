@@ -0,0 +1,77 @@
+import threading
+import pytest
+import replicate_store
+from simulation_core import Event, BROMPSimulator, load_simulator_from_store
+
+'''
+Summary: Build a small seeded simulator
+Parameter: workers - the number of worker processes, None to run serially
+'''
+def build_simulator(workers=None):
+    events = [Event("A", "20", "70"), Event("B", "10", "30")]
+    return BROMPSimulator(events, [20, 40], 5, 600, engine="matrix", seed=11, workers=workers)
+
+'''
+Summary: Run a repeated simulation into a store, cancelling it once a number of replicates have completed
+Parameter: simulator - the simulator
+Parameter: tmp_path - the directory of the files
+Parameter: number_of_simulations - the number of simulations of the run
+Parameter: cancel_after - the number of completed replicates after which the run is cancelled, None to finish it
+'''
+def run_into_store(simulator, tmp_path, number_of_simulations, cancel_after=None):
+    store_file = str(tmp_path / "class.possums")
+    if cancel_after is not None:
+        cancel_event = threading.Event()
+        simulator.set_progress_monitor(lambda completed, total: completed >= cancel_after and cancel_event.set(), cancel_event)
+    completed = simulator.run_repeated_simulation(str(tmp_path / "run.csv"), number_of_simulations, store_file)
+    return store_file, completed
+
+'''
+Summary: Return the bytes of a file
+Parameter: path - the file to read
+'''
+def read_bytes(path):
+    with open(path, 'rb') as file:
+        return file.read()
+
+def test_analysis_of_complete_store_matches_run(tmp_path):
+    store_file, completed = run_into_store(build_simulator(), tmp_path, 10)
+    assert completed == 10
+    store = replicate_store.open_replicate_store(store_file)
+    assert store.get_completed() == 10
+    store.close()
+    load_simulator_from_store(store_file, [20, 40]).analyze_replicate_store(store_file, str(tmp_path / "analysis.csv"))
+    assert read_bytes(tmp_path / "analysis.csv") == read_bytes(tmp_path / "run.csv")
+
+def test_cancelled_store_only_analyses_completed_replicates(tmp_path):
+    store_file, completed = run_into_store(build_simulator(), tmp_path, 10, cancel_after=3)
+    assert completed == 3
+    store = replicate_store.open_replicate_store(store_file)
+    assert len(store) == 10
+    assert store.get_completed() == 3
+    store.close()
+    load_simulator_from_store(store_file, [20, 40]).analyze_replicate_store(store_file, str(tmp_path / "partial.csv"))
+
+    # The first replicates of a seeded run do not depend on how many replicates it was asked for
+    reference_path = tmp_path / "reference"
+    reference_path.mkdir()
+    reference_store, _ = run_into_store(build_simulator(), reference_path, 3)
+    load_simulator_from_store(reference_store, [20, 40]).analyze_replicate_store(reference_store, str(reference_path / "analysis.csv"))
+    assert read_bytes(tmp_path / "partial.csv") == read_bytes(reference_path / "analysis.csv")
+
+def test_parallel_cancelled_store_records_completed_replicates(tmp_path):
+    store_file, completed = run_into_store(build_simulator(workers=2), tmp_path, 40, cancel_after=1)
+    assert 0 < completed < 40
+    store = replicate_store.open_replicate_store(store_file)
+    assert store.get_completed() == completed
+    store.close()
+
+def test_store_without_completed_replicate_is_refused(tmp_path):
+    simulator = build_simulator()
+    cancel_event = threading.Event()
+    cancel_event.set()
+    simulator.set_progress_monitor(None, cancel_event)
+    store_file, completed = run_into_store(simulator, tmp_path, 10)
+    assert completed == 0
+    with pytest.raises(ValueError):
+        load_simulator_from_store(store_file, [20]).analyze_replicate_store(store_file, str(tmp_path / "analysis.csv"))
@@ -0,0 +1,59 @@
+import pytest
+from simulation_core import Event, BROMPSimulator
+
+ENGINES = ["list", "matrix", "runlength", "sampled"]
+
+'''
+Summary: Build a small seeded simulator
+Parameter: engine - the timeline engine
+Parameter: workers - the number of worker processes, None to run serially
+'''
+def build_simulator(engine="matrix", workers=None):
+    events = [Event("on-task", "20", "60"), Event("off-task", "10", "30"), Event("idle", "7", "10")]
+    return BROMPSimulator(events, [7, 20, 45], 6, 900, engine=engine, seed=2024, workers=workers)
+
+'''
+Summary: Return the bytes of a file from its first results table on, skipping the header lines of optional reports
+Parameter: path - the file to read
+'''
+def read_results(path):
+    with open(path, 'rb') as file:
+        content = file.read()
+    return content[content.index(b"Time per observation"):]
+
+@pytest.fixture(scope="module")
+def serial_results(tmp_path_factory):
+    output = tmp_path_factory.mktemp("serial") / "serial.csv"
+    build_simulator().run_repeated_simulation(str(output), 30)
+    return read_results(output)
+
+@pytest.mark.parametrize("workers", [1, 2, 3])
+def test_workers_match_serial_run(tmp_path, serial_results, workers):
+    output = tmp_path / "parallel.csv"
+    build_simulator(workers=workers).run_repeated_simulation(str(output), 30)
+    assert read_results(output) == serial_results
+
+@pytest.mark.parametrize("engine", ENGINES)
+def test_engines_match(tmp_path, serial_results, engine):
+    output = tmp_path / "engine.csv"
+    build_simulator(engine).run_repeated_simulation(str(output), 30)
+    assert read_results(output) == serial_results
+
+@pytest.mark.parametrize("engine", ["list", "sampled"])
+def test_memory_budget_chunks_match(tmp_path, serial_results, engine):
+    simulator = build_simulator(engine)
+    # Room for two students at a time
+    fixed_bytes, bytes_per_student = simulator.get_memory_requirements()
+    simulator.set_memory_budget(fixed_bytes + 2 * bytes_per_student)
+    assert simulator.get_students_per_chunk() == 2
+    output = tmp_path / "budget.csv"
+    simulator.run_repeated_simulation(str(output), 30)
+    assert read_results(output) == serial_results
+
+def test_single_simulation_matches_across_engines(tmp_path):
+    outputs = []
+    for engine in ENGINES:
+        output = tmp_path / (engine + ".csv")
+        build_simulator(engine).run_single_simulation(str(output))
+        outputs.append(output.read_bytes())
+    assert all(output == outputs[0] for output in outputs)
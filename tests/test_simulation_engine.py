@@ -0,0 +1,44 @@
+import warnings
+import numpy as np
+import pytest
+import simulation_engine
+import updated_hmm_integration
+from simulation_core import Event
+
+def random_transition_matrix(number_of_states, seed):
+    generator = np.random.default_rng(seed)
+    transition_matrix = generator.random((number_of_states, number_of_states))
+    return transition_matrix / transition_matrix.sum(axis=1, keepdims=True)
+
+def test_stationary_distribution_solves_large_chains_directly():
+    transition_matrix = random_transition_matrix(1500, 3)
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        distribution = simulation_engine.stationary_distribution(transition_matrix)
+    assert distribution.sum() == pytest.approx(1.0)
+    assert np.abs(distribution @ transition_matrix - distribution).sum() < 1e-10
+
+def test_stationary_distribution_of_a_periodic_chain_by_power_iteration():
+    # A chain alternating between two states only converges on its lazy version
+    transition_matrix = np.array([[0.0, 1.0], [1.0, 0.0]])
+    distribution = simulation_engine.stationary_distribution(transition_matrix, direct_solve_max_states=0)
+    assert distribution == pytest.approx([0.5, 0.5])
+
+def test_stationary_distribution_warns_when_power_iteration_does_not_converge():
+    transition_matrix = np.array([[0.999, 0.001, 0.0], [0.0, 0.998, 0.002], [0.004, 0.0, 0.996]])
+    with pytest.warns(RuntimeWarning, match="did not converge"):
+        distribution = simulation_engine.stationary_distribution(transition_matrix, direct_solve_max_states=0, max_iterations=10)
+    assert distribution.sum() == pytest.approx(1.0)
+    assert simulation_engine.stationary_distribution(transition_matrix) == pytest.approx([4 / 7, 2 / 7, 1 / 7])
+
+def test_stationary_distribution_rejects_reducible_chains():
+    with pytest.raises(ValueError, match="reducible"):
+        simulation_engine.stationary_distribution(np.eye(2))
+
+def test_registry_uses_parsed_event_values():
+    event = Event("on-task", "20", "70.5")
+    # The values parsed by the constructor are used, not the strings as given
+    event.duration = event.proportion = None
+    registry = simulation_engine.EventRegistry([event, updated_hmm_integration.Event("off-task", "10", "29.5")])
+    assert registry.get_durations().tolist() == [20, 10]
+    assert registry.get_proportions().tolist() == [70.5, 29.5]
@@ -0,0 +1,38 @@
+from unittest import mock
+import pytest
+import simulation_engine
+from simulation_core import Event, BROMPSimulator
+
+ENGINES = ["list", "matrix", "runlength", "sampled"]
+
+def build_simulator(engine, numberOfStudents=50):
+    events = [Event("on-task", "20", "70"), Event("off-task", "10", "30")]
+    return BROMPSimulator(events, [7], numberOfStudents, 300, engine=engine, seed=9)
+
+def test_students_never_observed_count_as_zero_percent(tmp_path):
+    # 43 observations for 50 students
+    outputs = []
+    for engine in ENGINES:
+        output = tmp_path / (engine + ".csv")
+        build_simulator(engine).run_single_simulation(str(output))
+        outputs.append(output.read_bytes())
+    assert all(output == outputs[0] for output in outputs)
+    rows = outputs[0].decode().split("\r\n")
+    on_task = rows[3].split(",")
+    assert on_task[0] == "on-task"
+    # Tally and percentage of student 50, who is never observed
+    assert on_task[99:101] == ["0", "0.0"]
+
+@pytest.mark.parametrize("engine", ["runlength", "sampled"])
+def test_timelines_are_written_without_expanding_them(tmp_path, engine):
+    simulator = build_simulator(engine, 5)
+    student_states = simulator.generate_students_states()
+    expected = tmp_path / "expected.csv"
+    with open(expected, 'w') as file:
+        simulator.write_student_states(simulator.to_state_matrix(student_states), file)
+    output = tmp_path / "streamed.csv"
+    with mock.patch.object(simulation_engine.EpisodeBoundaries, "to_state_matrix", side_effect=AssertionError), \
+            mock.patch.object(simulation_engine.RunLengthTimeline, "expand", side_effect=AssertionError):
+        with open(output, 'w') as file:
+            simulator.write_student_states(student_states, file)
+    assert output.read_bytes() == expected.read_bytes()
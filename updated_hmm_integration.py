@@ -3,36 +3,99 @@ from tkinter import messagebox, filedialog
 import random
 import math
 import numpy as np
+import simulation_engine
+import cumulative_statistics
+import memory_budget
 
 class HiddenMarkovModel:
-    def __init__(self, events):
+    # Number of states from which the O(1) alias sampler beats the binary search over the cumulative table
+    # (see benchmark_hmm_samplers.py)
+    ALIAS_SAMPLER_MIN_STATES = 8
+
+    def __init__(self, events, sampler="auto"):
         self.events = events
         self.num_events = len(events)
+        self.sampler = sampler
+        self.generator = np.random.default_rng()
         self.transition_matrix = self.generate_transition_matrix()
+        self.set_emission_model(None)
     
     def generate_transition_matrix(self):
         # Assuming equal transition probabilities for simplicity
         transition_matrix = np.full((self.num_events, self.num_events), 1.0 / self.num_events)
         return transition_matrix
+
+    @property
+    def transition_matrix(self):
+        return self._transition_matrix
+
+    @transition_matrix.setter
+    def transition_matrix(self, transition_matrix):
+        self.set_transition_matrix(transition_matrix)
+
+    def set_transition_matrix(self, transition_matrix):
+        # Keep a read-only copy so the matrix can only change through this setter, which rebuilds the sampling tables
+        transition_matrix = np.array(transition_matrix, dtype=float)
+        transition_matrix.setflags(write=False)
+        self._transition_matrix = transition_matrix
+        self.steady_state_distribution = None
+        self.transition_table = None
+        self.alias_tables = None
+        if self.uses_alias_sampler():
+            self.alias_tables = simulation_engine.alias_transition_tables(transition_matrix)
+        else:
+            self.transition_table = simulation_engine.cumulative_transition_table(transition_matrix)
+
+    def uses_alias_sampler(self):
+        if self.sampler == "auto":
+            return self.num_events >= self.ALIAS_SAMPLER_MIN_STATES
+        return self.sampler == "alias"
     
     def get_next_state(self, current_state_index):
-        return np.random.choice(self.num_events, p=self.transition_matrix[current_state_index])
+        return int(self.get_next_states(np.array([current_state_index]), self.generator)[0])
+
+    def get_next_states(self, current_state_indices, generator):
+        # Advance one chain per entry of current_state_indices with vectorized uniform draws
+        if self.alias_tables is not None:
+            probabilities, aliases = self.alias_tables
+            return simulation_engine.advance_markov_chains_with_alias(probabilities, aliases, current_state_indices, generator)
+        return simulation_engine.advance_markov_chains(self.transition_table, current_state_indices, generator)
+
+    def generate_episodes(self, initial_state_indices, durations, total_time_units, generator):
+        # Advance all chains together until each covers total_time_units, returning (chains x steps) codes and starts
+        return simulation_engine.generate_markov_episodes(self.get_next_states, durations, initial_state_indices, total_time_units, generator)
     
     def get_steady_state_distribution(self):
-        # Calculate the steady state distribution using eigenvalues and eigenvectors
-        eigvals, eigvecs = np.linalg.eig(self.transition_matrix.T)
-        stationary = eigvecs[:, np.isclose(eigvals, 1)]
-        stationary = stationary / stationary.sum()
-        return stationary.real.flatten()
+        # Solved once per transition matrix and cached; setting a new matrix clears the cache. Raises a ValueError if
+        # the chain is reducible, since it then has no unique steady state
+        if self.steady_state_distribution is None:
+            self.steady_state_distribution = simulation_engine.stationary_distribution(self.transition_matrix)
+            self.steady_state_distribution.setflags(write=False)
+        return self.steady_state_distribution
+
+    def set_emission_model(self, emission_matrix, initial_distribution=None):
+        # Observed codes are noisy readings of the hidden states: emission_matrix[state, symbol] is the probability of
+        # recording symbol in state. None removes the model, so observations are the states themselves
+        self.emission_matrix = None if emission_matrix is None else np.array(emission_matrix, dtype=float)
+        if initial_distribution is None:
+            initial_distribution = np.full(self.num_events, 1.0 / self.num_events)  # Chains start with a random event
+        self.initial_distribution = np.array(initial_distribution, dtype=float)
 
     def calculate_observation_likelihood(self, observed_states):
         # Calculate the likelihood of observing a given sequence of states
-        likelihood = 1.0
-        current_state = observed_states[0]
-        for next_state in observed_states[1:]:
-            likelihood *= self.transition_matrix[current_state][next_state]
-            current_state = next_state
-        return likelihood
+        return float(np.exp(self.calculate_observation_log_likelihood(observed_states)))
+
+    def calculate_observation_log_likelihood(self, observed_states):
+        return float(self.calculate_log_likelihoods([observed_states])[0])
+
+    def calculate_log_likelihoods(self, sequences, lengths=None):
+        # Score a batch of integer-coded sequences (a list of ragged sequences, or a padded 2D array with the length of
+        # every row) in log space. Without an emission model the sequences are the states and only their transitions are
+        # scored; with one, the scaled forward algorithm sums over the hidden states
+        codes, lengths = simulation_engine.pack_sequences(sequences, lengths)
+        if self.emission_matrix is None:
+            return simulation_engine.markov_log_likelihoods(self.transition_matrix, codes, lengths)
+        return simulation_engine.forward_log_likelihoods(self.transition_matrix, self.emission_matrix, self.initial_distribution, codes, lengths)
 
 # Event Class
 class Event:
@@ -93,14 +156,22 @@ class ClassRunEventData:
 class BROMPSimulator:
     '''
     Summary: Constructor to populate a simulator object
+    Parameter: engine - "list" to build one Event list per student, "matrix" to build an integer-coded numpy matrix for the class,
+    "runlength" to generate only the (event, start, length) episodes of each student, so that generation, observation and
+    memory scale with the number of episodes rather than with the total observation time
     '''
-    def __init__(self, events, timesPerObservation, numberOfStudents, totalObservationTime):
+    def __init__(self, events, timesPerObservation, numberOfStudents, totalObservationTime, engine="list"):
         self.events = events
+        self.registry = simulation_engine.EventRegistry(events)
         self.timesPerObservation = timesPerObservation
         self.numberOfStudents = numberOfStudents
         self.totalObservationTime = totalObservationTime
+        self.engine = engine
         self.randomGenerator = random.Random()
+        self.numpyGenerator = np.random.default_rng()
         self.hmm = HiddenMarkovModel(events)  # Initialize the HMM with the events
+        self.memoryBudget = None
+        self.memoryReport = None
     
     '''
     Summary: Run the simulation
@@ -116,7 +187,7 @@ class BROMPSimulator:
         
 
     def output_steady_state_analysis(self, output_file):
-        # Calculate the steady state distribution from the HMM
+        # Written once per run; the distribution is solved once per transition matrix and cached by the HMM
         steady_state_distribution = self.hmm.get_steady_state_distribution()
         # Prepare to output this data to the same file
         with open(output_file, 'a') as file:
@@ -125,76 +196,119 @@ class BROMPSimulator:
                 file.write(f"{event.get_name()}: {steady_state_distribution[i]:.4f}\n")
             file.write("\n")
     
+    '''
+    Summary: Keep repeated simulations under a memory budget, by generating as many replicates together as fit in it.
+    The statistics are accumulated as each replicate finishes, so the memory does not grow with the number of replicates.
+    Parameter: max_bytes - the memory budget in bytes, None to bound each batch to about four million generated values
+    '''
+    def set_memory_budget(self, max_bytes=None):
+        if max_bytes is not None and max_bytes <= 0:
+            raise ValueError("memory budget must be positive")
+        self.memoryBudget = max_bytes
+
+    '''
+    Summary: Return the estimated bytes needed to generate the states of one replicate: the episodes drawn for every
+    student, and the states of the engine built from them
+    '''
+    def get_bytes_per_replicate(self):
+        steps = self.totalObservationTime // int(self.registry.get_durations().min()) + 1
+        # Episode codes while they are drawn, stacked, and their durations, ends and starts
+        bytes_per_student = steps * 48
+        if self.engine == "runlength":
+            bytes_per_student += steps * 16
+        elif self.engine == "matrix":
+            bytes_per_student += self.totalObservationTime
+        else:
+            # State matrix, list of codes and list of Events
+            bytes_per_student += self.totalObservationTime * 18
+        return self.numberOfStudents * bytes_per_student
+
+    '''
+    Summary: Return the number of replicates to generate together, at most the number remaining. Raises ValueError when
+    the memory budget cannot hold a single replicate
+    Parameter: remaining - the number of replicates left to run
+    '''
+    def get_replicates_per_batch(self, remaining):
+        if self.memoryBudget is None:
+            return max(1, min(remaining, (1 << 22) // max(1, self.numberOfStudents * self.get_cells_per_student())))
+        return memory_budget.plan_chunk_size(self.memoryBudget, 0, self.get_bytes_per_replicate(), remaining)
+
     '''
     Summary: Run the simulation multiple times as specified by user
     Parameter: output_file - the file to output the results
     '''
     def run_repeated_simulation(self, output_file):
         number_of_simulations = int(app.repeated_simulation_entry.get())
-        cumulative_run_data = []
-        for i in range(number_of_simulations):
-            student_states = self.generate_students_states()
-            all_observation_time_data = {}
-            for time_per_observation in self.timesPerObservation:
-                student_observations = self.compute_observation_results(student_states, time_per_observation)
-                all_observation_time_data[time_per_observation] = self.compute_class_level_results(student_observations)
-            cumulative_run_data.append(all_observation_time_data)
-            self.output_steady_state_analysis(output_file)
-        self.output_cumulative_results(cumulative_run_data, output_file)
+        self.memoryReport = None
+        if self.memoryBudget is not None:
+            self.memoryReport = {"budget_bytes": self.memoryBudget, "replicates_per_batch": self.get_replicates_per_batch(number_of_simulations), "batch_peak_bytes": None}
+        cumulative_results = cumulative_statistics.CumulativeResults(self.events, self.timesPerObservation)
+        try:
+            replicate_states = []
+            for i in range(number_of_simulations):
+                if not replicate_states:
+                    # Advance the chains of several replicates together, bounding the memory of the batch
+                    batch_size = self.get_replicates_per_batch(number_of_simulations - i)
+                    if self.memoryBudget is not None and i == 0:
+                        replicate_states, self.memoryReport["batch_peak_bytes"] = memory_budget.trace_peak_memory(self.generate_replicate_states, batch_size)
+                    else:
+                        replicate_states = self.generate_replicate_states(batch_size)
+                    replicate_states.reverse()
+                student_states = replicate_states.pop()
+                all_observation_time_data = {}
+                for time_per_observation in self.timesPerObservation:
+                    student_observations = self.compute_observation_results(student_states, time_per_observation)
+                    all_observation_time_data[time_per_observation] = self.compute_class_level_results(student_observations)
+                cumulative_results.add_run_data(all_observation_time_data)
+            if self.memoryReport is not None:
+                self.memoryReport["process_peak_bytes"] = memory_budget.get_peak_resident_memory()
+            self.output_cumulative_results(cumulative_results, output_file)
+        finally:
+            cumulative_results.close()
 
         
     '''
     Summary: Output the cumulative results to a file, using specific formatting and calculations
-    Parameter: cumulative_run_data - the cumulative data collected throughout the simulation
+    Parameter: cumulative_results - the CumulativeResults accumulated throughout the simulation
     Parameter: output_file - the file to output the results
     '''
-    def output_cumulative_results(self, cumulative_run_data, output_file):
+    def output_cumulative_results(self, cumulative_results, output_file):
+        average_tallies = cumulative_results.tally_statistics.get_mean().tolist()
+        std_tallies = cumulative_results.tally_statistics.get_std().tolist()
+        average_percentages = cumulative_results.percentage_statistics.get_mean().tolist()
+        std_percentages = cumulative_results.percentage_statistics.get_std().tolist()
         with open(output_file, 'w') as file:
-            for time_per_observation in self.timesPerObservation:
+            if self.memoryReport is not None:
+                self.write_memory_report(file)
+            for interval_index, time_per_observation in enumerate(self.timesPerObservation):
                 file.write("Time per observation = " + str(time_per_observation))
                 file.write("\r\n\r\n")
                 file.write(",average tally,std tally,average percentage,std percentage,,target percentage\r\n")
-                for event in self.events:
-                    average_tallies = 0
-                    std_tallies = 0
-                    average_percentage = 0
-                    std_percentage = 0
-                    tallies = []
-                    percentages = []
-                    for run_level_data in cumulative_run_data:
-                        data = run_level_data[time_per_observation][event]
-                        average_tallies += data.get_total_tally()
-                        if data.get_percentage() == None:
-                            average_percentage += 0
-                        else:
-                            average_percentage += data.get_percentage()
-                        tallies.append(float(data.get_total_tally()))
-                        percentages.append(data.get_percentage())
-                    average_tallies = average_tallies / (float(len(cumulative_run_data)))
-                    average_percentage = average_percentage / (float(len(cumulative_run_data)))
-                    for i in range(len(tallies)):
-                        std_tallies += (tallies[i] - average_tallies) * (tallies[i] - average_tallies)
-                        std_percentage += (percentages[i] - average_percentage) * (percentages[i] - average_percentage)
-                    
-                    std_tallies = math.sqrt(std_tallies / (float(len(cumulative_run_data)-1)))
-                    std_percentage = math.sqrt(std_percentage / (float(len(cumulative_run_data)-1)))
-
-                    file.write(event.get_name() + "," + str(average_tallies) + "," + str(std_tallies) + "," + str(average_percentage) + "," + str(std_percentage) + ',,' + str((float(event.get_proportion()) / float(100))) + "\r\n")
+                for event_index, event in enumerate(self.events):
+                    file.write(event.get_name() + "," + str(average_tallies[interval_index][event_index]) + "," + str(std_tallies[interval_index][event_index])
+                        + "," + str(average_percentages[interval_index][event_index]) + "," + str(std_percentages[interval_index][event_index])
+                        + ',,' + str((float(event.get_proportion()) / float(100))) + "\r\n")
                 file.write("\r\n\r\n")
 
                 file.write("Simulation#")
                 for event in self.events:
                     file.write("," + event.get_name() + " tally," + event.get_name() + " percentage")
                 file.write("\r\n")
-                simulationIndex = 1
-                for run_level_data in cumulative_run_data:
-                    file.write(str(simulationIndex))
-                    for event in self.events:
-                        data = run_level_data[time_per_observation][event]
-                        file.write("," + str(data.get_total_tally()) + "," + str(data.get_percentage()))
-                    file.write("\r\n")
-                    simulationIndex += 1
+                cumulative_results.copy_rows(interval_index, file)
                 file.write("\r\n")
+
+    '''
+    Summary: Write the memory budget and the peak memory used by the run
+    Parameter: file - the file to output the report to
+    '''
+    def write_memory_report(self, file):
+        report = self.memoryReport
+        file.write("Memory budget = " + str(report["budget_bytes"]) + " bytes, replicates per batch = " + str(report["replicates_per_batch"]) + "\r\n")
+        if report["batch_peak_bytes"] is not None:
+            file.write("Peak memory of one batch = " + str(report["batch_peak_bytes"]) + " bytes\r\n")
+        if report["process_peak_bytes"] is not None:
+            file.write("Peak resident memory = " + str(report["process_peak_bytes"]) + " bytes\r\n")
+        file.write("\r\n")
     
     '''
     Summary: Compute the results at the level of the class
@@ -217,7 +331,6 @@ class BROMPSimulator:
                 total_student_tally += current_tally
 
             percentages_for_current_student = {}
-            print(total_student_tally)
             for event in self.events:
                 if total_student_tally == 0:
                     percentages_for_current_student[event] = 0
@@ -246,15 +359,10 @@ class BROMPSimulator:
     def run_single_simulation(self, output_file):
         with open(output_file, 'w') as file:
             student_states = self.generate_students_states()
-            # Example of using extended HMM functionality
-            steady_state_distribution = self.hmm.get_steady_state_distribution()
-            print("Steady State Distribution:", steady_state_distribution, file=file)
-
             for time_per_observation in self.timesPerObservation:
                 self.compute_and_output_observation_results(student_states, time_per_observation, file)
             file.write("Randomized events:\r\n\r\n")
             self.write_student_states(student_states, file)
-        self.output_steady_state_analysis(output_file)
 
     '''
     Summary: Calls functions to compute and output the observation results obtained from the simulation
@@ -265,7 +373,7 @@ class BROMPSimulator:
     def compute_and_output_observation_results(self, student_states, time_per_observation, file):
         student_observations = self.compute_observation_results(student_states, time_per_observation)
         real_event_counts = self.compute_real_event_counts(student_states)
-        self.write_observation_results(real_event_counts, student_observations, time_per_observation, file)
+        self.write_observation_result(real_event_counts, student_observations, time_per_observation, file)
 
     '''
     Summary: Computes the observation results obtained from the simulation
@@ -274,6 +382,12 @@ class BROMPSimulator:
     '''
     def compute_observation_results(self, student_states, time_per_observation):
         assert len(student_states) == self.numberOfStudents
+        if isinstance(student_states, np.ndarray):
+            tallies = simulation_engine.compute_observation_tallies(student_states, time_per_observation, len(self.events))
+            return [dict(zip(self.events, student_tallies)) for student_tallies in tallies.tolist()]
+        if isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            tallies = simulation_engine.compute_run_length_observation_tallies(student_states, time_per_observation, len(self.events))
+            return [dict(zip(self.events, student_tallies)) for student_tallies in tallies.tolist()]
         current_time_index = 0
         current_student_index = 0
 
@@ -296,6 +410,12 @@ class BROMPSimulator:
     Parameter: student_states - the states of each student, based on the simulation
     '''
     def compute_real_event_counts(self, student_states):
+        if isinstance(student_states, np.ndarray):
+            time_counts = simulation_engine.compute_event_time_counts(student_states[0], len(self.events))
+            return dict(zip(self.events, time_counts.tolist()))
+        if isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            time_counts = student_states[0].event_time_counts(len(self.events))
+            return dict(zip(self.events, time_counts.tolist()))
         real_event_counts = {}
         for event in self.events:
             real_event_counts[event] = 0
@@ -356,7 +476,7 @@ class BROMPSimulator:
             for percentage in percentages:
                 std_percentage += (percentage - average_percentage) * (percentage - average_percentage)
             std_percentage = math.sqrt(std_percentage / float(self.numberOfStudents))
-            file.write(",,," + str(total_tally) + "," + str(average_taly) + "," + str(std_tally) + "," + str(average_percentage) + "," + str(std_percentage) + ",," + float(event.get_proportion()) / float(100))
+            file.write(",,," + str(total_tally) + "," + str(average_taly) + "," + str(std_tally) + "," + str(average_percentage) + "," + str(std_percentage) + ",," + str(float(event.get_proportion()) / float(100)))
             file.write(",," + str(float(real_event_counts[event]) / float(number_of_target_observations)))
             file.write("\r\n")
         file.write("\r\n\r\n")
@@ -365,30 +485,44 @@ class BROMPSimulator:
     Summary: Function to generate the states for each student
     '''
     def generate_students_states(self):
-        student_states = []
-        for i in range(self.numberOfStudents):
-            student_states.append(self.generate_states_for_one_student())
-        return student_states
-    
+        return self.generate_replicate_states(1)[0]
+
     '''
-    Summary: Function to generate the state for a single student, executing the Monte Carlo Simulation
+    Summary: Function to generate the states of the students of several replicates, advancing the Markov chains of every
+    student of every replicate together with one vectorized draw per transition
+    Parameter: number_of_replicates - the number of replicates to generate
     '''
-    def generate_states_for_one_student(self):
-        states = []
-        current_event_index = np.random.choice(len(self.events))  # Start with a random event
-        total_time_units = self.totalObservationTime
+    def generate_replicate_states(self, number_of_replicates):
+        number_of_chains = number_of_replicates * self.numberOfStudents
+        initial_states = self.numpyGenerator.integers(len(self.events), size=number_of_chains)  # Start with a random event
+        codes, starts = self.hmm.generate_episodes(initial_states, self.registry.get_durations(), self.totalObservationTime, self.numpyGenerator)
+        replicate_states = []
+        for replicate_index in range(number_of_replicates):
+            rows = slice(replicate_index * self.numberOfStudents, (replicate_index + 1) * self.numberOfStudents)
+            replicate_states.append(self.episodes_to_student_states(codes[rows], starts[rows]))
+        return replicate_states
 
-        while total_time_units > 0:
-            event = self.events[current_event_index]
-            duration = int(event.get_duration())
-            for _ in range(duration):
-                if total_time_units > 0:
-                    states.append(event)
-                    total_time_units -= 1
-            # Transition to the next event using the HMM
-            current_event_index = self.hmm.get_next_state(current_event_index)
+    '''
+    Summary: Return an upper bound on the number of values generated per student: one per episode for the run-length
+    engine, which never expands episodes into time units, and one per time unit otherwise
+    '''
+    def get_cells_per_student(self):
+        if self.engine == "runlength":
+            return self.totalObservationTime // int(self.registry.get_durations().min()) + 1
+        return self.totalObservationTime
 
-        return states
+    '''
+    Summary: Convert the (students x steps) episodes of a replicate into the student states of the engine
+    Parameter: codes - the event code of each episode
+    Parameter: starts - the start time of each episode
+    '''
+    def episodes_to_student_states(self, codes, starts):
+        if self.engine == "runlength":
+            return simulation_engine.markov_episodes_to_run_length_timelines(codes, starts, len(self.events), self.totalObservationTime)
+        state_matrix = simulation_engine.markov_episodes_to_state_matrix(codes, starts, self.registry.get_durations(), self.totalObservationTime)
+        if self.engine == "matrix":
+            return state_matrix
+        return [[self.events[code] for code in row] for row in state_matrix.tolist()]
     
     '''
     Summary: Function to write the student states to a file
@@ -402,6 +536,14 @@ class BROMPSimulator:
         
         file.write("\r\n")
 
+        if isinstance(student_states, np.ndarray):
+            simulation_engine.write_state_matrix_rows(student_states, self.registry.get_names(), file)
+            return
+        if isinstance(student_states[0], simulation_engine.RunLengthTimeline):
+            # Resolve the written ticks against the episode boundaries a block at a time, never expanding the timelines
+            simulation_engine.write_run_length_rows(student_states, self.registry.get_names(), file)
+            return
+
         for timeIndex in range(len(student_states[0])):
             file.write(str(timeIndex+1))
             for studentIndex in range(len(student_states)):
@@ -686,7 +828,7 @@ class EventManager:
         #print(events, self.times_per_observation, number_of_students, total_observation_time, output_file, repeated_simulation, number_of_simulations)
         #for event in events:
         #    print(event.name, event.duration, event.proportion)
-        simulator = BROMPSimulator(self.events, self.times_per_observation, number_of_students, total_observation_time)
+        simulator = BROMPSimulator(self.events, self.times_per_observation, number_of_students, total_observation_time, engine="runlength")
         simulator.run(output_file)
         messagebox.showinfo("Run", "Simulation has been run.")
 